@@ -1,32 +1,379 @@
 ### memex_next/ai.py
-import json, urllib.request, urllib.error
+import json, threading, time
+from contextlib import contextmanager
 from .config import load_config
+from .services.http_pool import request as http_request, stream as http_stream
+from .services import ai_cache, telemetry
+from .services.telemetry import tracked
+from .services.providers import DeepSeekProvider, provider_for, DEFAULT_ENDPOINT, DEFAULT_MODEL
+from .services.circuit import get_breaker, CircuitOpenError as AICircuitOpen
 
-ENDPOINT = "https://api.deepseek.com/v1/chat/completions"
-MODEL    = "deepseek-chat"
+ENDPOINT = DEFAULT_ENDPOINT
+MODEL    = DEFAULT_MODEL
 
-def _ai_call(messages, model, api_key, endpoint):
-    payload = {"model": model, "messages": messages, "temperature": 0.2}
-    req = urllib.request.Request(endpoint, method='POST')
-    req.add_header('Content-Type', 'application/json')
-    req.add_header('Authorization', f'Bearer {api_key}')
+class AIHTTPError(RuntimeError):
+    """Réponse HTTP en erreur du endpoint IA (status + Retry-After éventuel)."""
+    def __init__(self, status: int, body: str = "", retry_after: float | None = None):
+        super().__init__(f"HTTP {status}: {body}")
+        self.status = status
+        self.retry_after = retry_after
+
+class AIConnectionError(RuntimeError):
+    """Échec réseau (DNS, connexion, timeout) avant toute réponse du endpoint IA."""
+
+class AICancelled(RuntimeError):
+    """Génération interrompue par l'utilisateur en cours de flux."""
+
+_last_call = threading.local()
+_usage_lock = threading.Lock()
+_usage_totals = {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0,
+                 "completion_tokens": 0, "latency_ms": 0.0}
+
+def last_call_info() -> dict:
+    """Infos du dernier appel IA du thread courant (timings connect/TTFB/transfert, usage)."""
+    return dict(getattr(_last_call, "info", {}) or {})
+
+def usage_totals() -> dict:
+    """Cumul des appels IA du processus (tokens facturés, latence réseau)."""
+    with _usage_lock:
+        return dict(_usage_totals)
+
+def reset_usage_totals():
+    with _usage_lock:
+        for k in _usage_totals:
+            _usage_totals[k] = 0
+
+def cached_prompt_tokens(usage: dict) -> int:
+    """Tokens du prompt servis par le cache de préfixes du fournisseur
+    (DeepSeek : prompt_cache_hit_tokens ; OpenAI et compatibles : prompt_tokens_details.cached_tokens)."""
+    usage = usage or {}
+    hit = usage.get("prompt_cache_hit_tokens")
+    if hit is None:
+        hit = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    return int(hit or 0)
+
+def _record_usage(info: dict):
+    usage = info.get("usage") or {}
+    with _usage_lock:
+        _usage_totals["calls"] += 1
+        if info.get("cached"):
+            _usage_totals["cached_calls"] += 1
+        else:
+            _usage_totals["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+            _usage_totals["cached_prompt_tokens"] += cached_prompt_tokens(usage)
+            _usage_totals["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+            _usage_totals["latency_ms"] += float((info.get("timings") or {}).get("total_ms") or 0)
+    _record_telemetry(info)
+
+def _record_telemetry(info: dict, error: str = ""):
+    usage = info.get("usage") or {}
+    timings = info.get("timings") or {}
+    telemetry.record(task=info.get("task", ""), provider=info.get("provider", ""), model=info.get("model", ""),
+                     status=info.get("status", 0), cached=info.get("cached", False), stream=info.get("stream", False),
+                     latency_ms=timings.get("total_ms", 0.0), ttft_ms=timings.get("ttft_ms"),
+                     prompt_tokens=usage.get("prompt_tokens", 0), cached_prompt_tokens=cached_prompt_tokens(usage),
+                     completion_tokens=usage.get("completion_tokens", 0), error=error)
+
+@contextmanager
+def _failures_logged(provider, task: str, stream: bool = False):
+    """Enregistre dans la télémétrie les appels en échec (réseau, HTTP, disjoncteur ouvert)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except AICancelled:
+        raise
+    except Exception as e:
+        info = {"task": task, "provider": provider.name, "model": provider.model, "stream": stream,
+                "status": getattr(e, "status", 0), "timings": {"total_ms": round((time.perf_counter() - t0) * 1000, 2)}}
+        _record_telemetry(info, error=f"{type(e).__name__}: {e}")
+        raise
+
+@contextmanager
+def _circuit(provider):
+    """Passe l'appel par le disjoncteur du fournisseur : échec immédiat s'il est ouvert,
+    et comptage des échecs qui lui sont imputables (réseau, 5xx, clé refusée)."""
+    breaker = get_breaker(provider.name)
+    breaker.before()
+    try:
+        yield
+    except AIConnectionError as e:
+        breaker.failure(e)
+        raise
+    except AIHTTPError as e:
+        if e.status >= 500 or e.status in (401, 403):
+            breaker.failure(e, fatal=e.status in (401, 403))
+        else:
+            breaker.success()  # 4xx/429 : le serveur répond, la requête seule est en cause
+        raise
+    except BaseException:
+        breaker.release()  # annulation, erreur locale : rien n'est appris sur le fournisseur
+        raise
+    else:
+        breaker.success()
+
+def _provider_call(provider, messages, temperature=0.2, use_cache=True, task: str = ""):
+    use_cache = use_cache and ai_cache.is_enabled()
+    if use_cache:
+        key = ai_cache.cache_key(provider.model, provider.endpoint, messages, temperature)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            _last_call.info = {"status": 200, "cached": True, "provider": provider.name, "model": provider.model,
+                               "task": task, "timings": {}}
+            _record_usage(_last_call.info)
+            return cached
+    payload = provider.payload(messages, temperature)
+    with _failures_logged(provider, task), _circuit(provider):
+        with provider.slot():
+            try:
+                resp = http_request('POST', provider.endpoint, body=json.dumps(payload).encode('utf-8'),
+                                    headers=provider.headers(), timeout=provider.timeout,
+                                    connect_timeout=provider.connect_timeout)
+            except Exception as e:
+                raise AIConnectionError(str(e))
+        _last_call.info = {"status": resp.status, "cached": False, "provider": provider.name, "model": provider.model,
+                           "task": task, "timings": resp.timings}
+        if resp.status >= 400:
+            try:
+                retry_after = float(resp.headers.get('retry-after', ''))
+            except ValueError:
+                retry_after = None
+            raise AIHTTPError(resp.status, resp.body.decode('utf-8', errors='ignore'), retry_after)
     try:
-        with urllib.request.urlopen(req, data=json.dumps(payload).encode('utf-8'), timeout=60) as resp:
-            data = json.loads(resp.read().decode('utf-8'))
-            return data.get('choices', [{}])[0].get('message', {}).get('content', '')
-    except urllib.error.HTTPError as e:
-        raise RuntimeError(f"HTTP {e.code}: {e.read().decode('utf-8', errors='ignore')}")
+        data = json.loads(resp.body.decode('utf-8'))
+        content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
     except Exception as e:
         raise RuntimeError(str(e))
+    _last_call.info["usage"] = data.get('usage') or {}
+    _record_usage(_last_call.info)
+    if use_cache and content:
+        ai_cache.put(key, provider.model, content)
+    return content
+
+def _ai_call(messages, model, api_key, endpoint, temperature=0.2, use_cache=True):
+    """Appel direct à un endpoint donné (hors routage `ai_routes`)."""
+    provider = DeepSeekProvider("direct", endpoint, model, api_key)
+    return _provider_call(provider, messages, temperature=temperature, use_cache=use_cache)
+
+def get_ai_provider(task: str, cfg: dict | None = None):
+    """Fournisseur routé pour `task` ; erreur explicite s'il n'est pas configuré."""
+    provider = provider_for(task, cfg)
+    if not provider.is_ready():
+        if provider.requires_key and not provider.api_key:
+            raise RuntimeError("Clé API manquante (Options > IA)")
+        raise RuntimeError(f"Fournisseur IA « {provider.name} » incomplet (endpoint/modèle)")
+    return provider
+
+def ai_ready(task: str, cfg: dict | None = None) -> bool:
+    """True si le fournisseur routé pour `task` est utilisable (clé API si requise)."""
+    return provider_for(task, cfg).is_ready()
+
+def ai_call(task: str, messages, temperature=0.2, use_cache=True):
+    """Appel IA via le fournisseur routé pour `task` (voir services.providers)."""
+    return _provider_call(get_ai_provider(task), messages, temperature=temperature, use_cache=use_cache, task=task)
+
+@contextmanager
+def _abort_on_cancel(resp, cancel):
+    """Surveille `cancel` pendant la lecture d'un flux et coupe la réponse dès qu'il est levé :
+    un flux bloqué (serveur muet) est interrompu sans attendre le délai de lecture."""
+    if cancel is None:
+        yield
+        return
+    done = threading.Event()
+    def watch():
+        while not done.is_set():
+            if cancel.wait(0.1):
+                resp.abort()
+                return
+    threading.Thread(target=watch, name="ai-stream-cancel", daemon=True).start()
+    try:
+        yield
+    finally:
+        done.set()
+
+def _ai_call_stream(provider, messages, on_delta, cancel=None, temperature=0.2, use_cache=True, task: str = ""):
+    """Comme `_provider_call`, mais en SSE : chaque fragment reçu est passé à `on_delta(str)`.
+    `cancel` (threading.Event) interrompt la lecture et lève AICancelled ; le temps jusqu'au
+    premier token est exposé dans `last_call_info()["timings"]["ttft_ms"]`."""
+    use_cache = use_cache and ai_cache.is_enabled()
+    if use_cache:
+        key = ai_cache.cache_key(provider.model, provider.endpoint, messages, temperature)
+        cached = ai_cache.get(key)
+        if cached is not None:
+            _last_call.info = {"status": 200, "cached": True, "stream": True, "provider": provider.name,
+                               "model": provider.model, "task": task, "timings": {"ttft_ms": 0.0}}
+            _record_usage(_last_call.info)
+            on_delta(cached)
+            return cached
+    payload = provider.payload(messages, temperature, stream=True)
+    with _failures_logged(provider, task, stream=True), _circuit(provider), provider.slot():
+        t0 = time.perf_counter()
+        try:
+            resp = http_stream('POST', provider.endpoint, body=json.dumps(payload).encode('utf-8'),
+                               headers=provider.headers(stream=True), timeout=provider.timeout,
+                               connect_timeout=provider.connect_timeout)
+        except Exception as e:
+            raise AIConnectionError(str(e))
+        info = {"status": resp.status, "cached": False, "stream": True, "provider": provider.name,
+                "model": provider.model, "task": task, "timings": resp.timings, "usage": {}}
+        _last_call.info = info
+        with resp:
+            if resp.status >= 400:
+                try:
+                    retry_after = float(resp.headers.get('retry-after', ''))
+                except ValueError:
+                    retry_after = None
+                raise AIHTTPError(resp.status, resp.read().decode('utf-8', errors='ignore'), retry_after)
+            if "text/event-stream" not in resp.headers.get("content-type", ""):
+                # Serveur qui ignore "stream": réponse JSON classique d'un bloc
+                data = json.loads(resp.read().decode('utf-8'))
+                content = data.get('choices', [{}])[0].get('message', {}).get('content', '')
+                info["usage"] = data.get('usage') or {}
+                info["timings"]["ttft_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                if content:
+                    on_delta(content)
+            else:
+                parts = []
+                try:
+                    with _abort_on_cancel(resp, cancel):
+                        for line in resp.iter_lines():
+                            if cancel is not None and cancel.is_set():
+                                raise AICancelled("Génération annulée")
+                            if not line.startswith(b"data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == b"[DONE]":
+                                break
+                            chunk = json.loads(data.decode('utf-8'))
+                            if chunk.get("usage"):
+                                info["usage"] = chunk["usage"]
+                            delta = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content")
+                            if delta:
+                                if not parts:
+                                    info["timings"]["ttft_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+                                parts.append(delta)
+                                on_delta(delta)
+                except (AICancelled, ValueError):
+                    raise
+                except Exception as e:
+                    if cancel is not None and cancel.is_set():
+                        raise AICancelled("Génération annulée")
+                    if not parts:
+                        raise AIConnectionError(str(e))
+                    raise RuntimeError(f"Flux IA interrompu : {e}")
+                if cancel is not None and cancel.is_set():
+                    raise AICancelled("Génération annulée")
+                # Consommer la fin éventuelle du corps pour rendre la connexion au pool
+                for _ in resp.iter_lines():
+                    pass
+                content = "".join(parts)
+    _record_usage(info)
+    if use_cache and content:
+        ai_cache.put(key, provider.model, content)
+    return content
+
+def ai_complete(messages, task: str = "summary", on_delta=None, cancel=None, temperature=0.2, use_cache=True):
+    """Appel IA routé pour `task`, en flux si `on_delta` est fourni (option `ai_streaming`
+    active et fournisseur compatible). Si le flux échoue avant le premier fragment, repli
+    sur un appel classique dont le résultat est transmis d'un bloc à `on_delta`."""
+    provider = get_ai_provider(task)
+    if on_delta is None:
+        return _provider_call(provider, messages, temperature=temperature, use_cache=use_cache, task=task)
+    if provider.streaming and load_config().get("ai_streaming", True):
+        received = []
+        def relay(delta):
+            received.append(delta)
+            on_delta(delta)
+        try:
+            return _ai_call_stream(provider, messages, relay, cancel=cancel,
+                                   temperature=temperature, use_cache=use_cache, task=task)
+        except (AICancelled, AICircuitOpen):
+            raise
+        except AIHTTPError as e:
+            if e.status in (401, 403) or received:
+                raise
+        except Exception:
+            if received:
+                raise
+    if cancel is not None and cancel.is_set():
+        raise AICancelled("Génération annulée")
+    content = _provider_call(provider, messages, temperature=temperature, use_cache=use_cache, task=task)
+    if cancel is not None and cancel.is_set():
+        raise AICancelled("Génération annulée")
+    on_delta(content)
+    return content
+
+# ---------- Prompts ----------
+# Les fournisseurs mettent en cache les préfixes de prompt identiques (facturés moins cher,
+# servis plus vite). Le message système ne contient donc que des parties stables pour un
+# utilisateur (consignes, langue, liste de catégories) ; tout ce qui varie d'un appel
+# à l'autre (nombres demandés, texte) va dans le message utilisateur, après.
+
+def _tags_system(lang: str) -> str:
+    return f"Tu extrais des tags concis en {lang}. Réponds JSON: {{\"tags\":[]}}"
+
+def _tags_messages(text: str, lang: str, count: int) -> list:
+    return [{"role": "system", "content": _tags_system(lang)},
+            {"role": "user", "content": f"Nombre de tags : {count}\n\nTexte:\n{text}\n\nJSON:"}]
+
+def _title_messages(text: str, lang: str, max_len: int) -> list:
+    sys_content = f"Tu es un assistant qui propose des titres concis en {lang}, sans guillemets."
+    return [{"role": "system", "content": sys_content},
+            {"role": "user", "content": f"Longueur maximale : {max_len} caractères\n\nTexte:\n{text}"}]
+
+def _categories_system(user_cats: list[str], lang: str) -> str:
+    return (f"Tu choisis des catégories en {lang} uniquement dans cette liste : [{', '.join(user_cats)}]. "
+            "Réponds JSON: {\"categories\":[]}")
+
+def _categories_messages(text: str, user_cats: list[str], lang: str, max_n: int) -> list:
+    return [{"role": "system", "content": _categories_system(user_cats, lang)},
+            {"role": "user", "content": f"Au plus {max_n} catégorie(s)\n\nTexte:\n{text}\n\nJSON:"}]
 
-def ai_generate_tags(text: str, lang: str = "fr", count: int = 5) -> list[str]:
+def _enrich_messages(text: str, user_cats: list[str], lang: str, count: int, max_len: int, max_cats: int) -> list:
+    sys_content = f"Tu analyses un texte en {lang} et réponds uniquement en JSON, sans commentaire, au format :\n"
+    sys_content += '{"title": "titre court sans guillemets", "tags": ["tag", ...], "categories": ["catégorie", ...]}\n'
+    sys_content += "- tags : concis\n"
+    if user_cats:
+        sys_content += f"- categories : choisies uniquement dans cette liste : [{', '.join(user_cats)}]"
+    else:
+        sys_content += "- categories : liste vide"
+    limits = f"title : {max_len} caractères maximum ; tags : {count}"
+    if user_cats:
+        limits += f" ; categories : 0 à {max_cats}"
+    return [{"role": "system", "content": sys_content},
+            {"role": "user", "content": f"{limits}\n\nTexte:\n{text}\n\nJSON:"}]
+
+TAGGER_MODES = ("local", "remote", "local-then-remote")
+
+def tagger_mode(cfg: dict | None = None) -> str:
+    """Mode de génération des tags (option `tagger_mode`) ; sans clé API, toujours "local"."""
+    cfg = cfg or load_config()
+    if not ai_ready("tags", cfg):
+        return "local"
+    mode = cfg.get("tagger_mode", "remote")
+    return mode if mode in TAGGER_MODES else "remote"
+
+def _local_tags(text: str, count: int) -> list[str]:
+    from .services.local_tagger import generate_tags
+    return generate_tags(text, count=count)
+
+@tracked
+def ai_generate_tags(text: str, lang: str = "fr", count: int = 5, use_cache: bool = True,
+                     mode: str | None = None) -> list[str]:
+    """Tags d'un texte selon `mode` (défaut : option `tagger_mode`) :
+    "local" = tagger hors ligne, "remote" = API, "local-then-remote" = local, complété par l'API
+    seulement si le tagger local trouve moins de `count` tags."""
     cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
-        raise RuntimeError("Clé API manquante (Options > IA)")
-    sys = {"role": "system", "content": f"Tu extrais {count} tags concis en {lang}. Réponds JSON: {{\"tags\":[]}}"}
-    user = {"role": "user", "content": f"Texte:\\n{text}\\n\\nJSON:"}
-    out = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+    mode = "local" if not ai_ready("tags", cfg) else (mode or tagger_mode(cfg))
+    if mode != "remote":
+        local = _local_tags(text, count)
+        if mode == "local" or len(local) >= count:
+            return local
+        try:
+            remote = ai_generate_tags(text, lang=lang, count=count, use_cache=use_cache, mode="remote")
+        except Exception:
+            return local
+        return list(dict.fromkeys(local + remote))[:count]
+    out = ai_call("tags", _tags_messages(text, lang, count), use_cache=use_cache)
     
     # Essayer d'abord le parsing JSON standard
     try:
@@ -62,37 +409,47 @@ def ai_generate_tags(text: str, lang: str = "fr", count: int = 5) -> list[str]:
     
     return []
 
-def ai_generate_title(text: str, lang: str = "fr", max_len: int = 80) -> str:
-    cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
-        raise RuntimeError("Clé API manquante")
-    sys = {"role": "system", "content": f"Tu es un assistant qui propose des titres concis en {lang}."}
-    user = {"role": "user", "content": f"Génère un titre court (={max_len} car.) sans guillemets :\\n\\n{text}"}
-    out = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+@tracked
+def ai_generate_title(text: str, lang: str = "fr", max_len: int = 80, use_cache: bool = True) -> str:
+    out = ai_call("title", _title_messages(text, lang, max_len), use_cache=use_cache)
     return out.strip().strip('"\'')[:max_len]
 
-def ai_generate_categories(text: str, user_cats: list[str], lang: str = "fr", max_n: int = 2) -> list[str]:
+def _local_categories(text: str, user_cats: list[str], max_n: int, cfg: dict):
+    """Prédiction du classifieur local (None si désactivé, indisponible ou sans données)."""
+    if not cfg.get("classifier_enabled", True):
+        return None
+    from .services import classifier
+    try:
+        return classifier.predict(text, user_cats, max_n=max_n)
+    except Exception:
+        return None
+
+@tracked
+def ai_generate_categories(text: str, user_cats: list[str], lang: str = "fr", max_n: int = 2, use_cache: bool = True,
+                           local: bool = True) -> list[str]:
+    """Catégories parmi `user_cats` : le classifieur local répond seul s'il est assez sûr
+    (option `classifier_threshold`), sinon appel à l'API (sa meilleure proposition sans clé API)."""
     cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key or not user_cats:
+    ready = ai_ready("categories", cfg)
+    if not user_cats:
+        return []
+    pred = _local_categories(text, user_cats, max_n, cfg) if local else None
+    if pred is not None and (pred.confident or not ready):
+        return pred.categories
+    if not ready:
         return []
-    sys = {"role": "system", "content": f"Tu choisis 0 à {max_n} catégorie(s) parmi la liste fournie en {lang}. Réponds JSON: {{\"categories\":[]}}"}
-    cats_join = ", ".join(user_cats)
-    user = {"role": "user", "content": f"Liste: [{cats_join}]\\n\\nTexte:\\n{text}\\n\\nJSON:"}
-    out = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+    out = ai_call("categories", _categories_messages(text, user_cats, lang, max_n), use_cache=use_cache)
     try:
-        chosen = [c.strip() for c in json.loads(out)["categories"] if c.strip() in user_cats]
+        chosen = [c.strip() for c in _parse_json_object(out)["categories"] if c.strip() in user_cats]
         return chosen[:max_n]
     except Exception:
         return []
 
-def ai_smart_summary(text: str, lang: str = "fr") -> str:
-    """Résume un texte en préservant les sections marquées entre %...%"""
-    cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
-        raise RuntimeError("Clé API manquante (Options > IA)")
+@tracked
+def ai_smart_summary(text: str, lang: str = "fr", on_delta=None, cancel=None) -> str:
+    """Résume un texte en préservant les sections marquées entre %...%
+    (`on_delta`/`cancel` : réponse en flux, voir `ai_complete`)"""
+    get_ai_provider("summary")  # erreur immédiate si non configuré
     
     # Extraire les sections à préserver (entre %...%)
     import re
@@ -123,7 +480,7 @@ def ai_smart_summary(text: str, lang: str = "fr") -> str:
     sys = {"role": "system", "content": sys_content}
     user = {"role": "user", "content": f"Texte à résumer:\n\n{text_to_summarize}"}
     
-    summary = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+    summary = ai_complete([sys, user], "summary", on_delta=on_delta, cancel=cancel)
     
     # Restaurer les sections préservées
     for i, preserved_text in enumerate(preserved_sections):
@@ -132,23 +489,22 @@ def ai_smart_summary(text: str, lang: str = "fr") -> str:
     
     return summary.strip()
 
+@tracked
 def ai_suggest_new_categories(text: str, existing_list: list[str], lang: str = "fr", max_n: int = 3) -> list[str]:
     """Suggère de nouvelles catégories basées sur le texte, différentes de celles existantes"""
-    cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
+    if not ai_ready("categories"):
         return []
     
     existing_str = ", ".join(existing_list) if existing_list else "aucune"
-    sys_content = f"Tu suggères {max_n} nouvelles catégories en {lang} pour classer ce texte. "
+    sys_content = f"Tu suggères de nouvelles catégories en {lang} pour classer des textes. "
     sys_content += f"Évite ces catégories existantes: [{existing_str}]. "
     sys_content += "Réponds JSON: {\"categories\":[]}"
     
     sys = {"role": "system", "content": sys_content}
-    user = {"role": "user", "content": f"Texte:\n{text}\n\nJSON:"}
+    user = {"role": "user", "content": f"Nombre de suggestions : {max_n}\n\nTexte:\n{text}\n\nJSON:"}
     
     try:
-        out = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+        out = ai_call("categories", [sys, user])
         parsed = json.loads(out)
         if "categories" in parsed and isinstance(parsed["categories"], list):
             # Filtrer les catégories qui existent déjà
@@ -163,3 +519,180 @@ def ai_suggest_new_categories(text: str, existing_list: list[str], lang: str = "
         pass
     
     return []
+
+def estimate_tokens(text: str) -> int:
+    """Estimation locale grossière (~4 caractères par token) pour budgets et limites de débit."""
+    return max(1, len(text or "") // 4)
+
+def _parse_json_object(out: str) -> dict:
+    """Extrait le premier objet JSON d'une réponse (tolère ```json ... ``` et texte autour)."""
+    import re
+    out = (out or "").strip()
+    fenced = re.search(r"```(?:json)?\s*(\{.*\})\s*```", out, re.S)
+    if fenced:
+        out = fenced.group(1)
+    try:
+        parsed = json.loads(out)
+    except Exception:
+        start, end = out.find("{"), out.rfind("}")
+        if start < 0 or end <= start:
+            return {}
+        try:
+            parsed = json.loads(out[start:end + 1])
+        except Exception:
+            return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+@tracked
+def ai_enrich(text: str, user_cats: list[str], lang: str = "fr", count: int = 5, max_len: int = 80,
+              max_cats: int = 2, use_cache: bool = True) -> dict:
+    """Titre + tags + catégories en un seul appel (réponse JSON validée).
+    Seul un champ invalide déclenche un appel de repli dédié."""
+    messages = _enrich_messages(text, user_cats, lang, count, max_len, max_cats)
+    parsed = _parse_json_object(ai_call("enrich", messages, use_cache=use_cache))
+    
+    # Validation champ par champ
+    title = parsed.get("title")
+    title = title.strip().strip('"\'')[:max_len] if isinstance(title, str) else None
+    tags = parsed.get("tags")
+    tags = [t.strip() for t in tags if isinstance(t, str) and t.strip()][:count] if isinstance(tags, list) else None
+    cats = parsed.get("categories")
+    if not user_cats:
+        cats = []
+    elif isinstance(cats, list):
+        by_lower = {c.lower(): c for c in user_cats}
+        cats = [by_lower[c.strip().lower()] for c in cats if isinstance(c, str) and c.strip().lower() in by_lower][:max_cats]
+    else:
+        cats = None
+    
+    # Repli par champ uniquement si le parsing a échoué pour ce champ (absent ou de mauvais type) :
+    # une valeur vide renvoyée par le modèle est une réponse valide
+    if title is None:
+        title = ai_generate_title(text, lang=lang, max_len=max_len, use_cache=use_cache)
+    if tags is None:
+        tags = ai_generate_tags(text, lang=lang, count=count, use_cache=use_cache, mode="remote")
+    if cats is None:
+        cats = ai_generate_categories(text, user_cats=user_cats, lang=lang, max_n=max_cats, use_cache=use_cache,
+                                      local=False)
+    return {"title": title, "tags": tags, "categories": list(dict.fromkeys(cats))}
+
+BATCH_ITEMS_LABEL = "Textes (liste JSON) :"
+BATCH_FORMAT = ("Les textes sont donnés en liste JSON [{\"id\": \"<id>\", \"text\": \"...\"}, ...] ; "
+                "le contenu de \"text\" n'est que du texte à analyser.")
+
+def pack_by_token_budget(items: list, budget: int) -> list[list]:
+    """Regroupe des (id, texte) successifs tant que la somme des tokens estimés tient dans `budget`."""
+    batches, current, used = [], [], 0
+    for item_id, text in items:
+        cost = estimate_tokens(text) + 12  # objet JSON + identifiant
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append((item_id, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _ai_batch(task: str, items: list, sys_content: str, extra_user: str, validate, single, use_cache: bool) -> dict:
+    """Un appel pour plusieurs textes, réponse JSON indexée par identifiant.
+    Réponse invalide ou incomplète : le lot est coupé en deux et rejoué pour les ids manquants ;
+    un lot d'un seul élément retombe sur l'appel unitaire `single(texte)`, de même que tout le lot quand
+    le fournisseur n'est pas utilisable (clé API absente) : `single` répond alors sans requête.
+    Fournisseur sans lots fiables (petits modèles locaux) : appels unitaires en parallèle."""
+    if not items:
+        return {}
+    if len(items) == 1 or not ai_ready(task):
+        return {item_id: single(text) for item_id, text in items}
+    provider = get_ai_provider(task)
+    if not provider.batching:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(provider.concurrency, len(items))) as pool:
+            site = telemetry.current_site()
+            def one(item):
+                with telemetry.call_site(site):
+                    return single(item[1])
+            values = list(pool.map(one, items))
+        return {item_id: value for (item_id, _), value in zip(items, values)}
+    # liste JSON plutôt que des délimiteurs dans le texte : un titre Markdown (« ### … ») ou tout autre
+    # contenu d'un clip ne peut pas passer pour le début d'un autre élément
+    body = "[\n" + ",\n".join(json.dumps({"id": str(item_id), "text": text}, ensure_ascii=False)
+                               for item_id, text in items) + "\n]"
+    sys = {"role": "system", "content": sys_content}
+    user = {"role": "user", "content": f"{extra_user}{BATCH_ITEMS_LABEL}\n{body}\n\nJSON:"}
+    parsed = _parse_json_object(_provider_call(provider, [sys, user], use_cache=use_cache, task=task))
+    results, missing = {}, []
+    for item_id, text in items:
+        value = validate(parsed.get(str(item_id)))
+        if value is None:
+            missing.append((item_id, text))
+        else:
+            results[item_id] = value
+    if missing:
+        if len(missing) == len(items):
+            half = len(missing) // 2
+            parts = [missing[:half], missing[half:]]
+        else:
+            parts = [missing]
+        for part in parts:
+            results.update(_ai_batch(task, part, sys_content, extra_user, validate, single, use_cache))
+    return results
+
+@tracked
+def ai_generate_tags_batch(items: list, lang: str = "fr", count: int = 5, use_cache: bool = True) -> dict:
+    """Tags pour plusieurs textes courts [(id, texte), ...] en une requête -> {id: [tags]}.
+    Suit `tagger_mode` : en local, aucune requête ; en local-then-remote, seuls les textes
+    pour lesquels le tagger local trouve moins de `count` tags partent à l'API."""
+    mode = tagger_mode()
+    if mode != "remote":
+        local = {item_id: _local_tags(text, count) for item_id, text in items}
+        short = [(i, t) for i, t in items if len(local[i]) < count]
+        if mode == "local" or not short:
+            return local
+        remote = ai_generate_tags_batch_remote(short, lang=lang, count=count, use_cache=use_cache)
+        for item_id, tags in remote.items():
+            local[item_id] = list(dict.fromkeys(local[item_id] + tags))[:count]
+        return local
+    return ai_generate_tags_batch_remote(items, lang=lang, count=count, use_cache=use_cache)
+
+@tracked
+def ai_generate_tags_batch_remote(items: list, lang: str = "fr", count: int = 5, use_cache: bool = True) -> dict:
+    """Version API de `ai_generate_tags_batch`, quel que soit `tagger_mode`."""
+    sys_content = (f"Tu extrais des tags concis en {lang} pour chaque texte. {BATCH_FORMAT} "
+                   "Réponds JSON: {\"<id>\": [\"tag\", ...], ...} avec tous les ids.")
+    def validate(value):
+        if not isinstance(value, list):
+            return None
+        return [t.strip() for t in value if isinstance(t, str) and t.strip()][:count]
+    single = lambda text: ai_generate_tags(text, lang=lang, count=count, use_cache=use_cache, mode="remote")
+    return _ai_batch("tags", list(items), sys_content, f"Nombre de tags par texte : {count}\n\n",
+                     validate, single, use_cache)
+
+@tracked
+def ai_generate_categories_batch(items: list, user_cats: list[str], lang: str = "fr", max_n: int = 2,
+                                 use_cache: bool = True) -> dict:
+    """Catégories (parmi `user_cats`) pour plusieurs textes courts en une requête -> {id: [catégories]}."""
+    if not user_cats:
+        return {item_id: [] for item_id, _ in items}
+    sys_content = (f"Tu choisis des catégories en {lang} uniquement dans cette liste : [{', '.join(user_cats)}]. "
+                   f"{BATCH_FORMAT} Réponds JSON: {{\"<id>\": [\"catégorie\", ...], ...}} avec tous les ids.")
+    # Le classifieur local tranche les textes sur lesquels il est assez sûr ; le reste part à l'API
+    cfg = load_config()
+    results, unsure = {}, []
+    for item_id, text in items:
+        pred = _local_categories(text, user_cats, max_n, cfg)
+        if pred is not None and (pred.confident or not ai_ready("categories", cfg)):
+            results[item_id] = pred.categories
+        else:
+            unsure.append((item_id, text))
+    by_lower = {c.lower(): c for c in user_cats}
+    def validate(value):
+        if not isinstance(value, list):
+            return None
+        return list(dict.fromkeys(by_lower[c.strip().lower()] for c in value
+                                  if isinstance(c, str) and c.strip().lower() in by_lower))[:max_n]
+    single = lambda text: ai_generate_categories(text, user_cats=user_cats, lang=lang, max_n=max_n,
+                                                 use_cache=use_cache, local=False)
+    results.update(_ai_batch("categories", unsure, sys_content, f"Au plus {max_n} catégorie(s) par texte\n\n",
+                             validate, single, use_cache))
+    return results
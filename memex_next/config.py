@@ -1,7 +1,8 @@
 import os, json, pathlib
 BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
-DB_FILE      = BASE_DIR / "souviens_toi.db"
-CONFIG_FILE  = BASE_DIR / "souviens_config.json"
+# MEMEX_DB / MEMEX_CONFIG : base et configuration alternatives (benchmarks, essais sur une copie)
+DB_FILE      = pathlib.Path(os.environ["MEMEX_DB"]) if os.environ.get("MEMEX_DB") else BASE_DIR / "souviens_toi.db"
+CONFIG_FILE  = pathlib.Path(os.environ["MEMEX_CONFIG"]) if os.environ.get("MEMEX_CONFIG") else BASE_DIR / "souviens_config.json"
 SEPARATOR    = "\n---\n"
 
 def load_config():
@@ -10,5 +11,20 @@ def load_config():
     except Exception:
         return {}
 
+_cached = (None, {})
+
+def cached_config() -> dict:
+    """load_config() relu seulement si le fichier a changé (chemins appelés à chaque clip ou appel IA).
+    Le dictionnaire renvoyé est partagé : ne pas le modifier."""
+    global _cached
+    try:
+        st = CONFIG_FILE.stat()
+        key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    if key is None or key != _cached[0]:
+        _cached = (key, load_config())
+    return _cached[1]
+
 def save_config(data: dict):
     CONFIG_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -12,6 +12,7 @@ def create_conn():
 
 def init_db():
     conn = create_conn()
+    had_pages_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name='file_pages_fts'").fetchone() is not None
     schema = (pathlib.Path(__file__).parent / "resources" / "schema.sql").read_text(encoding="utf-8")
     conn.executescript(schema)
     
@@ -22,5 +23,31 @@ def init_db():
         # La colonne n'existe pas, l'ajouter
         conn.execute("ALTER TABLE tasks ADD COLUMN reminder_days INTEGER DEFAULT NULL")
     
+    # Migration : origine du texte des pages de PDF ('text' = couche texte, 'ocr')
+    try:
+        conn.execute("SELECT source FROM file_pages LIMIT 1")
+    except Exception:
+        conn.execute("ALTER TABLE file_pages ADD COLUMN source TEXT DEFAULT 'text'")
+    
+    # Migration : libellé imprimé des pages de PDF, index plein texte des pages déjà extraites
+    try:
+        conn.execute("SELECT label FROM file_pages LIMIT 1")
+    except Exception:
+        conn.execute("ALTER TABLE file_pages ADD COLUMN label TEXT")
+    if not had_pages_fts:
+        conn.execute("INSERT INTO file_pages_fts(file_pages_fts) VALUES ('rebuild')")
+    
+    # Migration : dernière utilisation d'un résumé de morceau (éviction LRU du cache)
+    try:
+        conn.execute("SELECT last_used FROM chunk_summaries LIMIT 1")
+    except Exception:
+        conn.execute("ALTER TABLE chunk_summaries ADD COLUMN last_used INTEGER")
+    
+    # Migration : langue détectée du clip (NULL = pas encore détectée, '' = indéterminée)
+    try:
+        conn.execute("SELECT lang FROM clips LIMIT 1")
+    except Exception:
+        conn.execute("ALTER TABLE clips ADD COLUMN lang TEXT")
+    
     conn.commit()
     return conn
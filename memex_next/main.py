@@ -1,12 +1,23 @@
 import sys, tkinter as tk
 from .ui.app import BufferApp
 from .db import init_db
+from .services import indexer, telemetry, extraction, page_index, summarize, watch_folder
+from .services.async_worker import runner
 
 def entry():
     """Console-script entry point."""
     init_db()
+    indexer.schedule_missing()  # classifieur, index du corpus, passages et langues à rattraper (thread dédié)
+    extraction.schedule_refresh()  # textes de pièces jointes extraits par une version antérieure (thread dédié)
+    page_index.schedule()  # pages, plan et libellés des PDF joints avant l'index des pages (thread dédié)
+    runner.submit(telemetry.purge)  # mesures des appels IA au-delà de ai_telemetry_days
+    runner.submit(summarize.prune)  # résumés de morceaux trop anciens ou en surnombre
     app = BufferApp()
+    # PDF et images déposés dans le dossier surveillé (option watch_folder)
+    watch_folder.start(on_result=lambda r: app.after(0, app.show_toast, f"Dossier surveillé : {r.summary()}"))
     app.mainloop()
+    watch_folder.stop()
+    extraction.stop_refresh()
 
 if __name__ == "__main__":
     entry()
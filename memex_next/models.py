@@ -14,6 +14,7 @@ class Clip:
     tags: str = ""
     categories: str = ""
     read_later: int = 0
+    lang: str = ""
 
 @dataclass
 class Task:
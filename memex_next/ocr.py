@@ -1,23 +1,205 @@
 ### memex_next/ocr.py
+"""
+OCR des images et des pages numérisées : prétraitement (réduction à la
+résolution utile, niveaux de gris, redressement, seuillage adaptatif) puis
+tesseract. Avec tesserocr, le moteur et ses modèles de langue restent chargés
+(une instance par thread et par langue) au lieu d'un processus tesseract lancé
+par image. Langue "auto" : une bande de l'image est d'abord lue avec les packs
+par défaut, puis la page entière avec le seul pack de la langue détectée.
+"""
+import threading
 from io import BytesIO
 from typing import Optional
 
-def extract_text_from_blob(blob: bytes, mime: str) -> str:
-    """Renvoie le texte brut d’un blob image/pdf."""
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_OCR_LANG = "fra+eng"
+AUTO_LANG = "auto"
+QUICK_PASS_MIN_HEIGHT = 1200  # image plus petite : une seule passe avec les packs par défaut
+DEFAULT_TARGET_DPI = 300
+MAX_SIDE_NO_DPI = 3000  # photo sans résolution connue : grand côté ramené à cette taille
+SKEW_MAX_DEGREES = 5.0
+_tesseract_ok: Optional[bool] = None
+_installed: Optional[set] = None
+_engines = threading.local()
+
+
+def ocr_available() -> bool:
+    """tesserocr, ou pytesseract avec un binaire tesseract trouvé (vérifié une fois)."""
+    global _tesseract_ok
+    if _tesseract_ok is None:
+        try:
+            if TESSEROCR_AVAILABLE:
+                _tesseract_ok = bool(tesserocr.get_languages()[1])
+            else:
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                _tesseract_ok = True
+        except Exception:
+            _tesseract_ok = False
+    return _tesseract_ok
+
+
+def installed_langs() -> set:
+    """Packs de langue tesseract installés (ensemble vide si inconnus)."""
+    global _installed
+    if _installed is None:
+        try:
+            if TESSEROCR_AVAILABLE:
+                _installed = set(tesserocr.get_languages()[1])
+            else:
+                import pytesseract
+                _installed = set(pytesseract.get_languages(config=""))
+        except Exception:
+            _installed = set()
+    return _installed
+
+
+def lang_for_text(text: str, default: str = DEFAULT_OCR_LANG) -> str:
+    """Pack tesseract adapté à la langue de `text` (services.langid), sinon `default`."""
+    from .services import langid
+    return langid.tesseract_lang(langid.detect(text), installed_langs(), default)
+
+
+# ---------- prétraitement ----------
+def _downscale(img, target_dpi: int, source_dpi: Optional[float]):
+    from PIL import Image
+    if source_dpi is None:
+        dpi = img.info.get("dpi")
+        source_dpi = float(dpi[0]) if dpi and dpi[0] and dpi[0] > 1 else None
+    if source_dpi:
+        scale = target_dpi / source_dpi
+    else:
+        scale = MAX_SIDE_NO_DPI / max(img.size)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def _skew_angle(gray) -> float:
+    """Angle (degrés) qui maximise la variance des sommes de lignes de texte, sur une copie réduite."""
+    from PIL import Image
+    small = gray.copy()
+    small.thumbnail((800, 800))
+    ink = 255 - np.asarray(_adaptive_threshold(small, window=15), dtype=np.uint8)  # encre = 255
+    ink_img = Image.fromarray(ink)
+    def score(angle):
+        rows = np.asarray(ink_img.rotate(angle, resample=Image.NEAREST, fillcolor=0), dtype=np.float32).sum(axis=1)
+        return float(np.var(rows))
+
+    # 0° d'abord : une page vide ou sans lignes nettes n'est pas tournée
+    best, best_score = 0.0, score(0.0)
+    for step in range(int(-SKEW_MAX_DEGREES * 4), int(SKEW_MAX_DEGREES * 4) + 1):
+        angle = step / 4
+        value = score(angle) if step else best_score
+        if value > best_score * 1.01:
+            best, best_score = angle, value
+    return best
+
+
+def _adaptive_threshold(gray, window: int, offset: int = 10):
+    """Seuil local : pixel noir s'il est plus sombre que la moyenne de son voisinage moins `offset`
+    (tolère un éclairage inégal, contrairement au seuil global d'Otsu appliqué par tesseract)."""
+    from PIL import Image
+    a = np.asarray(gray, dtype=np.uint8)
+    r = max(1, window // 2)
+    win = 2 * r + 1
+    # Image intégrale en uint32 : le débordement est modulaire et les différences restent exactes
+    integral = np.pad(np.pad(a, r, mode="edge").astype(np.uint32), ((1, 0), (1, 0)))
+    integral = integral.cumsum(axis=0, dtype=np.uint32).cumsum(axis=1, dtype=np.uint32)
+    sums = integral[win:, win:] - integral[:-win, win:] - integral[win:, :-win] + integral[:-win, :-win]
+    mean = sums.astype(np.float32) / (win * win)
+    return Image.fromarray(np.where(a < mean - offset, 0, 255).astype(np.uint8))
+
+
+def preprocess_image(img, target_dpi: int = DEFAULT_TARGET_DPI, source_dpi: Optional[float] = None):
+    """Image prête pour l'OCR : orientation EXIF, réduction à `target_dpi`, niveaux de gris,
+    redressement (±5°) et seuillage adaptatif (ces deux étapes demandent numpy)."""
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(img)
+    img = _downscale(img, target_dpi, source_dpi)
+    gray = img.convert("L")
+    if not NUMPY_AVAILABLE:
+        return ImageOps.autocontrast(gray)
+    angle = _skew_angle(gray)
+    if abs(angle) >= 0.25:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return _adaptive_threshold(gray, window=max(15, target_dpi // 10))
+
+
+# ---------- moteur ----------
+def _engine(lang: str):
+    """API tesserocr du thread courant pour `lang` (modèles chargés une fois par langue)."""
+    apis = getattr(_engines, "apis", None)
+    if apis is None:
+        apis = _engines.apis = {}
+    if lang not in apis:
+        apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+    return apis[lang]
+
+
+def _recognize(img, lang: str) -> str:
+    if TESSEROCR_AVAILABLE:
+        api = _engine(lang)
+        api.SetImage(img)
+        return (api.GetUTF8Text() or "").strip()
+    import pytesseract
+    return pytesseract.image_to_string(img, lang=lang).strip()
+
+
+def ocr_image(img, lang: str = DEFAULT_OCR_LANG, preprocess: bool = True, source_dpi: Optional[float] = None) -> str:
+    """Texte d'une image PIL par tesseract (moteur persistant tesserocr, sinon pytesseract).
+    `source_dpi` : résolution connue de l'image (page de PDF rastérisée), sinon lue dans l'image.
+    `lang` = "auto" : pack choisi d'après une première lecture rapide d'une bande de l'image."""
+    if preprocess:
+        img = preprocess_image(img, source_dpi=source_dpi)
+    if lang != AUTO_LANG:
+        return _recognize(img, lang)
+    if img.height < QUICK_PASS_MIN_HEIGHT:
+        return _recognize(img, DEFAULT_OCR_LANG)
+    band = img.crop((0, img.height // 4, img.width, img.height // 2))
+    return _recognize(img, lang_for_text(_recognize(band, DEFAULT_OCR_LANG)))
+
+
+def extract_text_from_blob(blob: bytes, mime: str, progress=None, sha256: Optional[str] = None) -> str:
+    """Renvoie le texte brut d’un blob image/pdf.
+    PDF : extraction page par page (parallèle, pages mises en cache), `progress(pages, total)`.
+    PDF et images : texte repris du cache file_texts si le même contenu (`sha256`) a déjà été extrait."""
+    if mime == "application/pdf" or mime.startswith("image/"):
+        try:
+            from .services.extraction import extract_cached
+            return extract_cached(blob, mime, sha256, progress)
+        except Exception:
+            return ""
+    return extract_uncached(blob, mime, progress)
+
+
+def extract_uncached(blob: bytes, mime: str, progress=None, sha256: Optional[str] = None) -> str:
+    """Extraction effective, sans consulter le cache file_texts."""
     if mime == "application/pdf":
         try:
-            from pypdf import PdfReader
-            reader = PdfReader(BytesIO(blob))
-            parts = [pg.extract_text() or "" for pg in reader.pages]
-            return "\n".join(parts).strip()
+            from .services.extraction import extract_pdf_text
+            return extract_pdf_text(blob, sha256, progress=progress)
         except Exception:
             return ""
     if mime.startswith("image/"):
         try:
             from PIL import Image
-            import pytesseract
+            from .config import load_config
+            cfg = load_config()
             img = Image.open(BytesIO(blob))
-            return pytesseract.image_to_string(img, lang="fra+eng").strip()
+            return ocr_image(img, cfg.get("ocr_lang", AUTO_LANG), preprocess=bool(cfg.get("ocr_preprocess", True)))
         except Exception:
             return ""
     if mime.startswith("text/"):
@@ -5,61 +5,71 @@ import os
 from pathlib import Path
 from typing import Dict, Optional
 
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
-
 from .config import load_config
-from .ai import _ai_call, MODEL, ENDPOINT
+from .ai import ai_complete, get_ai_provider
+from .services.pdf_reader import PdfDoc, sample_pages
+from .services.summarize import condense_text
+from .services.telemetry import tracked
+
+MAX_OUTLINE_LINES = 40  # signets repris dans l'aperçu et le prompt
+
 
+def format_outline(outline, limit: int = MAX_OUTLINE_LINES) -> str:
+    """Plan du document, un signet par ligne, indenté selon son niveau."""
+    lines = [f"{'  ' * level}- {title}" + (f" (p. {page})" if page else "")
+             for level, title, page in outline[:limit] if title]
+    if len(outline) > limit:
+        lines.append("  …")
+    return "\n".join(lines)
 
-def extract_pdf_smart_preview(pdf_path: str, max_pages: int = 5) -> Dict[str, str]:
+
+def extract_pdf_smart_preview(pdf_path: str, max_pages: int = 5, full: bool = True,
+                              progress=None, data: Optional[bytes] = None, sha256: Optional[str] = None,
+                              full_text: Optional[str] = None) -> Dict[str, str]:
     """
     Extrait intelligemment les informations clés d'un PDF :
-    - Métadonnées (titre, auteur)
-    - Premières pages (max_pages)
+    - Métadonnées (titre, auteur) et plan (signets)
+    - Aperçu : premières pages (max_pages) + quelques pages réparties sur un long document,
+      lus par le moteur le plus rapide (services.pdf_reader)
+    - Texte intégral page par page si full=True (pour le résumé map-reduce), via
+      services.extraction : pages extraites en parallèle et gardées en cache (file_pages)
     - Informations structurelles
+    `data` : contenu déjà lu (le fichier n'est alors pas rouvert), `full_text` : texte déjà extrait.
     """
-    if not PDFPLUMBER_AVAILABLE:
+    cfg = load_config()
+    try:
+        with PdfDoc(data if data is not None else pdf_path) as doc:
+            meta = doc.metadata()
+            title = meta['title'] or Path(pdf_path).stem
+            total_pages = doc.page_count
+            outline = doc.outline()
+            spread = int(cfg.get('pdf_preview_spread', 3))
+            sampled = sample_pages(total_pages, max_pages, spread)
+            preview_text = '\n\n'.join(f"=== Page {no} ===\n{text}"
+                                        for no, text in ((no, doc.page_text(no)) for no in sampled) if text)
+            backend = doc.backend
+
+        if not full:
+            full_text = preview_text
+        elif full_text is None:
+            from .services.extraction import extract_pdf_text
+            blob = data if data is not None else Path(pdf_path).read_bytes()
+            full_text = extract_pdf_text(blob, sha256, progress=progress)
+            from .services.page_index import schedule
+            schedule()
+
         return {
-            'error': 'pdfplumber non disponible',
-            'title': Path(pdf_path).stem,
-            'preview_text': '',
-            'total_pages': 0
+            'title': title.strip(),
+            'author': meta['author'],
+            'subject': meta['subject'],
+            'outline': outline,
+            'sampled_pages': sampled,
+            'backend': backend,
+            'preview_text': preview_text,
+            'full_text': full_text,
+            'total_pages': total_pages,
+            'file_size_mb': round((len(data) if data is not None else os.path.getsize(pdf_path)) / (1024*1024), 2)
         }
-    
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Métadonnées
-            metadata = pdf.metadata or {}
-            title = metadata.get('Title', '') or Path(pdf_path).stem
-            author = metadata.get('Author', '')
-            subject = metadata.get('Subject', '')
-            
-            # Extraction des premières pages
-            text_parts = []
-            total_pages = len(pdf.pages)
-            
-            for i, page in enumerate(pdf.pages[:max_pages]):
-                try:
-                    page_text = page.extract_text() or ""
-                    if page_text.strip():
-                        text_parts.append(f"=== Page {i+1} ===\n{page_text.strip()}")
-                except Exception:
-                    continue
-            
-            preview_text = '\n\n'.join(text_parts)
-            
-            return {
-                'title': title.strip(),
-                'author': author.strip(),
-                'subject': subject.strip(),
-                'preview_text': preview_text,
-                'total_pages': total_pages,
-                'file_size_mb': round(os.path.getsize(pdf_path) / (1024*1024), 2)
-            }
             
     except Exception as e:
         return {
@@ -70,14 +80,16 @@ def extract_pdf_smart_preview(pdf_path: str, max_pages: int = 5) -> Dict[str, st
         }
 
 
-def ai_summarize_pdf_preview(pdf_info: Dict[str, str], lang: str = "fr") -> str:
+@tracked
+def ai_summarize_pdf_preview(pdf_info: Dict[str, str], lang: str = "fr", on_delta=None, cancel=None,
+                             progress=None) -> str:
     """
-    Génère un résumé IA intelligent basé sur l'aperçu du PDF
+    Génère un résumé IA intelligent basé sur le texte du PDF.
+    Un document trop long pour le budget de tokens est d'abord condensé en
+    map-reduce (services.summarize) ; progress(n, total) suit les sections résumées.
+    Les erreurs IA (réseau, HTTP, disjoncteur ouvert) sont levées : l'appelant garde le texte extrait.
     """
-    cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
-        raise RuntimeError("Clé API manquante (Options > IA)")
+    get_ai_provider("summary")  # erreur immédiate si non configuré
     
     if pdf_info.get('error'):
         return f"❌ Erreur d'analyse : {pdf_info['error']}"
@@ -87,7 +99,7 @@ def ai_summarize_pdf_preview(pdf_info: Dict[str, str], lang: str = "fr") -> str:
     author = pdf_info.get('author', '')
     subject = pdf_info.get('subject', '')
     total_pages = pdf_info.get('total_pages', 0)
-    preview_text = pdf_info.get('preview_text', '')
+    document_text = pdf_info.get('full_text') or pdf_info.get('preview_text', '')
     file_size = pdf_info.get('file_size_mb', 0)
     
     sys_content = f"""Tu es un assistant spécialisé dans l'analyse de documents PDF. 
@@ -109,29 +121,33 @@ Format de réponse attendu :
 **Utilité :** [Pourquoi ce document pourrait être intéressant]
 **Pertinence :** [Évaluation rapide : ⭐⭐⭐⭐⭐]"""
 
+    condensed_text = condense_text(document_text, lang=lang, cancel=cancel, progress=progress)
+    content_label = "Contenu du document (condensé par sections)" if condensed_text != document_text else "Contenu du document"
+    document_text = condensed_text
+    
     metadata_info = f"Titre: {title}"
     if author:
         metadata_info += f" | Auteur: {author}"
     if subject:
         metadata_info += f" | Sujet: {subject}"
     metadata_info += f" | Pages: {total_pages} | Taille: {file_size}MB"
+    outline = format_outline(pdf_info.get('outline') or [])
+    if outline:
+        metadata_info += f"\nPlan :\n{outline}"
     
     user_content = f"""Métadonnées du document :
 {metadata_info}
 
-Contenu des premières pages :
-{preview_text[:3000]}...
+{content_label} :
+{document_text}
 
 Génère le résumé structuré :"""
 
     sys = {"role": "system", "content": sys_content}
     user = {"role": "user", "content": user_content}
     
-    try:
-        summary = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
-        return summary.strip()
-    except Exception as e:
-        return f"❌ Erreur de résumé IA : {str(e)}"
+    summary = ai_complete([sys, user], "summary", on_delta=on_delta, cancel=cancel)
+    return summary.strip()
 
 
 def format_pdf_summary_for_editor(pdf_path: str, pdf_info: Dict[str, str], ai_summary: str, context: str = "new") -> str:
@@ -165,16 +181,21 @@ def format_pdf_summary_for_editor(pdf_path: str, pdf_info: Dict[str, str], ai_su
     return formatted
 
 
-def analyze_pdf_complete(pdf_path: str, lang: str = "fr", context: str = "new") -> Dict[str, str]:
+@tracked
+def analyze_pdf_complete(pdf_path: str, lang: str = "fr", context: str = "new", on_delta=None, cancel=None,
+                         progress=None, data: Optional[bytes] = None, sha256: Optional[str] = None,
+                         full_text: Optional[str] = None) -> Dict[str, str]:
     """
     Analyse complète d'un PDF : extraction + résumé IA + formatage
+    on_delta / cancel : résumé reçu en flux (voir ai.ai_complete) ; une erreur IA est levée
+    data / sha256 / full_text : contenu, empreinte et texte déjà connus (services.ingest)
     """
     # 1. Extraction intelligente
-    pdf_info = extract_pdf_smart_preview(pdf_path)
+    pdf_info = extract_pdf_smart_preview(pdf_path, data=data, sha256=sha256, full_text=full_text)
     
     # 2. Résumé IA
     if not pdf_info.get('error'):
-        ai_summary = ai_summarize_pdf_preview(pdf_info, lang)
+        ai_summary = ai_summarize_pdf_preview(pdf_info, lang, on_delta=on_delta, cancel=cancel, progress=progress)
     else:
         ai_summary = f"❌ Impossible d'analyser le PDF : {pdf_info['error']}"
     
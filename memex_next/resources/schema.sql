@@ -8,7 +8,8 @@ CREATE TABLE IF NOT EXISTS clips (
     summary TEXT,
     tags TEXT,
     categories TEXT,
-    read_later INTEGER DEFAULT 0
+    read_later INTEGER DEFAULT 0,
+    lang TEXT
 );
 CREATE INDEX IF NOT EXISTS idx_clips_ts ON clips(ts);
 
@@ -47,3 +48,202 @@ CREATE TABLE IF NOT EXISTS tasks (
 );
 CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
 CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(due_at);
+
+CREATE TABLE IF NOT EXISTS ai_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT,
+    created_at INTEGER,
+    last_used INTEGER,
+    hits INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used);
+
+CREATE TABLE IF NOT EXISTS chunk_summaries (
+    hash TEXT PRIMARY KEY,
+    model TEXT,
+    lang TEXT,
+    summary TEXT,
+    created_at INTEGER,
+    last_used INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS indexed_clips (
+    clip_id INTEGER PRIMARY KEY,
+    indexed_at INTEGER,
+    n_terms INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS clip_terms (
+    clip_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    tf INTEGER,
+    PRIMARY KEY (clip_id, term)
+);
+
+CREATE TABLE IF NOT EXISTS term_df (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_clips_unindex BEFORE DELETE ON clips BEGIN
+    UPDATE term_df SET df = df - 1 WHERE term IN (SELECT term FROM clip_terms WHERE clip_id = old.id);
+    DELETE FROM clip_terms WHERE clip_id = old.id;
+    DELETE FROM indexed_clips WHERE clip_id = old.id;
+END;
+
+CREATE TABLE IF NOT EXISTS classifier_model (
+    id INTEGER PRIMARY KEY,
+    categories TEXT,
+    data BLOB,
+    n_features INTEGER,
+    updated_at INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS classifier_clips (
+    clip_id INTEGER PRIMARY KEY,
+    categories TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ai_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,
+    site TEXT,
+    task TEXT,
+    provider TEXT,
+    model TEXT,
+    status INTEGER,
+    cached INTEGER DEFAULT 0,
+    stream INTEGER DEFAULT 0,
+    latency_ms REAL,
+    ttft_ms REAL,
+    prompt_tokens INTEGER DEFAULT 0,
+    cached_prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    error TEXT DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_ai_calls_ts ON ai_calls(ts);
+
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clip_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    title TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_passages_clip ON passages(clip_id);
+
+CREATE TABLE IF NOT EXISTS passage_clips (
+    clip_id INTEGER PRIMARY KEY,
+    hash TEXT,
+    indexed_at INTEGER
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(
+    title, text, content='passages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+-- Fréquence documentaire des termes de passages_fts (termes trop courants écartés des questions)
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_vocab USING fts5vocab(passages_fts, 'row');
+
+CREATE TRIGGER IF NOT EXISTS trg_passages_ai AFTER INSERT ON passages BEGIN
+    INSERT INTO passages_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_passages_ad AFTER DELETE ON passages BEGIN
+    INSERT INTO passages_fts(passages_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_clips_unpassage BEFORE DELETE ON clips BEGIN
+    DELETE FROM passages WHERE clip_id = old.id;
+    DELETE FROM passage_clips WHERE clip_id = old.id;
+END;
+
+CREATE TABLE IF NOT EXISTS file_pages (
+    sha256 TEXT NOT NULL,
+    page_no INTEGER NOT NULL,
+    text TEXT,
+    source TEXT DEFAULT 'text',
+    label TEXT,
+    PRIMARY KEY (sha256, page_no)
+);
+
+-- Texte des pages de PDF en plein texte (résultats de recherche au niveau de la page)
+CREATE VIRTUAL TABLE IF NOT EXISTS file_pages_fts USING fts5(
+    text, content='file_pages', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_file_pages_ai AFTER INSERT ON file_pages BEGIN
+    INSERT INTO file_pages_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_file_pages_ad AFTER DELETE ON file_pages BEGIN
+    INSERT INTO file_pages_fts(file_pages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_file_pages_au AFTER UPDATE OF text ON file_pages BEGIN
+    INSERT INTO file_pages_fts(file_pages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    INSERT INTO file_pages_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+
+-- Plan (signets) des PDF : niveau, titre et page cible, dans l'ordre du document
+CREATE TABLE IF NOT EXISTS file_outline (
+    sha256 TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    level INTEGER,
+    title TEXT,
+    page_no INTEGER,
+    PRIMARY KEY (sha256, seq)
+);
+
+-- PDF dont le plan et les libellés de pages ont été lus (services.page_index)
+CREATE TABLE IF NOT EXISTS pdf_index (
+    sha256 TEXT PRIMARY KEY,
+    pages INTEGER,
+    indexed_at INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_files_unpage AFTER DELETE ON files BEGIN
+    DELETE FROM file_pages WHERE sha256 = old.sha256;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_files_unoutline AFTER DELETE ON files BEGIN
+    DELETE FROM file_outline WHERE sha256 = old.sha256;
+    DELETE FROM pdf_index WHERE sha256 = old.sha256;
+END;
+
+-- Texte extrait d'une pièce jointe (OCR / PDF), réutilisé quand le même fichier est rejoint
+CREATE TABLE IF NOT EXISTS file_texts (
+    sha256 TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    mime TEXT,
+    text TEXT,
+    extracted_at INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_files_untext AFTER DELETE ON files BEGIN
+    DELETE FROM file_texts WHERE sha256 = old.sha256;
+END;
+
+-- Fichiers vus dans le dossier surveillé (services.watch_folder) : un fichier inchangé
+-- (taille, date de modification) n'est pas relu au démarrage suivant
+CREATE TABLE IF NOT EXISTS watched_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    sha256 TEXT,
+    clip_id INTEGER,
+    status TEXT,
+    seen_at INTEGER
+);
+
+-- Point de reprise des tâches longues (services.reindex) : dernier id traité et compteurs,
+-- écrits dans la même transaction que les résultats du lot
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    started_at INTEGER,
+    updated_at INTEGER,
+    finished_at INTEGER
+);
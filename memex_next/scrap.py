@@ -1,6 +1,7 @@
 ### memex_next/scrap.py
-import urllib.request, pathlib
+import pathlib
 from .config import SEPARATOR
+from .services.http_pool import request as http_request
 try:
     from bs4 import BeautifulSoup, Comment
 except Exception:
@@ -16,8 +17,10 @@ except Exception:
 
 def capture_article(url: str) -> tuple[str, str, str]:
     """Renvoie (html_raw, markdown, titre)."""
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    html = urllib.request.urlopen(req, timeout=20).read().decode("utf-8", errors="ignore")
+    resp = http_request("GET", url, headers={"User-Agent": "Mozilla/5.0"}, timeout=20, follow_redirects=True)
+    if resp.status >= 400:
+        raise RuntimeError(f"HTTP {resp.status}: {url}")
+    html = resp.text()
 
     # titre
     if BeautifulSoup:
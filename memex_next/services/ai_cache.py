@@ -0,0 +1,97 @@
+### memex_next/services/ai_cache.py
+"""
+Cache persistant (SQLite) des réponses IA, clé = hash(modèle, endpoint, messages normalisés, température).
+Éviction LRU bornée en taille + TTL.
+"""
+import hashlib, json, threading, time
+from typing import Optional
+from ..config import load_config
+from ..db import create_conn
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_DAYS = 30
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats() -> dict:
+    """Compteurs hits/misses/évictions depuis le démarrage + nombre d'entrées en base."""
+    with _stats_lock:
+        out = dict(_stats)
+    try:
+        conn = create_conn()
+        out["entries"] = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+        conn.close()
+    except Exception:
+        out["entries"] = 0
+    return out
+
+
+def is_enabled() -> bool:
+    return bool(load_config().get("ai_cache_enabled", True))
+
+
+def _normalize_text(s: str) -> str:
+    s = (s or "").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in s.strip().split("\n"))
+
+
+def cache_key(model: str, endpoint: str, messages: list, temperature: float) -> str:
+    norm = [{"role": (m.get("role") or "").strip().lower(), "content": _normalize_text(m.get("content", ""))}
+            for m in messages]
+    blob = json.dumps({"model": model, "endpoint": (endpoint or "").rstrip("/"), "messages": norm,
+                       "temperature": round(float(temperature), 3)}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    cfg = load_config()
+    ttl = int(float(cfg.get("ai_cache_ttl_days", DEFAULT_TTL_DAYS)) * 86400)
+    now = int(time.time())
+    try:
+        conn = create_conn()
+        row = conn.execute("SELECT response, created_at FROM ai_cache WHERE key=?", (key,)).fetchone()
+        if row and ttl > 0 and (row[1] or 0) + ttl < now:
+            conn.execute("DELETE FROM ai_cache WHERE key=?", (key,))
+            conn.commit()
+            row = None
+        if row:
+            conn.execute("UPDATE ai_cache SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+            conn.commit()
+        conn.close()
+    except Exception:
+        row = None
+    _count("hits" if row else "misses")
+    return row[0] if row else None
+
+
+def put(key: str, model: str, response: str):
+    max_entries = int(load_config().get("ai_cache_max_entries", DEFAULT_MAX_ENTRIES))
+    now = int(time.time())
+    try:
+        conn = create_conn()
+        conn.execute("INSERT OR REPLACE INTO ai_cache(key, model, response, created_at, last_used, hits) "
+                     "VALUES (?,?,?,?,?,0)", (key, model, response, now, now))
+        excess = conn.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0] - max(0, max_entries)
+        if excess > 0:
+            conn.execute("DELETE FROM ai_cache WHERE key IN "
+                         "(SELECT key FROM ai_cache ORDER BY last_used ASC LIMIT ?)", (excess,))
+            _count("evictions", excess)
+        conn.commit()
+        conn.close()
+    except Exception:
+        pass
+
+
+def clear() -> int:
+    conn = create_conn()
+    n = conn.execute("DELETE FROM ai_cache").rowcount
+    conn.commit()
+    conn.close()
+    return n
@@ -0,0 +1,192 @@
+### memex_next/services/bulk_ai.py
+"""
+Moteur d'enrichissement IA en masse : concurrence bornée, limiteur de débit
+(requêtes/min et tokens/min), retry avec backoff aléatoire sur 429/5xx,
+erreurs capturées par élément et écritures groupées (executemany).
+"""
+import random, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..ai import AIHTTPError, AIConnectionError, AICircuitOpen, estimate_tokens, pack_by_token_budget
+from ..config import load_config
+from ..db import create_conn
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+DEFAULT_BATCH_TOKEN_BUDGET = 1500
+DEFAULT_SHORT_CHARS = 800
+
+
+class TokenBucket:
+    """Seau à jetons rechargé en continu (`rate_per_min` jetons par minute)."""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = float(rate_per_min) / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_min)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0):
+        """Bloque jusqu'à disposer de `n` jetons (plafonné à la capacité du seau)."""
+        n = min(float(n), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+
+class RateLimiter:
+    """Combine une limite en requêtes/min et une limite en tokens/min (0 = illimité)."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm) if rpm and rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm and tpm > 0 else None
+
+    def acquire(self, tokens: int = 0):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+
+
+def is_retryable(err: Exception) -> bool:
+    if isinstance(err, AIHTTPError):
+        return err.status in RETRYABLE_STATUS
+    return isinstance(err, AIConnectionError)
+
+
+def call_with_retry(fn: Callable[[], Any], retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                    sleep: Callable[[float], None] = time.sleep) -> Any:
+    """Appelle `fn` et réessaie les erreurs transitoires (backoff exponentiel « full jitter »)."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                delay = max(delay, min(float(retry_after), max_delay))
+            sleep(delay)
+            attempt += 1
+
+
+@dataclass
+class BulkResult:
+    done: int = 0
+    failed: Dict[Any, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        msg = f"{self.done} éléments"
+        if self.failed:
+            msg += f", {len(self.failed)} en erreur"
+        return msg
+
+
+class BulkEnricher:
+    """Applique une fonction IA à une liste d'éléments (id, texte) et écrit les résultats par lots."""
+
+    def __init__(self, concurrency: Optional[int] = None, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 retries: Optional[int] = None, batch_size: int = 50,
+                 progress: Optional[Callable[[int, int], None]] = None):
+        cfg = load_config()
+        self.concurrency = max(1, int(concurrency if concurrency is not None else cfg.get("ai_bulk_concurrency", 4)))
+        self.limiter = RateLimiter(rpm if rpm is not None else float(cfg.get("ai_rpm", 60)),
+                                   tpm if tpm is not None else float(cfg.get("ai_tpm", 0)))
+        self.retries = int(retries if retries is not None else cfg.get("ai_max_retries", 4))
+        self.batch_size = max(1, batch_size)
+        self.progress = progress
+        self._tripped: Optional[AICircuitOpen] = None
+
+    def _process(self, pairs, unit_fn):
+        def attempt():
+            if self._tripped is not None:
+                raise self._tripped  # disjoncteur ouvert : le reste du lot échoue sans attendre le limiteur
+            self.limiter.acquire(sum(estimate_tokens(t) for _, t in pairs))
+            return unit_fn(pairs)
+        try:
+            return call_with_retry(attempt, retries=self.retries)
+        except AICircuitOpen as e:
+            self._tripped = e
+            raise
+
+    def run(self, items: Iterable[Tuple[Any, str]], fn: Callable[[Any, str], Any],
+            write_sql: str, to_params: Callable[[Any, Any], Optional[tuple]]) -> BulkResult:
+        """`fn(id, texte)` produit une valeur ; `to_params(id, valeur)` donne les paramètres de `write_sql`
+        (None pour ne rien écrire)."""
+        units = [([(i, t)], lambda pairs: {pairs[0][0]: fn(*pairs[0])}) for i, t in items]
+        return self._run_units(units, write_sql, to_params)
+
+    def run_packed(self, items: Iterable[Tuple[Any, str]], batch_fn: Callable[[list], Dict[Any, Any]],
+                   fn: Callable[[Any, str], Any], write_sql: str, to_params: Callable[[Any, Any], Optional[tuple]],
+                   short_chars: Optional[int] = None, token_budget: Optional[int] = None) -> BulkResult:
+        """Comme `run`, mais les textes courts sont regroupés par `batch_fn([(id, texte), ...]) -> {id: valeur}`
+        dans la limite de `token_budget` tokens par requête ; les textes longs restent unitaires."""
+        cfg = load_config()
+        short_chars = int(short_chars if short_chars is not None else cfg.get("ai_batch_short_chars", DEFAULT_SHORT_CHARS))
+        token_budget = int(token_budget if token_budget is not None else cfg.get("ai_batch_token_budget", DEFAULT_BATCH_TOKEN_BUDGET))
+        items = list(items)
+        short = [(i, t) for i, t in items if len(t) <= short_chars]
+        units = [(pairs, batch_fn) for pairs in pack_by_token_budget(short, token_budget)]
+        units += [([(i, t)], lambda pairs: {pairs[0][0]: fn(*pairs[0])}) for i, t in items if len(t) > short_chars]
+        return self._run_units(units, write_sql, to_params)
+
+    def _run_units(self, units: List[tuple], write_sql: str, to_params) -> BulkResult:
+        result = BulkResult()
+        self._tripped = None
+        start = time.perf_counter()
+        total = sum(len(pairs) for pairs, _ in units)
+        pending: List[tuple] = []
+        conn = create_conn()
+
+        def flush():
+            if pending:
+                conn.executemany(write_sql, pending)
+                conn.commit()
+                pending.clear()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = {pool.submit(self._process, pairs, unit_fn): pairs for pairs, unit_fn in units}
+                n = 0
+                for fut in as_completed(futures):
+                    pairs = futures[fut]
+                    try:
+                        values = fut.result()
+                    except Exception as e:
+                        values = {}
+                        for item_id, _ in pairs:
+                            result.failed[item_id] = str(e)
+                    for item_id, _ in pairs:
+                        if item_id in result.failed:
+                            continue
+                        try:
+                            if item_id not in values:
+                                raise RuntimeError("absent de la réponse IA")
+                            params = to_params(item_id, values[item_id])
+                            if params is not None:
+                                pending.append(params)
+                            result.done += 1
+                        except Exception as e:
+                            result.failed[item_id] = str(e)
+                    n += len(pairs)
+                    if len(pending) >= self.batch_size:
+                        flush()
+                    if self.progress:
+                        self.progress(n, total)
+            flush()
+        finally:
+            conn.close()
+        result.elapsed = time.perf_counter() - start
+        return result
@@ -0,0 +1,119 @@
+### memex_next/services/circuit.py
+"""
+Disjoncteur par fournisseur IA : après N échecs consécutifs (réseau, 5xx,
+clé refusée), les appels échouent immédiatement au lieu d'attendre chacun
+leur timeout. Passé le délai de pause, un seul appel d'essai (« semi-ouvert »)
+est laissé passer : succès -> refermé, échec -> rouvert pour un délai doublé.
+"""
+import threading, time
+from typing import Callable, Dict, Optional
+
+from ..config import load_config
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+DEFAULT_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+MAX_COOLDOWN = 300.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Appel refusé sans requête : le fournisseur IA est considéré indisponible."""
+
+    def __init__(self, name: str, failures: int, last_error: str, retry_in: float):
+        super().__init__(f"Service IA « {name} » indisponible ({failures} échec(s) consécutif(s) : {last_error}) "
+                         f"— nouvel essai dans {max(0, round(retry_in))} s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int = DEFAULT_THRESHOLD, cooldown: float = DEFAULT_COOLDOWN,
+                 max_cooldown: float = MAX_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.threshold = max(1, int(threshold))
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = max(float(max_cooldown), self.base_cooldown)
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = ""
+        self._cooldown = self.base_cooldown
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before(self):
+        """À appeler avant chaque requête ; lève CircuitOpenError si elle ne doit pas partir."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + self._cooldown - self.clock()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True  # cet appel sert d'essai ; les autres attendent son issue
+                return
+            raise CircuitOpenError(self.name, self.failures, self.last_error, retry_in)
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._cooldown = self.base_cooldown
+            self._probing = False
+
+    def release(self):
+        """Appel terminé sans verdict sur le fournisseur (annulation, erreur locale) : libère
+        l'essai éventuel sans changer l'état ; l'appel suivant servira d'essai."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self, err: Exception, fatal: bool = False):
+        """Échec imputable au fournisseur ; `fatal` (clé refusée) ouvre le circuit sans attendre le seuil."""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(err)[:200]
+            if self.state == HALF_OPEN:
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+            if self.state == HALF_OPEN or fatal or self.failures >= self.threshold:
+                self.state = OPEN
+                self._opened_at = self.clock()
+            self._probing = False
+
+    def reset(self):
+        self.success()
+
+    def info(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self._opened_at + self._cooldown - self.clock()) if self.state != CLOSED else 0.0
+            return {"name": self.name, "state": self.state, "failures": self.failures,
+                    "last_error": self.last_error, "retry_in": retry_in}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, cfg: Optional[dict] = None) -> CircuitBreaker:
+    """Disjoncteur partagé d'un fournisseur (options `ai_circuit_threshold` / `ai_circuit_cooldown`)."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            cfg = cfg if cfg is not None else load_config()
+            breaker = CircuitBreaker(name, threshold=int(cfg.get("ai_circuit_threshold", DEFAULT_THRESHOLD)),
+                                     cooldown=float(cfg.get("ai_circuit_cooldown", DEFAULT_COOLDOWN)))
+            _breakers[name] = breaker
+        return breaker
+
+
+def states() -> Dict[str, dict]:
+    """État de tous les disjoncteurs créés (affichage dans l'interface)."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.info() for b in breakers}
+
+
+def reset_all():
+    """Referme tous les disjoncteurs et relit leurs réglages (après modification des options)."""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,312 @@
+### memex_next/services/classifier.py
+"""
+Classifieur local de catégories : Bayes naïf multinomial sur termes hachés
+(NumPy), entraîné sur les clips déjà catégorisés et mis à jour à chaque
+enregistrement. Il ne répond que s'il est assez sûr de lui ; sinon l'appelant
+se replie sur l'API.
+"""
+import io, json, random, threading, time, zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ..config import load_config
+from ..db import create_conn
+from .local_tagger import content_terms
+
+DEFAULT_FEATURES = 1 << 16
+DEFAULT_THRESHOLD = 0.8
+MIN_CLASS_DOCS = 5
+ALPHA = 0.1
+SAVE_DELAY = 10.0
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def split_categories(value: str) -> List[str]:
+    return list(dict.fromkeys(p.strip() for p in (value or "").replace(";", ",").split(",") if p.strip()))
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(term: str, n_features: int) -> int:
+    return zlib.crc32(term.encode("utf-8")) % n_features
+
+
+def featurize(terms: Dict[str, int], n_features: int):
+    """Termes -> (indices de buckets, comptes) agrégés."""
+    acc = Counter()
+    for term, n in terms.items():
+        acc[_bucket(term, n_features)] += n
+    idx = np.fromiter(acc.keys(), dtype=np.int64, count=len(acc))
+    cnt = np.fromiter(acc.values(), dtype=np.float64, count=len(acc))
+    return idx, cnt
+
+
+@dataclass
+class Prediction:
+    categories: List[str]
+    confidence: float
+    probabilities: Dict[str, float] = field(default_factory=dict)
+    confident: bool = False
+
+
+class NaiveBayesModel:
+    """Comptes par (catégorie, bucket) ; les catégories apparaissent au fil des exemples."""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES):
+        self.n_features = int(n_features)
+        self.categories: List[str] = []
+        self.counts = np.zeros((0, self.n_features), dtype=np.float32)
+        self.class_docs = np.zeros(0, dtype=np.float64)
+        self.lock = threading.RLock()
+
+    def _class_index(self, cat: str) -> int:
+        try:
+            return self.categories.index(cat)
+        except ValueError:
+            self.categories.append(cat)
+            self.counts = np.vstack([self.counts, np.zeros((1, self.n_features), dtype=np.float32)])
+            self.class_docs = np.append(self.class_docs, 0.0)
+            return len(self.categories) - 1
+
+    def add(self, terms: Dict[str, int], categories: List[str], weight: float = 1.0):
+        """Ajoute (weight=1) ou retire (weight=-1) la contribution d'un document."""
+        if not terms or not categories:
+            return
+        idx, cnt = featurize(terms, self.n_features)
+        with self.lock:
+            for cat in categories:
+                c = self._class_index(cat)
+                np.add.at(self.counts[c], idx, (cnt * weight).astype(np.float32))
+                self.class_docs[c] += weight
+            np.maximum(self.counts, 0, out=self.counts)
+            np.maximum(self.class_docs, 0, out=self.class_docs)
+
+    def predict_proba(self, terms: Dict[str, int], allowed: Optional[List[str]] = None) -> Dict[str, float]:
+        with self.lock:
+            rows = [i for i, c in enumerate(self.categories)
+                    if self.class_docs[i] >= MIN_CLASS_DOCS and (allowed is None or c in allowed)]
+            if not rows or not terms:
+                return {}
+            idx, cnt = featurize(terms, self.n_features)
+            counts = self.counts[rows]
+            totals = counts.sum(axis=1, dtype=np.float64)
+            docs = self.class_docs[rows]
+            log_prior = np.log(docs / docs.sum())
+            log_lik = (np.log(counts[:, idx].astype(np.float64) + ALPHA)
+                       - np.log(totals + ALPHA * self.n_features)[:, None]) @ cnt
+        scores = log_prior + log_lik
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        return {self.categories[r]: float(p) for r, p in zip(rows, probs)}
+
+    # ---------- persistance ----------
+    def to_blob(self) -> bytes:
+        buf = io.BytesIO()
+        with self.lock:
+            np.savez_compressed(buf, counts=self.counts, class_docs=self.class_docs)
+        return buf.getvalue()
+
+    @classmethod
+    def from_row(cls, categories_json: str, blob: bytes, n_features: int) -> "NaiveBayesModel":
+        model = cls(n_features)
+        data = np.load(io.BytesIO(blob))
+        model.categories = json.loads(categories_json)
+        model.counts = data["counts"].astype(np.float32)
+        model.class_docs = data["class_docs"].astype(np.float64)
+        return model
+
+
+_model: Optional[NaiveBayesModel] = None
+_model_lock = threading.Lock()
+_save_timer: Optional[threading.Timer] = None
+
+
+def _n_features() -> int:
+    return int(load_config().get("classifier_features", DEFAULT_FEATURES))
+
+
+def get_model() -> Optional[NaiveBayesModel]:
+    """Modèle chargé depuis la base, ou entraîné à la première utilisation."""
+    global _model
+    if np is None:
+        return None
+    with _model_lock:
+        if _model is not None:
+            return _model
+        conn = create_conn()
+        try:
+            row = conn.execute("SELECT categories, data, n_features FROM classifier_model WHERE id=1").fetchone()
+        finally:
+            conn.close()
+        if row and row[2] == _n_features():
+            try:
+                _model = NaiveBayesModel.from_row(row[0], row[1], row[2])
+                return _model
+            except Exception:
+                pass
+    model = train()
+    with _model_lock:
+        _model = model
+    return model
+
+
+def save_model(model: Optional[NaiveBayesModel] = None):
+    model = model or _model
+    if model is None:
+        return
+    with model.lock:
+        cats, blob = json.dumps(model.categories, ensure_ascii=False), model.to_blob()
+    conn = create_conn()
+    conn.execute("INSERT OR REPLACE INTO classifier_model(id, categories, data, n_features, updated_at) "
+                 "VALUES (1,?,?,?,?)", (cats, blob, model.n_features, int(time.time())))
+    conn.commit()
+    conn.close()
+
+
+def _schedule_save():
+    """Écriture différée : plusieurs enregistrements rapprochés ne réécrivent le modèle qu'une fois."""
+    global _save_timer
+    with _model_lock:
+        if _save_timer is not None:
+            return
+        def run():
+            global _save_timer
+            with _model_lock:
+                _save_timer = None
+            save_model()
+        _save_timer = threading.Timer(SAVE_DELAY, run)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+
+def _labelled_docs(conn, where: str = "", params: tuple = ()):
+    """{clip_id: (Counter de termes, [catégories])} des clips catégorisés et indexés."""
+    docs = {}
+    for clip_id, cats in conn.execute(
+            f"SELECT c.id, c.categories FROM clips c JOIN indexed_clips i ON i.clip_id = c.id "
+            f"WHERE c.categories IS NOT NULL AND c.categories <> '' {where}", params):
+        labels = split_categories(cats)
+        if labels:
+            docs[clip_id] = (Counter(), labels)
+    for clip_id, term, tf in conn.execute("SELECT clip_id, term, tf FROM clip_terms"):
+        doc = docs.get(clip_id)
+        if doc is not None:
+            doc[0][term] = tf or 1
+    return docs
+
+
+def train(n_features: Optional[int] = None, persist: bool = True) -> Optional[NaiveBayesModel]:
+    """Réentraîne depuis zéro sur tous les clips catégorisés (et resynchronise classifier_clips)."""
+    if np is None:
+        return None
+    model = NaiveBayesModel(n_features or _n_features())
+    conn = create_conn()
+    try:
+        docs = _labelled_docs(conn)
+        for terms, labels in docs.values():
+            model.add(terms, labels)
+        conn.execute("DELETE FROM classifier_clips")
+        conn.executemany("INSERT INTO classifier_clips(clip_id, categories) VALUES (?,?)",
+                         [(cid, ", ".join(labels)) for cid, (_, labels) in docs.items()])
+        conn.commit()
+    finally:
+        conn.close()
+    if persist:
+        save_model(model)
+    return model
+
+
+def observe(conn, clip_id: int, old_terms: Dict[str, int], new_terms: Dict[str, int], categories: str):
+    """Mise à jour en ligne après enregistrement d'un clip : retire son ancienne contribution
+    (termes + catégories précédents) et ajoute la nouvelle."""
+    model = _model  # pas de chargement/entraînement ici : le modèle sera construit à la demande
+    if model is None:
+        return
+    row = conn.execute("SELECT categories FROM classifier_clips WHERE clip_id=?", (clip_id,)).fetchone()
+    old_labels = split_categories(row[0]) if row else []
+    new_labels = split_categories(categories)
+    if old_labels == new_labels and dict(old_terms) == dict(new_terms):
+        return
+    if old_labels:
+        model.add(old_terms, old_labels, weight=-1.0)
+    if new_labels and new_terms:
+        model.add(new_terms, new_labels)
+        conn.execute("INSERT OR REPLACE INTO classifier_clips(clip_id, categories) VALUES (?,?)",
+                     (clip_id, ", ".join(new_labels)))
+    else:
+        conn.execute("DELETE FROM classifier_clips WHERE clip_id=?", (clip_id,))
+    _schedule_save()
+
+
+def predict(text: str, user_cats: List[str], max_n: int = 2, threshold: Optional[float] = None) -> Optional[Prediction]:
+    """Catégories probables parmi `user_cats` ; `confident` si la meilleure dépasse le seuil
+    (option `classifier_threshold`). None si le classifieur est indisponible ou sans données."""
+    if np is None or not user_cats:
+        return None
+    model = get_model()
+    if model is None:
+        return None
+    if threshold is None:
+        threshold = float(load_config().get("classifier_threshold", DEFAULT_THRESHOLD))
+    by_lower = {c.lower(): c for c in user_cats}
+    allowed = [c for c in model.categories if c.lower() in by_lower]
+    probs = model.predict_proba(content_terms(text), allowed)
+    if not probs:
+        return None
+    ranked = sorted(probs.items(), key=lambda kv: -kv[1])
+    top_cat, top_p = ranked[0]
+    chosen = [top_cat] + [c for c, p in ranked[1:max_n] if p >= threshold / 2]
+    return Prediction(categories=[by_lower[c.lower()] for c in chosen][:max_n], confidence=top_p,
+                      probabilities=dict(ranked), confident=top_p >= threshold)
+
+
+def evaluate(holdout: float = 0.2, threshold: Optional[float] = None, seed: int = 42) -> dict:
+    """Précision sur des clips mis de côté (modèle entraîné sur les autres).
+    accuracy : la catégorie prédite fait partie des catégories réelles ;
+    coverage : part des clips où le modèle est assez sûr ; confident_accuracy : précision sur ceux-là."""
+    if np is None:
+        raise RuntimeError("NumPy non disponible")
+    if threshold is None:
+        threshold = float(load_config().get("classifier_threshold", DEFAULT_THRESHOLD))
+    conn = create_conn()
+    try:
+        docs = _labelled_docs(conn)
+    finally:
+        conn.close()
+    ids = sorted(docs)
+    random.Random(seed).shuffle(ids)
+    n_test = max(1, int(len(ids) * holdout)) if len(ids) > 1 else 0
+    test, train_ids = ids[:n_test], ids[n_test:]
+    model = NaiveBayesModel(_n_features())
+    for cid in train_ids:
+        model.add(*docs[cid])
+    correct = confident = confident_correct = evaluated = 0
+    for cid in test:
+        terms, labels = docs[cid]
+        probs = model.predict_proba(terms)
+        if not probs:
+            continue
+        evaluated += 1
+        top_cat, top_p = max(probs.items(), key=lambda kv: kv[1])
+        hit = top_cat in labels
+        correct += hit
+        if top_p >= threshold:
+            confident += 1
+            confident_correct += hit
+    return {
+        "train": len(train_ids),
+        "test": evaluated,
+        "accuracy": correct / evaluated if evaluated else 0.0,
+        "coverage": confident / evaluated if evaluated else 0.0,
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+        "threshold": threshold,
+    }
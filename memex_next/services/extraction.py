@@ -0,0 +1,425 @@
+### memex_next/services/extraction.py
+"""
+Extraction du texte des pièces jointes PDF page par page : les pages sont
+réparties par tranches entre plusieurs processus, chaque page extraite est
+écrite aussitôt dans file_pages (clé : sha256 du fichier, numéro de page).
+Une réextraction ne traite que les pages absentes de la table ; le texte
+assemblé garde les marqueurs « === Page N === » pour situer un passage.
+Les pages sans couche texte (numérisées) sont rastérisées puis passées à
+l'OCR dans le même pool et fusionnées avec les autres.
+Le texte final d'une pièce jointe (PDF ou image) est gardé dans file_texts
+avec la version de l'extracteur : rejoindre le même fichier est immédiat, et
+augmenter EXTRACTOR_VERSION fait réextraire les anciens résultats en tâche de fond.
+"""
+import atexit, hashlib, multiprocessing, os, tempfile, threading, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config import load_config, SEPARATOR
+from ..db import create_conn
+
+DEFAULT_PARALLEL_MIN_PAGES = 16
+PAGES_PER_TASK = 8
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_MIN_CHARS = 20  # en dessous : page considérée sans couche texte (numérisée)
+# À augmenter quand l'extraction ou l'OCR change de résultat : les textes en cache d'une version
+# antérieure sont alors réextraits par refresh_stale
+EXTRACTOR_VERSION = 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def get_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Pool de processus partagé (créé à la première grosse extraction, option `pdf_workers`)."""
+    global _pool, _pool_workers
+    workers = max(1, int(workers or load_config().get("pdf_workers", 0) or default_workers()))
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn : pas de fork d'un processus qui porte Tk et des threads
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+# ---------- travail d'un processus ----------
+_worker_reader: Tuple[tuple, object] = ((), None)
+
+
+def _reader(source):
+    """PdfReader de `source` (chemin ou octets) ; un processus garde celui du dernier fichier lu,
+    les tranches suivantes du même PDF évitent ainsi de réanalyser sa structure. La clé comprend
+    l'identité du fichier : un fichier temporaire qui reprend le chemin d'un autre est relu.
+    PdfReader charge le fichier en mémoire, sans le garder ouvert."""
+    global _worker_reader
+    from pypdf import PdfReader
+    if not isinstance(source, str):
+        return PdfReader(BytesIO(source))
+    st = os.stat(source)
+    key = (source, st.st_ino, st.st_size, st.st_mtime_ns)
+    if _worker_reader[0] != key:
+        _worker_reader = (key, PdfReader(source))
+    return _worker_reader[1]
+
+
+def _extract_pages(source, page_nos: List[int]) -> List[Tuple[int, str]]:
+    """Texte des pages `page_nos` (numérotées à partir de 1) ; `source` = chemin ou octets du PDF."""
+    reader = _reader(source)
+    out = []
+    for no in page_nos:
+        try:
+            text = reader.pages[no - 1].extract_text() or ""
+        except Exception:
+            text = ""
+        out.append((no, text.strip()))
+    return out
+
+
+def _ocr_pages(source, page_nos: List[int], dpi: int, lang: str, preprocess: bool = True) -> List[Tuple[int, str]]:
+    """Rastérise les pages `page_nos` à `dpi` (pypdfium2) et les passe à l'OCR.
+    Document ouvert et fermé à chaque tâche : pdfium garde le fichier ouvert, ce qui empêcherait
+    sous Windows de supprimer le fichier temporaire (_spill) ; l'OCR d'une page coûte bien plus."""
+    import pypdfium2 as pdfium
+    from ..ocr import ocr_image
+    from .pdf_reader import pdfium_lock
+    with pdfium_lock:
+        doc = pdfium.PdfDocument(source)
+    out = []
+    try:
+        for no in page_nos:
+            try:
+                with pdfium_lock:
+                    img = doc[no - 1].render(scale=dpi / 72).to_pil()
+                text = ocr_image(img, lang, preprocess=preprocess, source_dpi=dpi)
+            except Exception:
+                text = ""
+            out.append((no, text))
+    finally:
+        with pdfium_lock:
+            doc.close()
+    return out
+
+
+def _page_count(blob: bytes) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(BytesIO(blob)).pages)
+
+
+def _can_ocr() -> bool:
+    from ..ocr import ocr_available
+    try:
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return ocr_available()
+
+
+# ---------- table file_pages ----------
+def stored_pages(sha256: str, conn=None) -> Dict[int, Tuple[str, str]]:
+    """{numéro de page: (texte, origine 'text' | 'ocr')} déjà extraits pour ce fichier."""
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        rows = conn.execute("SELECT page_no, text, source FROM file_pages WHERE sha256=?", (sha256,)).fetchall()
+        return {no: (text or "", source or "text") for no, text, source in rows}
+    finally:
+        if own: conn.close()
+
+
+def _store(conn, sha256: str, pages: List[Tuple[int, str]], source: str = "text"):
+    # upsert plutôt que REPLACE : les triggers de file_pages_fts voient la mise à jour
+    conn.executemany("INSERT INTO file_pages(sha256, page_no, text, source) VALUES (?,?,?,?) "
+                     "ON CONFLICT(sha256, page_no) DO UPDATE SET text=excluded.text, source=excluded.source",
+                     [(sha256, no, text, source) for no, text in pages])
+    conn.commit()
+
+
+def join_pages(pages: Dict[int, str]) -> str:
+    """Texte complet, une section « === Page N === » par page non vide (format de pdf_analyzer)."""
+    return "\n\n".join(f"=== Page {no} ===\n{pages[no]}" for no in sorted(pages) if pages[no])
+
+
+# ---------- extraction ----------
+def _run(tasks: List[List[int]], fn, args: tuple, source, parallel: bool, on_done):
+    """Exécute `fn(source, pages, *args)` pour chaque tranche, dans le pool si `parallel`,
+    et transmet chaque résultat à `on_done` dès qu'il arrive."""
+    if not parallel:
+        for part in tasks:
+            on_done(fn(source, part, *args))
+        return
+    pool = get_pool()
+    futures = [pool.submit(fn, source, part, *args) for part in tasks]
+    for fut in as_completed(futures):
+        on_done(fut.result())
+
+
+def extract_pdf_pages(blob: bytes, sha256: Optional[str] = None,
+                      progress: Optional[Callable[[int, int], None]] = None) -> Dict[int, str]:
+    """{numéro de page: texte} d'un PDF. Les pages déjà en base sont reprises telles quelles ;
+    les autres sont extraites (en parallèle au-delà de `pdf_parallel_min_pages` pages) et
+    enregistrées au fil de l'eau. Les pages sans couche texte (PDF numérisés) passent ensuite
+    à l'OCR, une page par tâche (options `pdf_ocr_enabled`, `ocr_dpi`, `ocr_lang`, "auto" par défaut).
+    `progress(étapes faites, total)` est appelé depuis ce thread ; le total inclut les pages à OCR."""
+    sha256 = sha256 or hashlib.sha256(blob).hexdigest()
+    total = _page_count(blob)
+    cfg = load_config()
+    min_chars = int(cfg.get("ocr_min_chars", DEFAULT_OCR_MIN_CHARS))
+    conn = create_conn()
+    path = None
+    try:
+        known = {no: v for no, v in stored_pages(sha256, conn).items() if no <= total}
+        pages = {no: text for no, (text, _) in known.items()}
+        missing = [no for no in range(1, total + 1) if no not in known]
+        state = {"done": len(known), "total": total}
+
+        def report():
+            if progress:
+                progress(state["done"], state["total"])
+
+        def stored(source):
+            def on_done(result):
+                pages.update(result)
+                _store(conn, sha256, result, source)
+                state["done"] += len(result)
+                report()
+            return on_done
+
+        report()
+        parallel = len(missing) >= int(cfg.get("pdf_parallel_min_pages", DEFAULT_PARALLEL_MIN_PAGES))
+        if parallel:
+            path = _spill(blob)  # les processus relisent le fichier plutôt que de recevoir le blob à chaque tranche
+        _run([missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)],
+             _extract_pages, (), path or blob, parallel, stored("text"))
+
+        # Pages sans texte exploitable et jamais passées à l'OCR
+        scanned = [no for no in range(1, total + 1)
+                   if len(pages.get(no, "")) < min_chars and known.get(no, ("", "text"))[1] != "ocr"]
+        if scanned and cfg.get("pdf_ocr_enabled", True) and _can_ocr():
+            state["total"] += len(scanned)
+            report()
+            parallel = len(scanned) > 1
+            if parallel and path is None:
+                path = _spill(blob)
+            dpi = int(cfg.get("ocr_dpi", DEFAULT_OCR_DPI))
+            from ..ocr import AUTO_LANG, DEFAULT_OCR_LANG, lang_for_text
+            lang = cfg.get("ocr_lang", AUTO_LANG)
+            if lang == AUTO_LANG:
+                # la couche texte des autres pages donne la langue du document ; sans elle, chaque page la détecte
+                text = join_pages(pages)
+                lang = lang_for_text(text, DEFAULT_OCR_LANG) if len(text) >= 200 else AUTO_LANG
+            preprocess = bool(cfg.get("ocr_preprocess", True))
+            _run([[no] for no in scanned], _ocr_pages, (dpi, lang, preprocess), path or blob, parallel, stored("ocr"))
+        return pages
+    finally:
+        conn.close()
+        if path:
+            try: os.remove(path)
+            except OSError: pass
+
+
+def _spill(blob: bytes) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(blob)
+    return path
+
+
+def extract_pdf_text(blob: bytes, sha256: Optional[str] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> str:
+    return join_pages(extract_pdf_pages(blob, sha256, progress)).strip()
+
+
+# ---------- cache du texte extrait (file_texts) ----------
+def cached_text(sha256: str, conn=None) -> Optional[str]:
+    """Texte déjà extrait de ce fichier par la version courante de l'extracteur, sinon None."""
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        row = conn.execute("SELECT text FROM file_texts WHERE sha256=? AND version=?",
+                           (sha256, EXTRACTOR_VERSION)).fetchone()
+        return row[0] if row else None
+    finally:
+        if own: conn.close()
+
+
+def _forget_stale(conn, sha256: str):
+    """Pages d'une version antérieure : à refaire entièrement plutôt qu'à compléter."""
+    row = conn.execute("SELECT version FROM file_texts WHERE sha256=?", (sha256,)).fetchone()
+    if row and row[0] != EXTRACTOR_VERSION:
+        conn.execute("DELETE FROM file_pages WHERE sha256=?", (sha256,))
+        conn.execute("DELETE FROM pdf_index WHERE sha256=?", (sha256,))  # libellés de pages à relire
+        conn.commit()
+
+
+def _store_text(conn, sha256: str, mime: str, text: str):
+    conn.execute("INSERT OR REPLACE INTO file_texts(sha256, version, mime, text, extracted_at) VALUES (?,?,?,?,?)",
+                 (sha256, EXTRACTOR_VERSION, mime, text, int(time.time())))
+    conn.commit()
+
+
+def extract_cached(blob: bytes, mime: str, sha256: Optional[str] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Texte d'un PDF ou d'une image, repris de file_texts si ce contenu a déjà été extrait.
+    Un résultat vide n'est pas gardé (OCR indisponible : nouvel essai au prochain ajout)."""
+    from ..ocr import extract_uncached
+    sha256 = sha256 or hashlib.sha256(blob).hexdigest()
+    conn = create_conn()
+    try:
+        text = cached_text(sha256, conn)
+        if text is not None:
+            return text
+        _forget_stale(conn, sha256)
+        text = extract_uncached(blob, mime, progress=progress, sha256=sha256)
+        if text:
+            _store_text(conn, sha256, mime, text)
+        if mime == "application/pdf":
+            from .page_index import schedule
+            schedule()  # plan et libellés de pages, en tâche de fond
+        return text
+    finally:
+        conn.close()
+
+
+# ---------- texte joint dans les clips ----------
+_RULE = SEPARATOR.strip()  # trait qui sépare les blocs ajoutés au texte d'un clip
+
+
+def _block_starts(raw: str, i: int) -> bool:
+    head = raw[:i].rstrip()
+    return not head or head == _RULE or head.endswith("\n" + _RULE)
+
+
+def _block_ends(raw: str, end: int) -> bool:
+    tail = raw[end:].lstrip()
+    return not tail or tail == _RULE or tail.startswith(_RULE + "\n")
+
+
+def replace_block(raw: str, old: str, new: str) -> Optional[str]:
+    """`raw` où chaque bloc entier égal à `old` (texte seul, ou délimité par le séparateur des ajouts)
+    devient `new` ; None si aucun bloc ne correspond. Une simple sous-chaîne n'est jamais remplacée."""
+    if not old:
+        return None
+    parts, pos, i = [], 0, raw.find(old)
+    while i >= 0:
+        end = i + len(old)
+        if _block_starts(raw, i) and _block_ends(raw, end):
+            parts += [raw[pos:i], new]
+            pos = end
+            i = raw.find(old, end)
+        else:
+            i = raw.find(old, i + 1)
+    if not parts:
+        return None
+    return "".join(parts) + raw[pos:]
+
+
+def replace_attached_text(conn, sha256: str, old: str, new: str) -> List[int]:
+    """Remplace le texte extrait `old` par `new` dans le clip auquel ce fichier est joint (files.clip_id),
+    bloc ajouté exact seulement, clip réindexé dans la même transaction ; renvoie les clips modifiés.
+    Ne valide pas la transaction."""
+    from .indexer import write_text
+    changed = []
+    rows = conn.execute("SELECT c.id, c.raw_text FROM files f JOIN clips c ON c.id = f.clip_id "
+                        "WHERE f.sha256=?", (sha256,)).fetchall()
+    for clip_id, raw in rows:
+        text = replace_block(raw or "", old, new)
+        if text is not None and text != raw:
+            write_text(conn, clip_id, text)
+            changed.append(clip_id)
+    return changed
+
+
+def refresh_stale(limit: Optional[int] = None, cancel: Optional[threading.Event] = None,
+                  pause_ratio: Optional[float] = None) -> int:
+    """Réextrait un à un les fichiers dont le texte en cache vient d'une version antérieure, dans un
+    processus de basse priorité (comme services.reindex), avec une pause de `pause_ratio` × la durée du
+    fichier (option `reindex_pause_ratio`). Le nouveau texte remplace l'ancien bloc joint dans le clip du
+    fichier (réindexé). Renvoie le nombre de fichiers traités. Désactivable par `extract_refresh_enabled`."""
+    from concurrent.futures.process import BrokenProcessPool
+    from .reindex import DEFAULT_PAUSE_RATIO, _extract_file, _new_pool, _worker_opts, _write_batch
+    cfg = load_config()
+    if not cfg.get("extract_refresh_enabled", True):
+        return 0
+    if pause_ratio is None:
+        pause_ratio = float(cfg.get("reindex_pause_ratio", DEFAULT_PAUSE_RATIO))
+    conn = create_conn()
+    done, pool, opts = 0, None, None
+    try:
+        rows = conn.execute("SELECT t.sha256, f.id, f.data IS NOT NULL FROM file_texts t "
+                            "LEFT JOIN files f ON f.sha256 = t.sha256 WHERE t.version < ? "
+                            "ORDER BY t.extracted_at LIMIT ?",
+                            (EXTRACTOR_VERSION, -1 if limit is None else int(limit))).fetchall()
+        for sha256, file_id, has_data in rows:
+            if cancel is not None and cancel.is_set():
+                break
+            if file_id is None or not has_data:
+                conn.execute("DELETE FROM file_texts WHERE sha256=?", (sha256,))
+                conn.commit()
+                continue
+            start = time.perf_counter()
+            _forget_stale(conn, sha256)
+            if pool is None:
+                pool, opts = _new_pool(1), _worker_opts()
+            try:
+                # texte vide (OCR devenu indisponible…) : l'ancien texte reste, réessayé au prochain démarrage
+                _write_batch(conn, [pool.submit(_extract_file, file_id, opts).result()], False)
+                conn.commit()
+                done += 1
+            except Exception as e:
+                conn.rollback()
+                if isinstance(e, BrokenProcessPool):
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+            pause = (time.perf_counter() - start) * pause_ratio
+            if pause and cancel is not None:
+                cancel.wait(pause)
+            elif pause:
+                time.sleep(pause)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        conn.close()
+    if done:
+        from . import page_index
+        page_index.schedule()  # libellés et plan des PDF réextraits
+    return done
+
+
+_refresh: Optional[threading.Thread] = None
+_refresh_cancel = threading.Event()
+
+
+def schedule_refresh():
+    """Lance refresh_stale dans un thread dédié (au démarrage). Pas dans async_worker.runner : après
+    un changement de EXTRACTOR_VERSION, toutes les pièces jointes peuvent repasser par l'OCR."""
+    global _refresh
+    if _refresh is not None and _refresh.is_alive():
+        return
+    _refresh_cancel.clear()
+    _refresh = threading.Thread(target=refresh_stale, kwargs={"cancel": _refresh_cancel},
+                                name="extract-refresh", daemon=True)
+    _refresh.start()
+
+
+def stop_refresh():
+    """Arrête refresh_stale après le fichier en cours (repris au prochain démarrage)."""
+    _refresh_cancel.set()
@@ -0,0 +1,353 @@
+### memex_next/services/http_pool.py
+"""
+Client HTTP mutualisé : connexions persistantes (keep-alive) par hôte,
+décompression gzip/deflate et mesures connect / TTFB / transfert.
+Les proxys système (HTTP_PROXY / HTTPS_PROXY / NO_PROXY, registre sous Windows)
+sont respectés comme par urllib : tunnel CONNECT pour https, URI absolue pour http.
+"""
+import base64, gzip, zlib, json, select, socket, ssl, threading, time, urllib.parse, urllib.request
+import http.client
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from ..config import cached_config
+
+DEFAULT_POOL_SIZE = 4
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+# Méthodes rejouables sans effet de bord (RFC 9110 §9.2.2) : seule une requête de ce type est
+# renvoyée quand la connexion tombe après l'envoi ; un POST n'est rejoué que s'il n'est pas parti.
+_IDEMPOTENT = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+
+
+@dataclass
+class HTTPResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    url: str
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def text(self, default_charset: str = "utf-8") -> str:
+        charset = default_charset
+        ctype = self.headers.get("content-type", "")
+        if "charset=" in ctype:
+            charset = ctype.split("charset=")[1].split(";")[0].strip() or default_charset
+        try:
+            return self.body.decode(charset, errors="ignore")
+        except LookupError:
+            return self.body.decode(default_charset, errors="ignore")
+
+    def json(self):
+        return json.loads(self.text())
+
+
+def _decode_body(raw: bytes, encoding: str) -> bytes:
+    encoding = (encoding or "").lower()
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)  # deflate brut sans en-tête zlib
+    return raw
+
+
+def _dropped(sock) -> bool:
+    """Vrai si le serveur a fermé (ou écrit sur) une connexion inactive : elle n'est plus réutilisable."""
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+def _proxy_auth(proxy: str) -> Dict[str, str]:
+    """En-tête Proxy-Authorization pour un proxy « http://user:mdp@hôte:port », sinon vide."""
+    parsed = urllib.parse.urlsplit(proxy)
+    if parsed.username is None:
+        return {}
+    creds = f"{urllib.parse.unquote(parsed.username)}:{urllib.parse.unquote(parsed.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(creds.encode("utf-8")).decode("ascii")}
+
+
+# (schéma, hôte, port, proxy) : une même cible jointe via deux proxys n'en partage pas les connexions
+Key = Tuple[str, str, int, str]
+
+
+class HTTPPool:
+    """Pool de connexions http.client réutilisées entre les requêtes (thread-safe).
+    `pool_size` borne, par hôte, les connexions ouvertes (actives + inactives) : au-delà,
+    une requête attend qu'une connexion se libère, au plus `timeout` secondes."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = 60,
+                 proxies: Optional[Dict[str, str]] = None):
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._bypass: Dict[str, bool] = {}
+        self._idle: Dict[Key, list] = {}
+        self._slots: Dict[Key, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._ssl_ctx = ssl.create_default_context()
+
+    # ---------- connexions ----------
+    def _proxy_for(self, scheme: str, host: str) -> str:
+        """Proxy à utiliser pour `host` ("" : connexion directe), NO_PROXY compris."""
+        proxy = self.proxies.get(scheme, "")
+        if not proxy:
+            return ""
+        bypass = self._bypass.get(host)
+        if bypass is None:
+            bypass = self._bypass[host] = bool(urllib.request.proxy_bypass(host))
+        if bypass:
+            return ""
+        return proxy if "://" in proxy else "http://" + proxy
+
+    def _new_conn(self, scheme: str, host: str, port: int, proxy: str, connect_timeout: float):
+        if proxy:
+            p = urllib.parse.urlsplit(proxy)
+            p_host, p_port = p.hostname, p.port or 8080
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(p_host, p_port, timeout=connect_timeout, context=self._ssl_ctx)
+                conn.set_tunnel(host, port, headers=_proxy_auth(proxy))
+                return conn
+            return http.client.HTTPConnection(p_host, p_port, timeout=connect_timeout)
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=self._ssl_ctx)
+        return http.client.HTTPConnection(host, port, timeout=connect_timeout)
+
+    def _acquire(self, key, connect_timeout, timeout):
+        """Réserve une place pour `key` puis renvoie (connexion, réutilisée ?)."""
+        with self._lock:
+            slots = self._slots.setdefault(key, threading.BoundedSemaphore(self.pool_size))
+        if not slots.acquire(timeout=timeout):
+            raise TimeoutError(f"Pool HTTP saturé ({self.pool_size} connexions vers {key[1]})")
+        stale = []
+        with self._lock:
+            idle = self._idle.get(key) or []
+            while idle:
+                conn = idle.pop()
+                if conn.sock is not None and not _dropped(conn.sock):
+                    conn.sock.settimeout(timeout)
+                    break
+                stale.append(conn)
+            else:
+                conn = None
+        for c in stale:
+            c.close()
+        if conn is not None:
+            return conn, True
+        return self._new_conn(*key, connect_timeout), False
+
+    def _checkin(self, key, conn, reusable: bool):
+        """Rend la place réservée par `_acquire` ; la connexion retourne au pool si `reusable`."""
+        with self._lock:
+            keep = reusable and not self._closed
+            if keep:
+                self._idle.setdefault(key, []).append(conn)
+            self._slots[key].release()
+        if not keep:
+            conn.close()
+
+    def close_all(self):
+        """Ferme les connexions inactives ; celles en cours sont fermées à leur libération."""
+        with self._lock:
+            self._closed = True
+            conns = [c for lst in self._idle.values() for c in lst]
+            self._idle.clear()
+        for c in conns:
+            try: c.close()
+            except Exception: pass
+
+    # ---------- requêtes ----------
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                follow_redirects: bool = False, max_redirects: int = 5,
+                connect_timeout: Optional[float] = None) -> HTTPResponse:
+        """Envoie une requête et renvoie la réponse décompressée avec ses timings.
+        `connect_timeout` borne l'établissement de la connexion, `timeout` chaque lecture."""
+        for _ in range(max_redirects + 1):
+            resp = self._request_once(method, url, body, headers, timeout, connect_timeout=connect_timeout)
+            location = resp.headers.get("location")
+            if not (follow_redirects and resp.status in (301, 302, 303, 307, 308) and location):
+                return resp
+            url = urllib.parse.urljoin(url, location)
+            if resp.status == 303 or (resp.status in (301, 302) and method == "POST"):
+                method, body = "GET", None
+        raise RuntimeError(f"Trop de redirections ({max_redirects})")
+
+    def stream(self, method: str, url: str, body: Optional[bytes] = None,
+               headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+               connect_timeout: Optional[float] = None) -> "StreamingResponse":
+        """Ouvre une requête dont le corps est lu au fil de l'eau (SSE) ; à fermer via `close()` ou `with`."""
+        hdrs = {"Accept-Encoding": "identity"}
+        hdrs.update(headers or {})
+        return self._request_once(method, url, body, hdrs, timeout, streaming=True, connect_timeout=connect_timeout)
+
+    def _request_once(self, method, url, body, headers, timeout, streaming=False, connect_timeout=None):
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Schéma non supporté : {scheme}")
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if scheme == "https" else 80)
+        proxy = self._proxy_for(scheme, host)
+        key = (scheme, host, port, proxy)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        hdrs = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        if proxy and scheme == "http":
+            # proxy http : requête en URI absolue sur la connexion au proxy
+            path = f"{scheme}://{parsed.netloc.rpartition('@')[2]}{path}"
+            hdrs.update(_proxy_auth(proxy))
+        hdrs.update(headers or {})
+        timeout = self.timeout if timeout is None else timeout
+        connect_timeout = timeout if connect_timeout is None else min(connect_timeout, timeout)
+        send = self._send_stream if streaming else self._send
+
+        conn, reused = self._acquire(key, connect_timeout, timeout)
+        try:
+            return send(conn, key, reused, timeout, method, url, path, body, hdrs)
+        except _STALE_ERRORS as e:
+            # Connexion keep-alive fermée côté serveur : une seule nouvelle tentative, si la
+            # requête n'a pas pu être traitée (non envoyée, ou méthode idempotente)
+            conn.close()
+            if not reused or (getattr(e, "request_sent", True) and method.upper() not in _IDEMPOTENT):
+                self._checkin(key, conn, False)
+                raise
+            conn = self._new_conn(*key, connect_timeout)
+            try:
+                return send(conn, key, False, timeout, method, url, path, body, hdrs)
+            except Exception:
+                self._checkin(key, conn, False)
+                raise
+        except Exception:
+            self._checkin(key, conn, False)
+            raise
+
+    def _open(self, conn, timeout, method, path, body, hdrs):
+        t0 = time.perf_counter()
+        if conn.sock is None:
+            conn.connect()  # borné par le timeout de connexion passé au constructeur
+            conn.sock.settimeout(timeout)
+        t_conn = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=hdrs)
+        except _STALE_ERRORS as e:
+            e.request_sent = False
+            raise
+        resp = conn.getresponse()
+        t_first = time.perf_counter()
+        timings = {
+            "connect_ms": round((t_conn - t0) * 1000, 2),
+            "ttfb_ms": round((t_first - t_conn) * 1000, 2),
+        }
+        return resp, timings, t0, t_first
+
+    def _finish(self, key, conn, resp):
+        self._checkin(key, conn, not resp.will_close)
+
+    def _send(self, conn, key, reused, timeout, method, url, path, body, hdrs) -> HTTPResponse:
+        resp, timings, t0, t_first = self._open(conn, timeout, method, path, body, hdrs)
+        raw = resp.read()
+        t_end = time.perf_counter()
+        headers = {k.lower(): v for k, v in resp.getheaders()}
+        body = _decode_body(raw, headers.get("content-encoding", ""))
+        self._finish(key, conn, resp)  # dernière étape : la connexion ne doit être rendue qu'une fois
+        timings.update({
+            "transfer_ms": round((t_end - t_first) * 1000, 2),
+            "total_ms": round((t_end - t0) * 1000, 2),
+            "reused": reused,
+        })
+        return HTTPResponse(status=resp.status, headers=headers, body=body, url=url, timings=timings)
+
+    def _send_stream(self, conn, key, reused, timeout, method, url, path, body, hdrs) -> "StreamingResponse":
+        resp, timings, t0, _ = self._open(conn, timeout, method, path, body, hdrs)
+        timings["reused"] = reused
+        return StreamingResponse(self, key, conn, resp, url, timings, t0)
+
+
+class StreamingResponse:
+    """Réponse lue ligne à ligne ; la connexion revient au pool une fois le corps entièrement lu."""
+
+    def __init__(self, pool: HTTPPool, key, conn, resp, url: str, timings: Dict[str, float], t0: float):
+        self._pool, self._key, self._conn, self._resp = pool, key, conn, resp
+        self._t0 = t0
+        self._done = False
+        self._done_lock = threading.Lock()
+        self.url = url
+        self.status = resp.status
+        self.headers = {k.lower(): v for k, v in resp.getheaders()}
+        self.timings = timings
+
+    def read(self) -> bytes:
+        raw = self._resp.read()
+        self._complete()
+        return _decode_body(raw, self.headers.get("content-encoding", ""))
+
+    def iter_lines(self):
+        while True:
+            line = self._resp.readline()
+            if not line:
+                break
+            yield line.rstrip(b"\r\n")
+        self._complete()
+
+    def _mark_done(self) -> bool:
+        with self._done_lock:
+            first, self._done = not self._done, True
+            return first
+
+    def _complete(self):
+        if self._mark_done():
+            self.timings["total_ms"] = round((time.perf_counter() - self._t0) * 1000, 2)
+            self._pool._finish(self._key, self._conn, self._resp)
+
+    def close(self):
+        """Abandon (annulation) : la connexion, à moitié lue, n'est pas réutilisable."""
+        if self._mark_done():
+            self._pool._checkin(self._key, self._conn, False)
+
+    def abort(self):
+        """Annulation depuis un autre thread : coupe le socket, ce qui débloque aussitôt une lecture
+        en attente dans `iter_lines` (flux bloqué) au lieu d'attendre le délai de lecture."""
+        if self._mark_done():
+            sock = self._conn.sock
+            if sock is not None:
+                try: sock.shutdown(socket.SHUT_RDWR)
+                except OSError: pass
+            self._pool._checkin(self._key, self._conn, False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_pool: Optional[HTTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> HTTPPool:
+    """Pool partagé du processus (taille : option `http_pool_size`) ; reconstruit quand l'option
+    change, l'ancien pool fermant ses connexions au fur et à mesure de leur libération."""
+    global _pool
+    size = max(1, int(cached_config().get("http_pool_size", DEFAULT_POOL_SIZE)))
+    with _pool_lock:
+        if _pool is None or _pool.pool_size != size:
+            old, _pool = _pool, HTTPPool(pool_size=size)
+            if old is not None:
+                old.close_all()
+        return _pool
+
+
+def request(method: str, url: str, **kwargs) -> HTTPResponse:
+    return get_pool().request(method, url, **kwargs)
+
+
+def stream(method: str, url: str, **kwargs) -> StreamingResponse:
+    return get_pool().stream(method, url, **kwargs)
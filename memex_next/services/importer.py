@@ -1,6 +1,8 @@
 ### memex_next/services/import.py
 import json, pathlib, shutil, sqlite3
 from datetime import datetime, timezone as TZ
+from ..config import DB_FILE
+from .indexer import schedule_missing
 
 def migrate_from_db(db_path: pathlib.Path) -> int:
     """Import sans verrou : lecture seule + INSERT un par un."""
@@ -14,7 +16,7 @@ def migrate_from_db(db_path: pathlib.Path) -> int:
     before = src.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
 
     # 3. Ouvre la cible
-    dst = sqlite3.connect("souviens_toi.db", timeout=10)
+    dst = sqlite3.connect(DB_FILE, timeout=10)
     dst.execute("PRAGMA journal_mode=WAL")
 
     # 4. Copie ligne par ligne (pas d’ATTACH)
@@ -30,6 +32,7 @@ def migrate_from_db(db_path: pathlib.Path) -> int:
     src.close()
     after = dst.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
     dst.close()
+    schedule_missing()  # statistiques du corpus et passages des clips importés
     return after - before
 
 def import_json(path: pathlib.Path):
@@ -37,7 +40,7 @@ def import_json(path: pathlib.Path):
     if not isinstance(clips, list):
         raise ValueError("JSON doit être une liste")
     import sqlite3, time
-    db = sqlite3.connect("souviens_toi.db")
+    db = sqlite3.connect(DB_FILE)
     for c in clips:
         db.execute(
             "INSERT INTO clips(ts, source, title, type, raw_text, summary, tags, categories, read_later) "
@@ -47,3 +50,4 @@ def import_json(path: pathlib.Path):
         )
     db.commit()
     db.close()
+    schedule_missing()
@@ -0,0 +1,197 @@
+### memex_next/services/indexer.py
+"""
+Indexation locale des clips à l'enregistrement : statistiques du corpus
+(fréquences documentaires des termes) tenues à jour de façon incrémentale,
+passages en plein texte pour les questions sur les notes (services.qa),
+langue détectée du clip (services.langid, colonne clips.lang).
+La suppression d'un clip est gérée par les triggers trg_clips_unindex / trg_clips_unpassage.
+"""
+import threading, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..db import create_conn
+from .local_tagger import content_terms
+from . import classifier, langid, qa
+
+_n_docs: Optional[int] = None
+_n_docs_lock = threading.Lock()
+
+
+def _invalidate():
+    global _n_docs
+    with _n_docs_lock:
+        _n_docs = None
+
+
+def n_docs(conn=None) -> int:
+    """Nombre de clips indexés (mis en cache jusqu'à la prochaine indexation)."""
+    global _n_docs
+    with _n_docs_lock:
+        if _n_docs is not None:
+            return _n_docs
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        value = conn.execute("SELECT COUNT(*) FROM indexed_clips").fetchone()[0]
+    finally:
+        if own: conn.close()
+    with _n_docs_lock:
+        _n_docs = value
+    return value
+
+
+def corpus_stats(terms: Iterable[str], conn=None) -> Tuple[Dict[str, int], int]:
+    """({terme: df}, nombre de documents) pour les termes demandés."""
+    terms = list(terms)
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        df = {}
+        for i in range(0, len(terms), 500):
+            part = terms[i:i + 500]
+            marks = ",".join("?" * len(part))
+            df.update(conn.execute(f"SELECT term, df FROM term_df WHERE term IN ({marks})", part).fetchall())
+        return df, n_docs(conn)
+    finally:
+        if own: conn.close()
+
+
+def index_text(conn, clip_id: int, text: str, categories: str = "", title: str = ""):
+    """Met à jour clip_terms / term_df pour un clip (différence avec son indexation précédente),
+    le classifieur local de catégories et les passages plein texte.
+    Ne valide pas la transaction : à l'appelant de faire commit()."""
+    new = content_terms(text or "")
+    old = dict(conn.execute("SELECT term, tf FROM clip_terms WHERE clip_id=?", (clip_id,)).fetchall())
+    added = [t for t in new if t not in old]
+    removed = [t for t in old if t not in new]
+    if removed:
+        conn.executemany("UPDATE term_df SET df = df - 1 WHERE term=?", [(t,) for t in removed])
+        conn.executemany("DELETE FROM clip_terms WHERE clip_id=? AND term=?", [(clip_id, t) for t in removed])
+    if added:
+        conn.executemany("INSERT INTO term_df(term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                         [(t,) for t in added])
+    conn.executemany("INSERT OR REPLACE INTO clip_terms(clip_id, term, tf) VALUES (?,?,?)",
+                     [(clip_id, t, n) for t, n in new.items()])
+    conn.execute("INSERT OR REPLACE INTO indexed_clips(clip_id, indexed_at, n_terms) VALUES (?,?,?)",
+                 (clip_id, int(time.time()), len(new)))
+    classifier.observe(conn, clip_id, old, new, categories)
+    qa.index_passages(conn, clip_id, text, title)
+    lang = langid.detect(text or "")
+    conn.execute("UPDATE clips SET lang=? WHERE id=? AND lang IS NOT ?", (lang, clip_id, lang))
+
+
+def write_text(conn, clip_id: int, text: str, **fields):
+    """Écrit le texte d'un clip (et les colonnes `fields`, ex. summary, title) et son indexation dans la
+    même transaction : tout écrivain de clips.raw_text hors de l'éditeur passe par ici (ajout de fichiers,
+    réextraction, rafraîchissement du cache). Ne valide pas la transaction : à l'appelant de faire commit()."""
+    cols = "".join(f", {name}=?" for name in fields)
+    conn.execute(f"UPDATE clips SET raw_text=?{cols} WHERE id=?", (text, *fields.values(), clip_id))
+    row = conn.execute("SELECT categories, title FROM clips WHERE id=?", (clip_id,)).fetchone()
+    if row is not None:
+        index_text(conn, clip_id, text, row[0] or "", row[1] or "")
+        _invalidate()
+
+
+def index_clip(clip_id: int) -> bool:
+    """Réindexe un clip depuis la base (False si le clip n'existe plus)."""
+    conn = create_conn()
+    try:
+        row = conn.execute("SELECT raw_text, categories, title FROM clips WHERE id=?", (clip_id,)).fetchone()
+        if row is None:
+            return False
+        index_text(conn, clip_id, row[0] or "", row[1] or "", row[2] or "")
+        conn.commit()
+    finally:
+        conn.close()
+    _invalidate()
+    return True
+
+
+def clip_saved(clip_id: int):
+    """À appeler après toute création/modification du texte d'un clip (indexation en tâche de fond)."""
+    from .async_worker import runner
+    runner.submit(lambda: index_clip(clip_id))
+
+
+_catch_up_lock = threading.Lock()
+_catch_up_running = False
+_catch_up_again = False
+
+
+def _catch_up():
+    global _catch_up_running, _catch_up_again
+    try:
+        classifier.get_model()  # chargé avant l'indexation pour qu'il en reçoive les mises à jour
+        while True:
+            index_missing()  # statistiques du corpus pour le tagger local
+            qa.index_missing()  # passages des clips indexés avant les questions sur les notes
+            detect_missing_langs()  # langue des clips enregistrés avant clips.lang
+            with _catch_up_lock:
+                if not _catch_up_again:
+                    _catch_up_running = False
+                    return
+                _catch_up_again = False
+    except BaseException:
+        with _catch_up_lock:
+            _catch_up_running = False
+        raise
+
+
+def schedule_missing():
+    """Rattrapage (clips jamais indexés, passages, langues) dans un thread dédié, au démarrage et après
+    un import de clips. Pas dans async_worker.runner : sur une grande base existante, il retiendrait
+    les actions de l'utilisateur. Un appel pendant un passage en relance un autre à sa fin."""
+    global _catch_up_running, _catch_up_again
+    with _catch_up_lock:
+        if _catch_up_running:
+            _catch_up_again = True
+            return
+        _catch_up_running = True
+    threading.Thread(target=_catch_up, name="index-catch-up", daemon=True).start()
+
+
+def unindexed_clip_ids(conn, limit: int = 500) -> List[int]:
+    rows = conn.execute(
+        "SELECT c.id FROM clips c LEFT JOIN indexed_clips i ON i.clip_id = c.id "
+        "WHERE i.clip_id IS NULL ORDER BY c.id LIMIT ?", (limit,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def index_missing(batch: int = 200) -> int:
+    """Indexe les clips jamais indexés (bases existantes, imports) ; renvoie le nombre traité."""
+    conn = create_conn()
+    done = 0
+    try:
+        while True:
+            ids = unindexed_clip_ids(conn, batch)
+            if not ids:
+                break
+            for clip_id in ids:
+                row = conn.execute("SELECT raw_text, categories, title FROM clips WHERE id=?", (clip_id,)).fetchone()
+                row = row or ("", "", "")
+                index_text(conn, clip_id, row[0] or "", row[1] or "", row[2] or "")
+            conn.commit()
+            done += len(ids)
+    finally:
+        conn.close()
+    if done:
+        _invalidate()
+    return done
+
+
+def detect_missing_langs(batch: int = 500) -> int:
+    """Détecte la langue des clips indexés avant l'ajout de clips.lang ; renvoie le nombre traité."""
+    conn = create_conn()
+    done = 0
+    try:
+        while True:
+            rows = conn.execute("SELECT id, raw_text FROM clips WHERE lang IS NULL LIMIT ?", (batch,)).fetchall()
+            if not rows:
+                break
+            conn.executemany("UPDATE clips SET lang=? WHERE id=?",
+                             [(langid.detect(text or ""), clip_id) for clip_id, text in rows])
+            conn.commit()
+            done += len(rows)
+    finally:
+        conn.close()
+    return done
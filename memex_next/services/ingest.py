@@ -0,0 +1,260 @@
+### memex_next/services/ingest.py
+"""
+Chaîne d'ajout des pièces jointes, commune à la fenêtre principale, à la
+recherche et à l'éditeur : lecture → empreinte → doublon ? → enregistrement →
+extraction → résumé IA → indexation. Chaque fichier est lu une seule fois, par
+blocs, l'empreinte sha256 calculée au fil de la lecture ; les étapes suivantes
+travaillent sur ces octets (le PDF n'est plus rouvert par chemin pour le
+résumé). Plusieurs fichiers sont traités en parallèle, en nombre borné (option
+`ingest_concurrency`), et la durée de chaque étape est mesurée par fichier.
+"""
+import hashlib, mimetypes, pathlib, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from ..config import load_config, SEPARATOR
+from ..db import create_conn
+
+STAGES = ("read", "hash", "dedup", "store", "extract", "enrich", "index")
+STAGE_LABELS = {"read": "lecture", "hash": "empreinte", "dedup": "doublons", "store": "enregistrement",
+                "extract": "extraction", "enrich": "résumé IA", "index": "indexation"}
+READ_CHUNK = 1 << 20
+DEFAULT_CONCURRENCY = 3
+# Filtres des boîtes de dialogue « Joindre »
+FILE_TYPES = [["PDF", "*.pdf"], ["Images", "*.png;*.jpg;*.jpeg;*.gif;*.bmp;*.webp"],
+              ["Documents", "*.txt;*.md;*.docx"], ["Tous", "*.*"]]
+
+
+@dataclass
+class IngestItem:
+    path: str
+    filename: str = ""
+    mime: str = ""
+    size: int = 0
+    sha256: str = ""
+    clip_id: Optional[int] = None   # clip du fichier (clip existant pour un doublon)
+    created: bool = False           # clip créé pour ce fichier
+    duplicate: bool = False
+    shared: bool = False            # contenu déjà joint à un autre clip : seul son texte est ajouté à clip_id
+    title: str = ""
+    text: str = ""                  # texte extrait
+    addition: str = ""              # ajouté au clip : résumé IA mis en forme, sinon texte extrait
+    enriched: bool = False
+    enrich_error: str = ""
+    error: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@dataclass
+class IngestResult:
+    items: List[IngestItem] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def added(self) -> List[IngestItem]:
+        return [i for i in self.items if not i.duplicate and not i.error]
+
+    @property
+    def duplicates(self) -> List[IngestItem]:
+        return [i for i in self.items if i.duplicate]
+
+    @property
+    def failed(self) -> List[IngestItem]:
+        return [i for i in self.items if i.error]
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Durée cumulée de chaque étape sur tous les fichiers (secondes)."""
+        return {s: sum(i.timings.get(s, 0.0) for i in self.items) for s in STAGES}
+
+    def summary(self) -> str:
+        msg = f"{len(self.added)} fichier(s) joint(s)"
+        if self.duplicates:
+            msg += f", {len(self.duplicates)} déjà présent(s)"
+        if self.failed:
+            msg += f", {len(self.failed)} en erreur"
+        return msg
+
+    def timings_summary(self) -> str:
+        """« extraction 2.3 s · résumé IA 14.1 s · … » : étapes de plus de 50 ms, total en tête."""
+        parts = [f"{STAGE_LABELS[s]} {t:.1f} s" for s, t in self.stage_totals().items() if t >= 0.05]
+        return " · ".join([f"{self.elapsed:.1f} s"] + parts)
+
+
+# ---------- étapes ----------
+def _read(item: IngestItem) -> bytes:
+    """Lecture par blocs, empreinte calculée sur chaque bloc lu (un seul passage sur le fichier)."""
+    digest, chunks, hashing = hashlib.sha256(), [], 0.0
+    start = time.perf_counter()
+    with open(item.path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            t = time.perf_counter()
+            digest.update(chunk)
+            hashing += time.perf_counter() - t
+    blob = b"".join(chunks)
+    item.timings["read"] = time.perf_counter() - start - hashing
+    item.timings["hash"] = hashing
+    item.size, item.sha256 = len(blob), digest.hexdigest()
+    return blob
+
+
+def owner_of(sha256: str, conn=None) -> Optional[int]:
+    """Clip auquel ce contenu est déjà joint, sinon None."""
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        row = conn.execute("SELECT clip_id FROM files WHERE sha256=?", (sha256,)).fetchone()
+        return row[0] if row else None
+    finally:
+        if own: conn.close()
+
+
+def _store(item: IngestItem, blob: bytes, clip_id: Optional[int], tags: str) -> bool:
+    """Clip (si `clip_id` est None) et fichier dans une même transaction ; False si le contenu
+    a été joint entre-temps (même fichier sélectionné deux fois, autre fenêtre…)."""
+    created = clip_id is None
+    conn = create_conn()
+    try:
+        if created:
+            cur = conn.execute("INSERT INTO clips(ts, source, title, type, raw_text, summary, tags) "
+                               "VALUES (?,?,?,?,?,?,?)",
+                               (int(time.time()), "", item.filename, "note", "", "", tags))
+            clip_id = cur.lastrowid
+        cur = conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) "
+                           "VALUES (?,?,?,?,?,?)", (clip_id, item.filename, item.mime, item.size, item.sha256, blob))
+        if cur.rowcount == 0:
+            conn.rollback()
+            item.duplicate, item.clip_id = True, owner_of(item.sha256, conn)
+            return False
+        conn.commit()
+        item.created, item.clip_id = created, clip_id
+        return True
+    finally:
+        conn.close()
+
+
+def _enrich(item: IngestItem, blob: bytes, lang: str, context: str, live: dict):
+    """Résumé IA d'un PDF à partir des octets déjà lus et du texte déjà extrait."""
+    from ..pdf_analyzer import analyze_pdf_complete
+    cancel = live.get("cancel")
+    if cancel is not None and cancel.is_set():
+        return
+    try:
+        res = analyze_pdf_complete(item.filename, lang, context=context, on_delta=live.get("on_delta"),
+                                   cancel=cancel, progress=live.get("progress"),
+                                   data=blob, sha256=item.sha256, full_text=item.text)
+    except Exception as e:
+        # arrêt par l'utilisateur ou erreur IA : le texte extrait est gardé
+        item.enrich_error = "" if cancel is not None and cancel.is_set() else str(e)
+        return
+    if res and res.get("success"):
+        item.enriched = True
+        item.title = res.get("title") or item.title
+        item.addition = res["formatted_content"]
+
+
+def append_to_clip(item: IngestItem, conn=None):
+    """Ajoute `item.addition` au texte du clip (séparateur si le clip a déjà du contenu) et le réindexe ;
+    le titre d'un clip créé pour ce fichier devient celui du document."""
+    from .indexer import write_text
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        row = conn.execute("SELECT raw_text FROM clips WHERE id=?", (item.clip_id,)).fetchone()
+        current = (row[0] or "") if row else ""
+        sep = ("\n" + SEPARATOR + "\n") if current else ""
+        text = current + sep + item.addition
+        if item.created:
+            write_text(conn, item.clip_id, text, summary=text[:150] + "...", title=item.title)
+        else:
+            write_text(conn, item.clip_id, text, summary=text[:150] + "...")
+        conn.commit()
+    finally:
+        if own: conn.close()
+
+
+def _ingest_one(item: IngestItem, clip_id: Optional[int], tags: str, analyze: bool, lang: str, context: str,
+                write_clip: bool, live: dict, progress: Optional[Callable[[int, int], None]]):
+    from ..ocr import extract_text_from_blob
+    blob = _read(item)
+    with item.stage("dedup"):
+        owner = owner_of(item.sha256)
+    is_pdf = item.mime == "application/pdf"
+    if owner is None:
+        with item.stage("store"):
+            _store(item, blob, clip_id, tags or ("pdf" if is_pdf and analyze else "file"))
+        owner = item.clip_id if item.duplicate else None
+    if owner is not None:
+        if clip_id is None or clip_id == owner:
+            item.duplicate, item.clip_id = True, owner
+            return
+        # fichier déjà en base joint à un autre clip : pas de second exemplaire, mais son texte
+        # (repris du cache d'extraction) est ajouté au clip demandé comme pour un nouveau fichier
+        item.duplicate, item.shared, item.clip_id = False, True, clip_id
+    with item.stage("extract"):
+        item.text = extract_text_from_blob(blob, item.mime, progress=progress, sha256=item.sha256)
+    item.addition = item.text
+    if is_pdf and analyze:
+        with item.stage("enrich"):
+            _enrich(item, blob, lang, context, live)
+    if write_clip and item.addition:
+        with item.stage("index"):
+            append_to_clip(item)
+
+
+def ingest_files(paths: Sequence[str], clip_id: Optional[int] = None, tags: str = "",
+                 analyze: Optional[bool] = None, context: str = "new", write_clip: bool = True,
+                 live: Optional[Dict[str, dict]] = None, progress: Optional[Dict[str, Callable]] = None,
+                 on_item: Optional[Callable[[IngestItem], None]] = None,
+                 concurrency: Optional[int] = None) -> IngestResult:
+    """Joint les fichiers `paths` (à appeler hors du thread Tk) ; résultats dans l'ordre de `paths`.
+    clip_id : clip qui reçoit les fichiers ; None : un nouveau clip par fichier (tags `tags`).
+    Un fichier déjà joint à un autre clip n'est pas stocké deux fois, seul son texte est ajouté à `clip_id`.
+    analyze : résumé IA des PDF (option `auto_analyze_pdf` par défaut), `context` "new" ou "existing".
+    write_clip : False pour laisser l'appelant insérer `item.addition` (éditeur ouvert sur le clip).
+    live : {chemin: {on_delta, cancel, progress}} flux du résumé IA d'un fichier.
+    progress : {chemin: progress(faites, total)} avancement de l'extraction d'un PDF.
+    on_item(item) : appelé depuis un thread de travail dès qu'un fichier est terminé."""
+    cfg = load_config()
+    analyze = bool(cfg.get("auto_analyze_pdf", True)) if analyze is None else analyze
+    lang = cfg.get("ai_lang", "fr")
+    concurrency = max(1, int(concurrency or cfg.get("ingest_concurrency", DEFAULT_CONCURRENCY)))
+    live, progress = live or {}, progress or {}
+    items = [IngestItem(path=str(p), filename=pathlib.Path(p).name,
+                        mime=mimetypes.guess_type(str(p))[0] or "application/octet-stream") for p in paths]
+    for item in items:
+        item.title = item.filename
+
+    def run(item: IngestItem):
+        try:
+            _ingest_one(item, clip_id, tags, analyze, lang, context, write_clip,
+                        live.get(item.path, {}), progress.get(item.path))
+        except Exception as e:
+            item.error = str(e) or e.__class__.__name__
+        if on_item:
+            try:
+                on_item(item)
+            except Exception:
+                pass
+
+    start = time.perf_counter()
+    if concurrency == 1 or len(items) == 1:
+        for item in items:
+            run(item)
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(items)), thread_name_prefix="ingest") as pool:
+            list(pool.map(run, items))
+    return IngestResult(items=items, elapsed=time.perf_counter() - start)
@@ -0,0 +1,121 @@
+### memex_next/services/langid.py
+"""
+Identification locale de la langue d'un texte : modèle de trigrammes de
+caractères (mots encadrés d'espaces) appris au premier appel sur un court
+texte de référence par langue, score = log-vraisemblance lissée. Sert à
+choisir le pack tesseract d'un document, les mots vides du tagger local et
+à remplir clips.lang pour le filtre par langue.
+"""
+import math, re, threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Textes de référence : phrases courantes, riches en mots outils propres à chaque langue
+_SAMPLES = {
+    "fr": """Le projet avance bien et nous avons terminé la première partie du travail. Il reste encore quelques
+questions sur le budget, mais l'équipe pense que les résultats seront prêts avant la fin du mois. Dans cet article,
+on explique comment les données sont collectées puis analysées, et pourquoi cette méthode est plus simple que
+l'ancienne. Les utilisateurs peuvent ainsi retrouver leurs notes, leurs documents et leurs idées sans perdre de temps.
+C'est une question de mémoire : ce que l'on lit aujourd'hui doit pouvoir être relu demain, avec le contexte où
+l'information a été trouvée. Nous voulons aussi que chaque recherche soit rapide, même lorsque la base contient
+plusieurs milliers de pages. Après la réunion, je vous enverrai le compte rendu avec les décisions prises et les
+prochaines étapes du calendrier.""",
+    "en": """The project is moving forward and we have finished the first part of the work. There are still a few
+questions about the budget, but the team thinks that the results will be ready before the end of the month. In this
+article, we explain how the data is collected and then analysed, and why this method is simpler than the old one.
+Users can find their notes, their documents and their ideas without wasting time. It is a question of memory: what
+we read today should be easy to read again tomorrow, with the context in which the information was found. We also
+want every search to be fast, even when the database holds several thousand pages. After the meeting, I will send
+you the minutes with the decisions that were made and the next steps of the schedule.""",
+    "de": """Das Projekt kommt gut voran und wir haben den ersten Teil der Arbeit abgeschlossen. Es gibt noch einige
+Fragen zum Budget, aber das Team glaubt, dass die Ergebnisse vor dem Ende des Monats fertig sein werden. In diesem
+Artikel erklären wir, wie die Daten gesammelt und dann ausgewertet werden, und warum diese Methode einfacher ist als
+die alte. Die Benutzer können ihre Notizen, ihre Dokumente und ihre Ideen finden, ohne Zeit zu verlieren. Es ist eine
+Frage des Gedächtnisses: was wir heute lesen, sollte morgen mit dem Zusammenhang wieder gelesen werden können, in dem
+die Information gefunden wurde. Wir wollen auch, dass jede Suche schnell ist, selbst wenn die Datenbank mehrere
+tausend Seiten enthält. Nach der Besprechung schicke ich Ihnen das Protokoll mit den Entscheidungen und den
+nächsten Schritten des Zeitplans.""",
+    "es": """El proyecto avanza bien y hemos terminado la primera parte del trabajo. Todavía quedan algunas preguntas
+sobre el presupuesto, pero el equipo piensa que los resultados estarán listos antes del final del mes. En este
+artículo explicamos cómo se recogen los datos y luego se analizan, y por qué este método es más sencillo que el
+anterior. Los usuarios pueden encontrar sus notas, sus documentos y sus ideas sin perder tiempo. Es una cuestión de
+memoria: lo que leemos hoy debe poder leerse de nuevo mañana, con el contexto en el que se encontró la información.
+También queremos que cada búsqueda sea rápida, incluso cuando la base de datos contiene varios miles de páginas.
+Después de la reunión, les enviaré el acta con las decisiones tomadas y los próximos pasos del calendario.""",
+    "it": """Il progetto procede bene e abbiamo finito la prima parte del lavoro. Ci sono ancora alcune domande sul
+bilancio, ma la squadra pensa che i risultati saranno pronti prima della fine del mese. In questo articolo spieghiamo
+come i dati vengono raccolti e poi analizzati, e perché questo metodo è più semplice di quello vecchio. Gli utenti
+possono ritrovare le loro note, i loro documenti e le loro idee senza perdere tempo. È una questione di memoria:
+quello che leggiamo oggi deve poter essere riletto domani, con il contesto in cui l'informazione è stata trovata.
+Vogliamo anche che ogni ricerca sia veloce, anche quando la base di dati contiene diverse migliaia di pagine. Dopo
+la riunione vi manderò il verbale con le decisioni prese e i prossimi passi del calendario.""",
+}
+
+# Code ISO 639-1 -> pack de langue tesseract
+TESSERACT_LANGS = {"fr": "fra", "en": "eng", "de": "deu", "es": "spa", "it": "ita"}
+LANG_LABELS = {"fr": "Français", "en": "Anglais", "de": "Allemand", "es": "Espagnol", "it": "Italien"}
+
+MIN_LETTERS = 20        # en dessous : pas de décision
+MIN_MARGIN = 0.08       # écart de score par trigramme exigé entre la 1re et la 2e langue
+MAX_SAMPLE_CHARS = 4000  # début du texte seulement : suffisant et borne le coût
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_profiles: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None
+_profiles_lock = threading.Lock()
+
+
+def _trigrams(text: str) -> Counter:
+    grams = Counter()
+    for w in _WORD_RE.findall(text.lower()):
+        w = f" {w} "
+        for i in range(len(w) - 2):
+            grams[w[i:i + 3]] += 1
+    return grams
+
+
+def _model() -> Dict[str, Tuple[Dict[str, float], float]]:
+    """{langue: ({trigramme: log p}, log p d'un trigramme inconnu)}, lissage de Laplace."""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            counts = {lang: _trigrams(text) for lang, text in _SAMPLES.items()}
+            vocab = len(set().union(*counts.values())) + 1
+            _profiles = {}
+            for lang, grams in counts.items():
+                total = sum(grams.values()) + vocab
+                _profiles[lang] = ({g: math.log((n + 1) / total) for g, n in grams.items()}, math.log(1 / total))
+        return _profiles
+
+
+def scores(text: str) -> List[Tuple[str, float]]:
+    """[(langue, log-vraisemblance moyenne par trigramme)] du plus au moins probable."""
+    grams = _trigrams((text or "")[:MAX_SAMPLE_CHARS])
+    n = sum(grams.values())
+    if not n:
+        return []
+    out = []
+    for lang, (logp, unknown) in _model().items():
+        out.append((lang, sum(c * logp.get(g, unknown) for g, c in grams.items()) / n))
+    return sorted(out, key=lambda kv: -kv[1])
+
+
+def detect(text: str) -> str:
+    """Code de langue ('fr', 'en', 'de', 'es', 'it') ou '' si le texte est trop court ou ambigu."""
+    sample = (text or "")[:MAX_SAMPLE_CHARS]
+    if sum(c.isalpha() for c in sample) < MIN_LETTERS:
+        return ""
+    ranked = scores(sample)
+    if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < MIN_MARGIN:
+        return ""
+    return ranked[0][0] if ranked else ""
+
+
+def tesseract_lang(lang: str, installed=None, default: str = "fra+eng") -> str:
+    """Pack tesseract d'une langue détectée s'il est installé, sinon `default` (restreint aux packs présents)."""
+    pack = TESSERACT_LANGS.get(lang)
+    if installed is None:
+        return pack or default
+    if pack and pack in installed:
+        return pack
+    kept = [p for p in default.split("+") if p in installed]
+    return "+".join(kept) or default
@@ -0,0 +1,219 @@
+### memex_next/services/local_tagger.py
+"""
+Tagger local, sans réseau : mots vides FR/EN (+ ceux de la langue détectée du texte), TF-IDF contre les fréquences
+documentaires du corpus (tables term_df / indexed_clips, tenues à jour par
+services.indexer) et score de locutions façon RAKE (degré / fréquence).
+"""
+import math, re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+STOPWORDS_FR = set("""
+a à afin ai aie aient ait alors as au aucun aucune aujourd auprès aussi autre autres aux avaient avais avait avant avec
+avez aviez avions avoir avons ayant bien bon c ça car ce ceci cela celle celles celui cependant certain certaine
+certains ces cet cette ceux chacun chaque chez ci comme comment d dans de dedans dehors depuis des dessous dessus
+deux doit donc dont du elle elles en encore entre es est et étaient étais était étant été être eu eux fait faire
+fais faut fois font hors ici il ils j je jusqu l la là le les leur leurs lui m ma mais me même mêmes mes moi moins
+mon n ne ni non nos notre nous on ont ou où par parce pas peu peut peuvent plus plusieurs pour pourquoi puis qu
+quand que quel quelle quelles quels qui quoi s sa sans se selon ses si sien son sont sous soit sur t ta tandis te
+tel telle tels tes toi ton tous tout toute toutes très tu un une unes uns v va vers voici voilà vos votre vous vu
+y cette ceux-ci celle-ci cela entre avoir été aussi alors ainsi après avant déjà faire fait lors tant toujours
+""".split())
+
+STOPWORDS_EN = set("""
+a about above after again against all also am an and any are aren as at be because been before being below
+between both but by can cannot could did didn do does doesn doing don down during each few for from further
+get got had has have having he her here hers herself him himself his how however i if in into is isn it its
+itself just let me more most much must my myself no nor not now of off on once only or other our ours
+ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up us very was wasn we were weren what when where which
+while who whom why will with would you your yours yourself yourselves one two also may might shall via
+""".split())
+
+STOPWORDS_DE = set("""
+aber alle allem allen aller alles als also am an ander andere anderen auch auf aus bei beim bin bis bist da damit
+dann das dass dem den denn der des dich die dies diese diesem diesen dieser dieses dir doch dort du durch ein eine
+einem einen einer eines er es etwas euch euer für gegen gewesen hab habe haben hat hatte hatten hier hin hinter ich
+ihm ihn ihnen ihr ihre ihrem ihren ihrer im in indem ins ist jede jedem jeden jeder jedes jetzt kann kein keine
+können könnte man manche mehr mein meine mich mir mit muss musste nach nicht nichts noch nun nur ob oder ohne schon
+sehr sein seine sich sie sind so solche soll sollte sondern über um und uns unser unter viel vom von vor war waren
+warum was weil welche wenn wer werde werden wie wieder will wir wird wo wurde wurden zu zum zur zwar zwischen
+""".split())
+
+STOPWORDS_ES = set("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el él ella ellas
+ellos en entre era eran es esa esas ese eso esos esta está están estas este esto estos fue fueron ha han hasta
+hay la las le les lo los más me mi mis mucho muy nada ni no nos nosotros o os otra otras otro otros para pero poco
+por porque que qué quien se sea ser si sí sin sobre son su sus también tan te tiene tienen todo todos tu tus un
+una uno unos usted y ya yo
+""".split())
+
+STOPWORDS_IT = set("""
+a ad al alla alle allo agli ai anche ancora avere aveva c che chi ci come con contro cui da dal dalla dalle dagli
+dai degli dei del della delle dello di dove e è ed era erano essere gli ha hanno il in io la le lei li lo loro lui
+ma me mi mia mio molto ne negli nei nel nella nelle nello noi non nostro o per perché più poi quale quando quanto
+quella quelle quello questa queste questi questo se sei si sia siamo sono su sua sue sui sul sulla suo suoi tra
+tu tutti tutto un una uno voi
+""".split())
+
+STOPWORDS = STOPWORDS_FR | STOPWORDS_EN
+STOPWORDS_BY_LANG = {"fr": STOPWORDS_FR, "en": STOPWORDS_EN, "de": STOPWORDS_DE, "es": STOPWORDS_ES, "it": STOPWORDS_IT}
+
+_ELISIONS = {"l", "d", "j", "m", "n", "s", "t", "c", "qu", "jusqu", "lorsqu", "puisqu", "quoiqu"}
+_WORD_RE = re.compile(r"[^\W\d_]+(?:['’\-][^\W\d_]+)*")
+_BREAK_RE = re.compile(r"[.!?;:,()\[\]{}\"«»\n|/—–]+")
+
+MIN_LEN = 3
+MAX_PHRASE_WORDS = 3
+LANG_SAMPLE_CHARS = 1500  # début du texte pour choisir les mots vides : assez pour trancher, coût borné
+
+
+def normalize(word: str) -> str:
+    """Minuscule + suppression de l'élision française (l'IA -> ia, qu'il -> il)."""
+    w = word.lower().replace("’", "'")
+    if "'" in w:
+        head, _, tail = w.partition("'")
+        if head in _ELISIONS and tail:
+            w = tail
+    return w
+
+
+@lru_cache(maxsize=None)
+def stopwords_for(lang: str = "") -> set:
+    """Mots vides FR/EN, plus ceux de `lang` (code de services.langid) quand elle est connue."""
+    extra = STOPWORDS_BY_LANG.get(lang or "")
+    return STOPWORDS | extra if extra else STOPWORDS
+
+
+def is_content_word(term: str, stopwords: set = STOPWORDS) -> bool:
+    return len(term) >= MIN_LEN and term not in stopwords
+
+
+def _strip_elision(surface: str) -> str:
+    head, sep, tail = surface.replace("’", "'").partition("'")
+    return tail if sep and tail and head.lower() in _ELISIONS else surface
+
+
+@lru_cache(maxsize=1 << 16)
+def _token(word: str) -> tuple:
+    """(forme normalisée, forme d'origine sans élision), mémorisé : les mêmes mots reviennent sans cesse."""
+    return normalize(word), _strip_elision(word)
+
+
+def tokenize(text: str) -> List[List[tuple]]:
+    """Découpe en fragments (entre ponctuations) de (forme normalisée, forme d'origine sans élision)."""
+    fragments = []
+    for frag in _BREAK_RE.split(text or ""):
+        words = [_token(w) for w in _WORD_RE.findall(frag)]
+        if words:
+            fragments.append(words)
+    return fragments
+
+
+def _terms(fragments: List[List[tuple]]) -> Counter:
+    return Counter(t for frag in fragments for t, _ in frag if is_content_word(t))
+
+
+def content_terms(text: str) -> Counter:
+    """Fréquence des termes significatifs d'un texte (utilisé pour les statistiques du corpus)."""
+    return _terms(tokenize(text))
+
+
+def candidate_phrases(fragments: List[List[tuple]], stopwords: set = STOPWORDS) -> List[List[tuple]]:
+    """Suites de mots significatifs séparées par des mots vides ou la ponctuation (RAKE)."""
+    phrases = []
+    for frag in fragments:
+        current = []
+        for word in frag:
+            if len(word[0]) >= MIN_LEN and word[0] not in stopwords:
+                current.append(word)
+                continue
+            if current:
+                phrases.append(current)
+            current = []
+        if current:
+            phrases.append(current)
+    return phrases
+
+
+def extract_tags(text: str, count: int = 5, df: Optional[Dict[str, int]] = None, n_docs: int = 0,
+                 phrases: bool = True, lang: str = "", fragments: Optional[List[List[tuple]]] = None) -> List[str]:
+    """Tags d'un texte par TF-IDF (+ locutions RAKE si `phrases`).
+    `df` : fréquences documentaires des termes, `n_docs` : taille du corpus ; sans corpus, idf = 1.
+    `lang` : langue du texte, dont les mots vides sont écartés en plus de FR/EN.
+    `fragments` : tokenize(text) déjà calculé par l'appelant."""
+    stopwords = stopwords_for(lang)
+    if fragments is None:
+        fragments = tokenize(text)
+    tf = Counter()
+    surfaces: Dict[str, Counter] = {}
+    # comptage par couple (terme, forme) d'abord : une seule entrée par mot distinct ensuite
+    pairs = Counter(p for frag in fragments for p in frag if len(p[0]) >= MIN_LEN and p[0] not in stopwords)
+    for (term, surface), n in pairs.items():
+        tf[term] += n
+        if term not in surfaces:
+            surfaces[term] = Counter()
+        surfaces[term][surface] += n
+    if not tf:
+        return []
+    df = df or {}
+    total = sum(tf.values())
+
+    def idf(term):
+        if n_docs <= 0:
+            return 1.0
+        return math.log((n_docs + 1) / (df.get(term, 0) + 1)) + 1.0
+
+    word_score = {t: (c / total) * idf(t) for t, c in tf.items()}
+    scores: Dict[tuple, float] = {(t,): s for t, s in word_score.items()}
+    labels: Dict[tuple, str] = {(t,): surfaces[t].most_common(1)[0][0] for t in tf}
+
+    if phrases:
+        runs = candidate_phrases(fragments, stopwords)
+        degree = Counter()
+        for run in runs:
+            for term, _ in run:
+                degree[term] += len(run) - 1
+        # sous-suites contiguës de 2 à MAX_PHRASE_WORDS mots de chaque suite
+        counts, first_surface = Counter(), {}
+        for run in runs:
+            if len(run) < 2:
+                continue
+            terms = tuple(t for t, _ in run)
+            for i in range(len(run)):
+                for j in range(i + 2, min(len(run), i + MAX_PHRASE_WORDS) + 1):
+                    key = terms[i:j]
+                    counts[key] += 1
+                    if key not in first_surface:
+                        first_surface[key] = " ".join(s for _, s in run[i:j])
+        for key, n in counts.items():
+            if n < 2 and total > 40:
+                continue  # locution isolée dans un texte long : bruit
+            rake = sum((degree[t] + tf[t]) / tf[t] for t in key) / len(key)
+            scores[key] = sum(word_score[t] for t in key) * rake * min(n, 3) / len(key)
+            labels[key] = first_surface[key]
+
+    chosen: List[tuple] = []
+    for key, _ in sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])):
+        if any(set(key) & set(c) for c in chosen):
+            continue  # un mot déjà couvert par un tag retenu
+        chosen.append(key)
+        if len(chosen) >= count:
+            break
+    return [labels[k] for k in chosen]
+
+
+def generate_tags(text: str, count: int = 5, phrases: Optional[bool] = None, lang: Optional[str] = None) -> List[str]:
+    """Tags locaux avec les statistiques du corpus en base (voir services.indexer).
+    `lang` : langue du texte, détectée localement (sur son début) si absente.
+    Le texte n'est découpé qu'une fois ; configuration relue seulement si le fichier a changé."""
+    from ..config import cached_config
+    from . import indexer, langid
+    if phrases is None:
+        phrases = bool(cached_config().get("tagger_phrases", True))
+    if lang is None:
+        lang = langid.detect((text or "")[:LANG_SAMPLE_CHARS])
+    fragments = tokenize(text)
+    df, n_docs = indexer.corpus_stats(_terms(fragments))
+    return extract_tags(text, count=count, df=df, n_docs=n_docs, phrases=phrases, lang=lang, fragments=fragments)
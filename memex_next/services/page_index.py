@@ -0,0 +1,144 @@
+### memex_next/services/page_index.py
+"""
+Index des PDF joints au niveau de la page : texte de chaque page en plein
+texte (file_pages_fts, tenu à jour par triggers quand services.extraction
+enregistre une page), plan du document (file_outline) et libellés imprimés
+des pages (file_pages.label). Un résultat de recherche se situe ainsi en
+« page 137 — 4.2 Réglages ». Les PDF pas encore indexés le sont dans un
+thread dédié, un fichier à la fois (index_missing) : leurs pages sont extraites,
+OCR compris, dans un processus de basse priorité, avec une pause après chaque
+fichier, pour ne retenir ni l'interface ni les tâches de async_worker.runner.
+"""
+import re, threading, time
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from ..config import load_config
+from ..db import create_conn
+from .local_tagger import STOPWORDS
+
+DEFAULT_HITS = 50
+_running = threading.Lock()
+
+
+def index_file(conn, sha256: str, blob: bytes) -> int:
+    """Plan et libellés d'un PDF dont les pages sont déjà extraites ; renvoie le nombre de pages."""
+    from .pdf_reader import PdfDoc
+    with PdfDoc(blob) as doc:
+        total = doc.page_count
+        outline = doc.outline()
+        labels = [(doc.page_label(no), sha256, no) for no in range(1, total + 1)]
+    conn.execute("DELETE FROM file_outline WHERE sha256=?", (sha256,))
+    conn.executemany("INSERT INTO file_outline(sha256, seq, level, title, page_no) VALUES (?,?,?,?,?)",
+                     [(sha256, seq, level, title, page) for seq, (level, title, page) in enumerate(outline)])
+    # libellé gardé seulement s'il diffère du numéro de page
+    conn.executemany("UPDATE file_pages SET label=? WHERE sha256=? AND page_no=?",
+                     [(label if label != str(no) else None, sha, no) for label, sha, no in labels])
+    conn.execute("INSERT OR REPLACE INTO pdf_index(sha256, pages, indexed_at) VALUES (?,?,?)",
+                 (sha256, total, int(time.time())))
+    conn.commit()
+    return total
+
+
+def index_missing(cancel: Optional[threading.Event] = None, pause_ratio: Optional[float] = None) -> int:
+    """Indexe un à un les PDF joints absents de pdf_index ; renvoie le nombre traité.
+    Les pages jamais extraites le sont dans un processus de basse priorité (comme services.reindex), puis
+    une pause de `pause_ratio` × la durée du fichier (option `reindex_pause_ratio`) laisse la machine libre.
+    Un seul passage à la fois : un appel pendant qu'un autre tourne rend 0 aussitôt."""
+    if not _running.acquire(blocking=False):
+        return 0
+    from .reindex import DEFAULT_PAUSE_RATIO, _extract_file, _new_pool, _worker_opts, _write_batch
+    if pause_ratio is None:
+        pause_ratio = float(load_config().get("reindex_pause_ratio", DEFAULT_PAUSE_RATIO))
+    done, pool, opts = 0, None, None
+    conn = create_conn()
+    try:
+        while cancel is None or not cancel.is_set():
+            row = conn.execute("SELECT f.id, f.sha256, f.data FROM files f LEFT JOIN pdf_index p ON p.sha256 = f.sha256 "
+                               "WHERE f.mime='application/pdf' AND p.sha256 IS NULL AND f.data IS NOT NULL "
+                               "ORDER BY f.id LIMIT 1").fetchone()
+            if row is None:
+                break
+            file_id, sha256, blob = row
+            start = time.perf_counter()
+            try:
+                if conn.execute("SELECT 1 FROM file_pages WHERE sha256=? LIMIT 1", (sha256,)).fetchone() is None:
+                    if pool is None:
+                        pool, opts = _new_pool(1), _worker_opts()
+                    _write_batch(conn, [pool.submit(_extract_file, file_id, opts).result()], False)
+                    conn.commit()
+                index_file(conn, sha256, blob)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+                # PDF illisible : marqué pour ne pas être repris à chaque passage
+                conn.rollback()
+                conn.execute("INSERT OR REPLACE INTO pdf_index(sha256, pages, indexed_at) VALUES (?,0,?)",
+                             (sha256, int(time.time())))
+                conn.commit()
+            done += 1
+            pause = (time.perf_counter() - start) * pause_ratio
+            if pause and cancel is not None:
+                cancel.wait(pause)
+            elif pause:
+                time.sleep(pause)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        conn.close()
+        _running.release()
+    return done
+
+
+def schedule():
+    """Lance index_missing dans un thread dédié (après l'ajout d'un PDF, au démarrage) ; sans effet
+    si un passage est déjà en cours. Pas dans async_worker.runner : un premier passage sur une base
+    existante peut extraire et passer à l'OCR tous les PDF joints."""
+    if _running.locked():
+        return
+    threading.Thread(target=index_missing, name="page-index", daemon=True).start()
+
+
+def section_for(conn, sha256: str, page_no: int) -> str:
+    """Titre du signet le plus proche qui précède la page (le plus profond à page égale), "" sans plan."""
+    row = conn.execute("SELECT title FROM file_outline WHERE sha256=? AND page_no<=? "
+                       "ORDER BY page_no DESC, seq DESC LIMIT 1", (sha256, page_no)).fetchone()
+    return row[0] if row else ""
+
+
+def hit_label(hit: dict) -> str:
+    """« page 137 — 4.2 Réglages » (libellé imprimé de la page s'il existe)."""
+    label = f"page {hit['label'] or hit['page_no']}"
+    return f"{label} — {hit['section']}" if hit["section"] else label
+
+
+def search_pages(query: str, clip_id: Optional[int] = None, limit: int = DEFAULT_HITS, conn=None) -> List[dict]:
+    """Pages de PDF joints qui contiennent les termes de `query` (tous, sinon l'un d'eux), classées BM25 :
+    [{file_id, filename, clip_id, sha256, page_no, label, section, snippet}]. `clip_id` : pièces jointes de ce clip."""
+    # chiffres gardés (« erreur 404 », « 4.2 ») ; accents repliés par le tokenizer de file_pages_fts
+    words = re.findall(r"\w+", (query or "").lower())
+    terms = list(dict.fromkeys(t for t in words if t not in STOPWORDS)) or words
+    if not terms:
+        return []
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        rows = []
+        for op in (" ", " OR ") if len(terms) > 1 else (" ",):
+            sql = ("SELECT f.id, f.filename, f.clip_id, p.sha256, p.page_no, p.label, "
+                   "snippet(file_pages_fts, 0, '«', '»', '…', 12) "
+                   "FROM file_pages_fts JOIN file_pages p ON p.rowid = file_pages_fts.rowid "
+                   "JOIN files f ON f.sha256 = p.sha256 WHERE file_pages_fts MATCH ?")
+            params = [op.join(f'"{t}"' for t in terms)]
+            if clip_id is not None:
+                sql += " AND f.clip_id = ?"
+                params.append(clip_id)
+            rows = conn.execute(sql + " ORDER BY bm25(file_pages_fts) LIMIT ?", params + [limit]).fetchall()
+            if rows:
+                break
+        return [{"file_id": fid, "filename": fn, "clip_id": cid, "sha256": sha, "page_no": no, "label": label,
+                 "section": section_for(conn, sha, no), "snippet": " ".join((snip or "").split())}
+                for fid, fn, cid, sha, no, label, snip in rows]
+    finally:
+        if own: conn.close()
@@ -0,0 +1,184 @@
+### memex_next/services/pdf_reader.py
+"""
+Lecture des PDF par le moteur disponible le plus rapide : pypdfium2, puis pypdf ;
+pdfplumber (analyse de mise en page, bien plus lent) seulement si `layout` est
+demandé ou s'il est seul installé. Métadonnées, plan (signets), libellés de
+pages et texte page par page, avec les mêmes conventions quel que soit le moteur
+(pages numérotées à partir de 1).
+"""
+import threading
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import pypdf
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+try:
+    import pdfplumber
+    PDFPLUMBER_AVAILABLE = True
+except ImportError:
+    PDFPLUMBER_AVAILABLE = False
+
+BACKENDS = ("pdfium", "pypdf", "pdfplumber")  # du plus rapide au plus lent
+MAX_OUTLINE_ITEMS = 500
+# pdfium n'est pas sûr entre threads : un seul document pdfium ouvert à la fois par processus
+pdfium_lock = threading.RLock()
+
+
+def available_backends() -> List[str]:
+    flags = {"pdfium": PDFIUM_AVAILABLE, "pypdf": PYPDF_AVAILABLE, "pdfplumber": PDFPLUMBER_AVAILABLE}
+    return [b for b in BACKENDS if flags[b]]
+
+
+def choose_backend(layout: bool = False, preferred: str = "auto") -> Optional[str]:
+    """Moteur à utiliser : `preferred` s'il est installé, sinon le plus rapide (pdfplumber si `layout`)."""
+    found = available_backends()
+    if preferred in found:
+        return preferred
+    if layout and "pdfplumber" in found:
+        return "pdfplumber"
+    return found[0] if found else None
+
+
+class PdfDoc:
+    """PDF ouvert (chemin ou octets) ; à utiliser avec `with`."""
+
+    def __init__(self, source, backend: Optional[str] = None, layout: bool = False):
+        if backend is None:
+            from ..config import load_config
+            backend = choose_backend(layout, load_config().get("pdf_backend", "auto"))
+        if backend is None:
+            raise RuntimeError("aucun lecteur PDF disponible (pypdfium2, pypdf ou pdfplumber)")
+        self.backend = backend
+        self._locked = False
+        if backend == "pdfium":
+            pdfium_lock.acquire()
+            self._locked = True
+            try:
+                self._doc = pdfium.PdfDocument(source)
+            except Exception:
+                self._release()
+                raise
+        elif backend == "pypdf":
+            self._doc = pypdf.PdfReader(source if isinstance(source, str) else BytesIO(source))
+        else:
+            self._doc = pdfplumber.open(source if isinstance(source, str) else BytesIO(source))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self._doc.close()
+        except Exception:
+            pass
+        self._release()
+
+    def _release(self):
+        if self._locked:
+            self._locked = False
+            pdfium_lock.release()
+
+    @property
+    def page_count(self) -> int:
+        if self.backend == "pdfium":
+            return len(self._doc)
+        return len(self._doc.pages)
+
+    def metadata(self) -> dict:
+        """{title, author, subject} (chaînes éventuellement vides)."""
+        if self.backend == "pdfium":
+            raw = self._doc.get_metadata_dict()
+        elif self.backend == "pypdf":
+            raw = {k.lstrip("/"): v for k, v in (self._doc.metadata or {}).items()}
+        else:
+            raw = self._doc.metadata or {}
+        return {key.lower(): str(raw.get(key) or "").strip() for key in ("Title", "Author", "Subject")}
+
+    def page_text(self, page_no: int) -> str:
+        """Texte de la page `page_no` (à partir de 1), "" si illisible."""
+        try:
+            if self.backend == "pdfium":
+                page = self._doc[page_no - 1]
+                textpage = page.get_textpage()
+                try:
+                    return (textpage.get_text_range() or "").replace("\r\n", "\n").strip()
+                finally:
+                    textpage.close()
+                    page.close()
+            return (self._doc.pages[page_no - 1].extract_text() or "").strip()
+        except Exception:
+            return ""
+
+    def page_label(self, page_no: int) -> str:
+        """Libellé imprimé de la page (« iv », « 137 »…) s'il est défini, sinon son numéro."""
+        try:
+            if self.backend == "pdfium":
+                label = self._doc.get_page_label(page_no - 1)
+            elif self.backend == "pypdf":
+                label = self._doc.page_labels[page_no - 1]
+            else:
+                label = ""
+        except Exception:
+            label = ""
+        return label or str(page_no)
+
+    def outline(self) -> List[Tuple[int, str, Optional[int]]]:
+        """Signets du document : [(niveau à partir de 0, titre, page cible ou None)]."""
+        try:
+            if self.backend == "pdfium":
+                return self._pdfium_outline()
+            if self.backend == "pypdf":
+                return self._pypdf_outline(self._doc.outline, 0)
+        except Exception:
+            pass
+        return []
+
+    def _pdfium_outline(self):
+        out = []
+        for bm in self._doc.get_toc():
+            dest = bm.get_dest()
+            index = dest.get_index() if dest is not None else None
+            out.append((bm.level, bm.get_title().strip(), index + 1 if index is not None else None))
+            if len(out) >= MAX_OUTLINE_ITEMS:
+                break
+        return out
+
+    def _pypdf_outline(self, items, level):
+        out = []
+        for item in items:
+            if isinstance(item, list):
+                out += self._pypdf_outline(item, level + 1)
+            else:
+                try:
+                    index = self._doc.get_destination_page_number(item)
+                except Exception:
+                    index = None
+                out.append((level, str(item.title or "").strip(), index + 1 if index is not None else None))
+            if len(out) >= MAX_OUTLINE_ITEMS:
+                break
+        return out[:MAX_OUTLINE_ITEMS]
+
+
+def sample_pages(total: int, first: int = 5, spread: int = 3, extra=()) -> List[int]:
+    """Pages d'un aperçu : les `first` premières, puis `spread` pages réparties sur le reste
+    d'un long document, plus les pages `extra` (cibles des premiers signets…), triées."""
+    pages = set(range(1, min(first, total) + 1))
+    rest = total - first
+    if spread and rest > first:
+        step = rest / (spread + 1)
+        pages.update(first + round(step * (k + 1)) for k in range(spread))
+    pages.update(p for p in extra if p and 1 <= p <= total)
+    return sorted(pages)
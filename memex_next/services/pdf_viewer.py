@@ -0,0 +1,63 @@
+### memex_next/services/pdf_viewer.py
+"""
+Ouverture d'un PDF à une page donnée. Le lecteur par défaut du système
+(os.startfile sous Windows) ne reçoit que le chemin du fichier : un fragment
+« #page=N » y est perdu. Un lecteur connu est donc lancé directement avec son
+argument de page : celui de l'option `pdf_viewer` (chemin de l'exécutable),
+sinon le premier trouvé (SumatraPDF, Acrobat / Adobe Reader, Okular, Evince,
+zathura, qpdfview, MuPDF). Sans lecteur connu, l'appelant ouvre le fichier
+normalement et indique la page à l'utilisateur.
+"""
+import os, pathlib, shutil, subprocess, sys
+from typing import Callable, Dict, List, Optional
+
+from ..config import load_config
+
+# nom de l'exécutable (minuscules, sans extension) -> ligne de commande
+_ARGS: Dict[str, Callable[[str, str, int], List[str]]] = {
+    "sumatrapdf": lambda exe, path, page: [exe, "-reuse-instance", "-page", str(page), path],
+    "acrobat": lambda exe, path, page: [exe, "/A", f"page={page}", path],
+    "acrord32": lambda exe, path, page: [exe, "/A", f"page={page}", path],
+    "okular": lambda exe, path, page: [exe, "-p", str(page), path],
+    "evince": lambda exe, path, page: [exe, "-i", str(page), path],
+    "zathura": lambda exe, path, page: [exe, "-P", str(page), path],
+    "qpdfview": lambda exe, path, page: [exe, f"{path}#{page}"],
+    "mupdf": lambda exe, path, page: [exe, path, str(page)],
+}
+
+
+def _windows_candidates() -> List[pathlib.Path]:
+    roots = [os.environ.get(v) for v in ("LOCALAPPDATA", "ProgramFiles", "ProgramFiles(x86)", "ProgramW6432")]
+    rel = ["SumatraPDF/SumatraPDF.exe", "Adobe/Acrobat DC/Acrobat/Acrobat.exe",
+           "Adobe/Acrobat Reader DC/Reader/AcroRd32.exe", "Adobe/Acrobat Reader/Reader/AcroRd32.exe"]
+    return [pathlib.Path(root) / r for r in rel for root in roots if root]
+
+
+def find_viewer() -> Optional[str]:
+    """Exécutable d'un lecteur qui sait ouvrir un PDF à une page donnée, None sinon."""
+    configured = load_config().get("pdf_viewer", "")
+    if configured:
+        exe = shutil.which(configured) or (configured if os.path.isfile(configured) else None)
+        if exe and pathlib.Path(exe).stem.lower() in _ARGS:
+            return exe
+    for name in _ARGS:
+        exe = shutil.which(name)
+        if exe:
+            return exe
+    if sys.platform.startswith("win"):
+        for path in _windows_candidates():
+            if path.is_file():
+                return str(path)
+    return None
+
+
+def open_at_page(path: str, page: int) -> bool:
+    """Ouvre `path` à la page `page` (numéro physique, à partir de 1) ; False sans lecteur connu."""
+    exe = find_viewer()
+    if exe is None:
+        return False
+    try:
+        subprocess.Popen(_ARGS[pathlib.Path(exe).stem.lower()](exe, path, int(page)), close_fds=True)
+    except OSError:
+        return False
+    return True
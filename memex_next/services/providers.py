@@ -0,0 +1,144 @@
+### memex_next/services/providers.py
+"""
+Fournisseurs IA : DeepSeek distant (clés deepseek_*) et tout serveur compatible
+OpenAI (llama.cpp, Ollama, LM Studio...) déclaré dans `ai_providers`.
+Chaque fournisseur a sa limite de requêtes simultanées, ses timeouts et ses
+capacités (lots multi-textes, streaming) ; `ai_routes` associe chaque tâche
+à un fournisseur (ex. tags -> modèle local rapide, résumés -> gros modèle).
+
+Exemple de configuration :
+    "ai_providers": {"local": {"endpoint": "http://127.0.0.1:11434/v1/chat/completions",
+                               "model": "llama3.2:3b", "concurrency": 1, "batching": false}},
+    "ai_routes": {"tags": "local", "categories": "local"}
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from ..config import load_config
+
+DEFAULT_ENDPOINT = "https://api.deepseek.com/v1/chat/completions"
+DEFAULT_MODEL = "deepseek-chat"
+DEFAULT_PROVIDER = "deepseek"
+
+# Tâches routables : tags / titre / catégories / enrichissement combiné / résumés / résumés de sections /
+# questions sur les notes
+TASKS = ("tags", "title", "categories", "enrich", "summary", "chunk", "qa")
+
+
+class OpenAICompatibleProvider:
+    """Serveur /v1/chat/completions au format OpenAI (clé API facultative)."""
+
+    kind = "openai"
+    requires_key = False
+
+    def __init__(self, name: str, endpoint: str, model: str, api_key: str = "", concurrency: int = 2,
+                 connect_timeout: float = 5.0, timeout: float = 120.0, batching: bool = False,
+                 streaming: bool = True, extra: Optional[dict] = None):
+        self.name = name
+        self.endpoint = endpoint
+        self.model = model
+        self.api_key = api_key or ""
+        self.concurrency = max(1, int(concurrency))
+        self.connect_timeout = float(connect_timeout)
+        self.timeout = float(timeout)  # délai maximal entre deux lectures (génération lente d'un modèle local)
+        self.batching = bool(batching)
+        self.streaming = bool(streaming)
+        self.extra = dict(extra or {})  # champs additionnels du payload (ex. {"options": {...}} pour Ollama)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def is_ready(self) -> bool:
+        return bool(self.endpoint and self.model and (self.api_key or not self.requires_key))
+
+    @contextmanager
+    def slot(self):
+        """Borne le nombre de requêtes simultanées vers ce fournisseur."""
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def headers(self, stream: bool = False) -> Dict[str, str]:
+        h = {"Content-Type": "application/json"}
+        if self.api_key:
+            h["Authorization"] = f"Bearer {self.api_key}"
+        if stream:
+            h["Accept"] = "text/event-stream"
+        return h
+
+    def payload(self, messages, temperature: float, stream: bool = False) -> dict:
+        p = {"model": self.model, "messages": messages, "temperature": temperature}
+        if stream:
+            p["stream"] = True
+        p.update(self.extra)
+        return p
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} {self.model}@{self.endpoint}>"
+
+
+class DeepSeekProvider(OpenAICompatibleProvider):
+    """API DeepSeek : clé obligatoire, usage renvoyé en fin de flux, lots multi-textes fiables."""
+
+    kind = "deepseek"
+    requires_key = True
+
+    def payload(self, messages, temperature: float, stream: bool = False) -> dict:
+        p = super().payload(messages, temperature, stream)
+        if stream:
+            p["stream_options"] = {"include_usage": True}
+        return p
+
+
+_KINDS = {"openai": OpenAICompatibleProvider, "deepseek": DeepSeekProvider}
+_FIELDS = ("endpoint", "model", "api_key", "concurrency", "connect_timeout", "timeout", "batching", "streaming", "extra")
+_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def _specs(cfg: dict) -> Dict[str, dict]:
+    """Spécifications de tous les fournisseurs ; « deepseek » vient toujours des clés deepseek_*."""
+    specs = {DEFAULT_PROVIDER: {
+        "kind": "deepseek",
+        "endpoint": cfg.get("deepseek_endpoint") or DEFAULT_ENDPOINT,
+        "model": cfg.get("deepseek_model") or DEFAULT_MODEL,
+        "api_key": cfg.get("deepseek_api_key", ""),
+        "concurrency": int(cfg.get("ai_bulk_concurrency", 4)),
+        "connect_timeout": float(cfg.get("ai_connect_timeout", 5)),
+        "timeout": float(cfg.get("ai_read_timeout", 60)),
+        "batching": True,
+    }}
+    for name, spec in (cfg.get("ai_providers") or {}).items():
+        if isinstance(spec, dict):
+            specs[name] = {**({"kind": "openai"} if name != DEFAULT_PROVIDER else specs[DEFAULT_PROVIDER]), **spec}
+    return specs
+
+
+def get_provider(name: str = DEFAULT_PROVIDER, cfg: Optional[dict] = None) -> OpenAICompatibleProvider:
+    """Instance partagée (les sémaphores de concurrence doivent l'être) ; recréée si sa config change."""
+    cfg = cfg if cfg is not None else load_config()
+    specs = _specs(cfg)
+    spec = specs.get(name) or specs[DEFAULT_PROVIDER]
+    name = name if name in specs else DEFAULT_PROVIDER
+    frozen = tuple(sorted((k, repr(v)) for k, v in spec.items()))
+    with _cache_lock:
+        hit = _cache.get(name)
+        if hit and hit[0] == frozen:
+            return hit[1]
+        args = {k: v for k, v in spec.items() if k in _FIELDS}
+        cls = _KINDS.get(spec.get("kind", "openai"), OpenAICompatibleProvider)
+        provider = cls(name, **args)
+        _cache[name] = (frozen, provider)
+        return provider
+
+
+def provider_for(task: str, cfg: Optional[dict] = None) -> OpenAICompatibleProvider:
+    """Fournisseur routé pour une tâche (option `ai_routes`, défaut : deepseek)."""
+    cfg = cfg if cfg is not None else load_config()
+    routes = cfg.get("ai_routes") or {}
+    return get_provider(routes.get(task, DEFAULT_PROVIDER), cfg)
+
+
+def provider_names(cfg: Optional[dict] = None) -> list:
+    return list(_specs(cfg if cfg is not None else load_config()))
@@ -0,0 +1,198 @@
+### memex_next/services/qa.py
+"""
+Questions sur les notes : les clips sont découpés en passages indexés en
+plein texte (FTS5, table passages_fts) à l'enregistrement ; une question
+récupère localement les meilleurs passages, qui sont rangés dans un budget
+de tokens avec l'identifiant de leur clip, puis un seul appel IA rédige la
+réponse en citant ses sources sous la forme [#id].
+"""
+import hashlib, re, time, unicodedata
+from typing import Dict, List, Optional
+
+from ..ai import ai_complete, estimate_tokens
+from ..config import load_config
+from ..db import create_conn
+from .local_tagger import content_terms, is_content_word
+from .summarize import chunk_text
+from .telemetry import tracked
+
+DEFAULT_PASSAGE_TOKENS = 160
+DEFAULT_CONTEXT_TOKENS = 2500
+DEFAULT_TOP_K = 12
+MAX_PASSAGES_PER_CLIP = 3
+MAX_QUERY_TERMS = 16
+# Un terme présent dans plus de cette part des passages pèse peu dans BM25 mais coûte cher à classer :
+# il est écarté de la requête tant qu'il reste des termes plus rares
+FREQUENT_TERM_RATIO = 0.02
+# Question faite uniquement de termes fréquents : seuls les passages les plus récents qui les contiennent sont classés
+RECENT_WINDOW = 600
+
+_CITE_RE = re.compile(r"\[#(\d+)\]")
+
+
+# ---------- indexation des passages ----------
+def split_passages(text: str, max_tokens: int = DEFAULT_PASSAGE_TOKENS) -> List[str]:
+    return [p.strip() for p in chunk_text(text or "", max_tokens) if p.strip()]
+
+
+def _passages_hash(title: str, text: str, max_tokens: int) -> str:
+    return hashlib.sha256(f"{max_tokens}\x00{title}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def index_passages(conn, clip_id: int, text: str, title: str = "", max_tokens: Optional[int] = None) -> bool:
+    """Redécoupe un clip en passages si son titre ou son texte a changé (False sinon).
+    Ne valide pas la transaction : à l'appelant de faire commit()."""
+    max_tokens = int(max_tokens or load_config().get("qa_passage_tokens", DEFAULT_PASSAGE_TOKENS))
+    h = _passages_hash(title or "", text or "", max_tokens)
+    row = conn.execute("SELECT hash FROM passage_clips WHERE clip_id=?", (clip_id,)).fetchone()
+    if row and row[0] == h:
+        return False
+    conn.execute("DELETE FROM passages WHERE clip_id=?", (clip_id,))  # trg_passages_ad nettoie passages_fts
+    conn.executemany("INSERT INTO passages(clip_id, seq, title, text) VALUES (?,?,?,?)",
+                     [(clip_id, i, title or "", p) for i, p in enumerate(split_passages(text, max_tokens))])
+    conn.execute("INSERT OR REPLACE INTO passage_clips(clip_id, hash, indexed_at) VALUES (?,?,?)",
+                 (clip_id, h, int(time.time())))
+    return True
+
+
+def index_missing(batch: int = 200) -> int:
+    """Découpe les clips jamais passés par index_passages (bases existantes) ; renvoie le nombre traité."""
+    max_tokens = int(load_config().get("qa_passage_tokens", DEFAULT_PASSAGE_TOKENS))
+    conn = create_conn()
+    done = 0
+    try:
+        while True:
+            rows = conn.execute(
+                "SELECT c.id, c.raw_text, c.title FROM clips c LEFT JOIN passage_clips p ON p.clip_id = c.id "
+                "WHERE p.clip_id IS NULL ORDER BY c.id LIMIT ?", (batch,)).fetchall()
+            if not rows:
+                break
+            for clip_id, text, title in rows:
+                index_passages(conn, clip_id, text or "", title or "", max_tokens)
+            conn.commit()
+            done += len(rows)
+    finally:
+        conn.close()
+    return done
+
+
+# ---------- recherche ----------
+def _fold(term: str) -> str:
+    """Comme le tokenizer de passages_fts (remove_diacritics) : sans accents."""
+    return "".join(c for c in unicodedata.normalize("NFD", term) if not unicodedata.combining(c))
+
+
+def question_terms(question: str) -> List[str]:
+    """Termes significatifs de la question, sous la forme où passages_vocab les connaît."""
+    terms = []
+    for t, _ in content_terms(question).most_common(MAX_QUERY_TERMS):
+        terms += [part for part in re.split(r"\W+", _fold(t)) if is_content_word(part)]
+    return list(dict.fromkeys(terms))
+
+
+def _match(terms: List[str], op: str = "OR") -> str:
+    """Expression FTS5 : termes entre guillemets (aucun opérateur interprété)."""
+    return f" {op} ".join(f'"{t}"' for t in terms)
+
+
+def _search(conn, expr: str, limit: int, window: int = 0) -> List[tuple]:
+    """(rowid, score BM25) des meilleurs passages, classés sur la seule table FTS ;
+    avec `window`, parmi les `window` correspondances les plus récentes seulement."""
+    if window:
+        return conn.execute("SELECT rowid, score FROM (SELECT rowid, bm25(passages_fts, 2.0, 1.0) AS score "
+                            "FROM passages_fts WHERE passages_fts MATCH ? ORDER BY rowid DESC LIMIT ?) "
+                            "ORDER BY score LIMIT ?", (expr, window, limit)).fetchall()
+    return conn.execute("SELECT rowid, bm25(passages_fts, 2.0, 1.0) AS score FROM passages_fts "
+                        "WHERE passages_fts MATCH ? ORDER BY score LIMIT ?", (expr, limit)).fetchall()
+
+
+def retrieve(question: str, k: Optional[int] = None, conn=None) -> List[dict]:
+    """Meilleurs passages pour `question` (BM25, titre pondéré double), au plus
+    MAX_PASSAGES_PER_CLIP par clip : [{id, clip_id, seq, title, text, score}, ...].
+    Les termes très fréquents sont écartés s'il en reste de plus rares ; si tous le sont,
+    ils sont exigés ensemble (AND) avant de retomber sur n'importe lequel (OR), et seules
+    les RECENT_WINDOW correspondances les plus récentes sont classées."""
+    k = int(k or load_config().get("qa_top_k", DEFAULT_TOP_K))
+    terms = question_terms(question)
+    if not terms:
+        return []
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        marks = ",".join("?" * len(terms))
+        df = dict(conn.execute(f"SELECT term, doc FROM passages_vocab WHERE term IN ({marks})", terms).fetchall())
+        n_passages = conn.execute("SELECT COALESCE(MAX(id), 0) FROM passages").fetchone()[0]  # majorant, O(1)
+        cap = max(200, n_passages * FREQUENT_TERM_RATIO)
+        present = [t for t in terms if df.get(t)]
+        rare = [t for t in present if df[t] <= cap]
+        hits = []
+        if rare:
+            hits = _search(conn, _match(rare), k * 4)
+        elif present:
+            hits = _search(conn, _match(present, "AND"), k * 4, RECENT_WINDOW) if len(present) > 1 else []
+            hits = hits or _search(conn, _match(present), k * 4, RECENT_WINDOW)
+        if not hits:
+            return []
+        score = dict(hits)
+        rows = conn.execute(f"SELECT id, clip_id, seq, title, text FROM passages WHERE id IN "
+                            f"({','.join('?' * len(score))})", list(score)).fetchall()
+    finally:
+        if own: conn.close()
+    out, per_clip = [], {}
+    for pid, clip_id, seq, title, text in sorted(rows, key=lambda r: score[r[0]]):
+        if per_clip.get(clip_id, 0) >= MAX_PASSAGES_PER_CLIP:
+            continue
+        per_clip[clip_id] = per_clip.get(clip_id, 0) + 1
+        out.append({"id": pid, "clip_id": clip_id, "seq": seq, "title": title, "text": text, "score": -score[pid]})
+        if len(out) >= k:
+            break
+    return out
+
+
+# ---------- contexte ----------
+def pack_context(passages: List[dict], budget: Optional[int] = None) -> tuple:
+    """Range les passages (du plus pertinent au moins pertinent) dans `budget` tokens estimés.
+    Les passages retenus sont regroupés par clip, dans l'ordre du texte, sous un en-tête [#id] titre.
+    Renvoie (contexte, [clip_id, ...] dans l'ordre d'apparition)."""
+    budget = int(budget or load_config().get("qa_context_tokens", DEFAULT_CONTEXT_TOKENS))
+    chosen: Dict[int, List[dict]] = {}
+    used = 0
+    for p in passages:
+        cost = estimate_tokens(p["text"]) + (0 if p["clip_id"] in chosen else estimate_tokens(p["title"]) + 6)
+        if used + cost > budget:
+            continue  # un passage plus court et moins bien classé peut encore tenir
+        chosen.setdefault(p["clip_id"], []).append(p)
+        used += cost
+    blocks = []
+    for clip_id, parts in chosen.items():
+        head = f"[#{clip_id}] {parts[0]['title']}".rstrip()
+        blocks.append(head + "\n" + "\n[…]\n".join(p["text"] for p in sorted(parts, key=lambda p: p["seq"])))
+    return "\n\n".join(blocks), list(chosen)
+
+
+def _qa_system(lang: str) -> str:
+    return (f"Tu réponds en {lang} à une question à partir des seuls extraits de notes fournis. "
+            "Chaque extrait commence par [#id] et le titre de sa note. Après chaque information, cite sa source "
+            "sous la forme [#id]. Si les extraits ne permettent pas de répondre, dis-le simplement.")
+
+
+def _qa_messages(question: str, context: str, lang: str) -> list:
+    return [{"role": "system", "content": _qa_system(lang)},
+            {"role": "user", "content": f"Extraits:\n{context}\n\nQuestion : {question}"}]
+
+
+# ---------- question ----------
+@tracked
+def ask_notes(question: str, lang: str = "fr", on_delta=None, cancel=None) -> dict:
+    """Répond à `question` à partir des notes (un seul appel IA).
+    Renvoie {"answer", "sources": [{clip_id, title}], "cited": [clip_id cités dans la réponse]}."""
+    passages = retrieve(question)
+    if not passages:
+        return {"answer": "Aucune note ne correspond à cette question.", "sources": [], "cited": []}
+    context, clip_ids = pack_context(passages)
+    titles = {p["clip_id"]: p["title"] for p in passages}
+    answer = ai_complete(_qa_messages(question, context, lang), task="qa", on_delta=on_delta, cancel=cancel)
+    known = set(clip_ids)
+    cited = list(dict.fromkeys(int(m) for m in _CITE_RE.findall(answer or "") if int(m) in known))
+    return {"answer": answer, "sources": [{"clip_id": c, "title": titles.get(c, "")} for c in clip_ids],
+            "cited": cited}
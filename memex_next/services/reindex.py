@@ -0,0 +1,372 @@
+### memex_next/services/reindex.py
+"""
+Réextraction en masse des pièces jointes (fichiers joints avant l'OCR ou les
+améliorations de l'extracteur, ou restés sans texte) : la table files est
+parcourue par id croissant (pagination par clé, sans OFFSET), chaque fichier
+est réextrait dans un pool de processus de basse priorité, et les résultats
+d'un lot sont écrits dans une seule transaction avec le point de reprise
+(job_checkpoints) : une tâche interrompue reprend après le dernier lot écrit.
+Entre deux lots, une pause proportionnelle à la durée du lot (option
+`reindex_pause_ratio`) laisse la machine à l'interface. Débit et temps
+restant estimé sont rapportés au fil de l'eau.
+
+En ligne de commande : memex-reindex [--all] [--restart] [--workers N] …
+"""
+import argparse, multiprocessing, os, sys, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ..config import load_config, SEPARATOR
+from ..db import create_conn, init_db
+
+DEFAULT_BATCH = 16
+DEFAULT_PAUSE_RATIO = 0.5   # pause = moitié de la durée du lot (interface) ; 0 en ligne de commande
+MODES = ("missing", "all")  # sans texte à jour / tous les fichiers extractibles
+EXTRACTABLE = "(f.mime = 'application/pdf' OR f.mime LIKE 'image/%' OR f.mime LIKE 'text/%')"
+
+
+@dataclass
+class ReindexProgress:
+    done: int = 0           # fichiers traités depuis le début de la tâche (reprises comprises)
+    failed: int = 0
+    total: int = 0
+    session_done: int = 0   # traités par cet appel (base du débit)
+    elapsed: float = 0.0
+    changed_clips: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self.session_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Secondes restantes estimées au débit observé, None avant le premier lot."""
+        return (self.total - self.done) / self.rate if self.rate else None
+
+    def summary(self) -> str:
+        msg = f"{self.done}/{self.total} fichiers · {self.rate:.1f}/s"
+        if self.failed:
+            msg += f" · {self.failed} en erreur"
+        if self.eta is not None and self.done < self.total:
+            msg += f" · reste {_duration(self.eta)}"
+        return msg
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} s"
+    if seconds < 3600:
+        return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+
+# ---------- travail d'un processus ----------
+def _lower_priority():
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _extract_file(file_id: int, opts: dict) -> Tuple[int, str, str, Optional[List[Tuple[int, str, str]]], str]:
+    """(id, sha256, mime, [(page, texte, origine)] pour un PDF sinon None, texte complet), sans écrire en base :
+    pages d'un PDF lues à la suite dans ce processus, pages sans couche texte passées à l'OCR."""
+    from .extraction import _can_ocr, _extract_pages, _ocr_pages, _page_count, join_pages
+    conn = create_conn()
+    try:
+        row = conn.execute("SELECT sha256, mime, data FROM files WHERE id=?", (file_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None or row[2] is None:
+        return file_id, "", "", None, ""
+    sha256, mime, blob = row[0], row[1] or "", row[2]
+    if mime != "application/pdf":
+        from ..ocr import extract_uncached
+        return file_id, sha256, mime, None, (extract_uncached(blob, mime) or "").strip()
+    pages = dict(_extract_pages(blob, list(range(1, _page_count(blob) + 1))))
+    source = {no: "text" for no in pages}
+    scanned = [no for no, text in pages.items() if len(text) < opts["min_chars"]]
+    if scanned and opts["ocr"] and _can_ocr():
+        from ..ocr import AUTO_LANG, DEFAULT_OCR_LANG, lang_for_text
+        lang = opts["lang"]
+        if lang == AUTO_LANG:
+            text = join_pages(pages)
+            lang = lang_for_text(text, DEFAULT_OCR_LANG) if len(text) >= 200 else AUTO_LANG
+        for no, text in _ocr_pages(blob, scanned, opts["dpi"], lang, opts["preprocess"]):
+            pages[no], source[no] = text, "ocr"
+    return (file_id, sha256, mime, [(no, pages[no], source[no]) for no in sorted(pages)],
+            join_pages(pages).strip())
+
+
+def _worker_opts() -> dict:
+    from .extraction import DEFAULT_OCR_DPI, DEFAULT_OCR_MIN_CHARS
+    from ..ocr import AUTO_LANG
+    cfg = load_config()
+    return {"min_chars": int(cfg.get("ocr_min_chars", DEFAULT_OCR_MIN_CHARS)),
+            "ocr": bool(cfg.get("pdf_ocr_enabled", True)), "dpi": int(cfg.get("ocr_dpi", DEFAULT_OCR_DPI)),
+            "lang": cfg.get("ocr_lang", AUTO_LANG), "preprocess": bool(cfg.get("ocr_preprocess", True))}
+
+
+# ---------- sélection et point de reprise ----------
+def _pending_sql(mode: str) -> Tuple[str, tuple]:
+    from .extraction import EXTRACTOR_VERSION
+    where = f"f.data IS NOT NULL AND {EXTRACTABLE}"
+    if mode == "missing":
+        where += (" AND NOT EXISTS (SELECT 1 FROM file_texts t WHERE t.sha256 = f.sha256 "
+                  "AND t.version = ? AND t.text <> '')")
+        return where, (EXTRACTOR_VERSION,)
+    return where, ()
+
+
+def count_pending(mode: str = "missing", after_id: int = 0, conn=None) -> int:
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        where, params = _pending_sql(mode)
+        return conn.execute(f"SELECT COUNT(*) FROM files f WHERE f.id > ? AND {where}",
+                            (after_id,) + params).fetchone()[0]
+    finally:
+        if own: conn.close()
+
+
+def _next_ids(conn, mode: str, after_id: int, limit: int) -> List[int]:
+    where, params = _pending_sql(mode)
+    return [r[0] for r in conn.execute(f"SELECT f.id FROM files f WHERE f.id > ? AND {where} ORDER BY f.id LIMIT ?",
+                                       (after_id,) + params + (limit,))]
+
+
+def checkpoint(mode: str = "missing", conn=None) -> Optional[dict]:
+    """Point de reprise de la tâche `mode` : {last_id, done, failed, started_at, updated_at, finished_at}."""
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        row = conn.execute("SELECT last_id, done, failed, started_at, updated_at, finished_at "
+                           "FROM job_checkpoints WHERE name=?", (f"reindex_{mode}",)).fetchone()
+    finally:
+        if own: conn.close()
+    if row is None:
+        return None
+    return dict(zip(("last_id", "done", "failed", "started_at", "updated_at", "finished_at"), row))
+
+
+# ---------- écriture d'un lot ----------
+def _write_batch(conn, results: List[tuple], append_missing: bool) -> List[int]:
+    """Pages, texte en cache et clips concernés d'un lot ; renvoie les clips modifiés (sans commit)."""
+    from .extraction import EXTRACTOR_VERSION, replace_attached_text
+    from .indexer import write_text
+    changed = []
+    for file_id, sha256, mime, pages, text in results:
+        if not sha256:
+            continue
+        if pages:
+            # un texte déjà extrait n'est jamais remplacé par une page vide (OCR devenu indisponible…)
+            conn.executemany(
+                "INSERT INTO file_pages(sha256, page_no, text, source) VALUES (?,?,?,?) "
+                "ON CONFLICT(sha256, page_no) DO UPDATE SET text=excluded.text, source=excluded.source "
+                "WHERE excluded.text <> '' OR file_pages.text = ''",
+                [(sha256, no, page_text, source) for no, page_text, source in pages])
+        if not text:
+            continue
+        old = conn.execute("SELECT text FROM file_texts WHERE sha256=?", (sha256,)).fetchone()
+        old = old[0] if old else ""
+        conn.execute("INSERT OR REPLACE INTO file_texts(sha256, version, mime, text, extracted_at) VALUES (?,?,?,?,?)",
+                     (sha256, EXTRACTOR_VERSION, mime, text, int(time.time())))
+        if old and old != text:
+            changed += replace_attached_text(conn, sha256, old, text)
+        elif not old and append_missing:
+            # fichier resté sans texte : ajouté à son clip comme lors d'un ajout classique
+            row = conn.execute("SELECT c.id, c.raw_text FROM files f JOIN clips c ON c.id = f.clip_id "
+                               "WHERE f.id=?", (file_id,)).fetchone()
+            if row and text not in (row[1] or ""):
+                current = row[1] or ""
+                new = current + (("\n" + SEPARATOR + "\n") if current else "") + text
+                write_text(conn, row[0], new, summary=new[:150] + "...")
+                changed.append(row[0])
+    return changed
+
+
+# ---------- tâche ----------
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn : pas de fork d'un processus qui porte Tk et des threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_lower_priority)
+
+
+def _extract_batch(pool_ref: list, workers: int, ids: List[int], opts: dict) -> Tuple[List[tuple], int]:
+    """Résultats du lot (dans l'ordre des ids) et nombre d'échecs. Si un fichier fait tomber un processus,
+    le pool est recréé et le lot repris fichier par fichier pour isoler le fautif."""
+    try:
+        futures = [pool_ref[0].submit(_extract_file, fid, opts) for fid in ids]
+        results, failed = [], 0
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except BrokenProcessPool:
+                raise
+            except Exception:
+                failed += 1
+        return results, failed
+    except BrokenProcessPool:
+        pass
+    results, failed = [], 0
+    for fid in ids:
+        pool_ref[0].shutdown(wait=False, cancel_futures=True)
+        pool_ref[0] = _new_pool(workers)
+        try:
+            results.append(pool_ref[0].submit(_extract_file, fid, opts).result())
+        except Exception:
+            failed += 1
+    return results, failed
+
+
+def run(mode: str = "missing", workers: Optional[int] = None, batch: Optional[int] = None,
+        pause_ratio: Optional[float] = None, restart: bool = False, append_missing: bool = True,
+        cancel: Optional[threading.Event] = None,
+        progress: Optional[Callable[[ReindexProgress], None]] = None) -> ReindexProgress:
+    """Réextrait les fichiers joints (`mode` "missing" : sans texte à jour, "all" : tous) et reprend
+    là où une tâche précédente s'est arrêtée, sauf `restart`. `progress(ReindexProgress)` après chaque lot.
+    append_missing : le texte trouvé pour un fichier qui n'en avait pas est ajouté à son clip (et indexé),
+    False pour ne remplir que le cache d'extraction et les pages."""
+    from .extraction import default_workers
+    if mode not in MODES:
+        raise ValueError(f"mode inconnu : {mode}")
+    cfg = load_config()
+    workers = max(1, int(workers or cfg.get("reindex_workers", 0) or max(1, default_workers() // 2)))
+    batch = max(1, int(batch or cfg.get("reindex_batch", DEFAULT_BATCH)))
+    pause_ratio = max(0.0, float(cfg.get("reindex_pause_ratio", DEFAULT_PAUSE_RATIO)
+                                 if pause_ratio is None else pause_ratio))
+    name = f"reindex_{mode}"
+    now = int(time.time())
+    conn = create_conn()
+    state = checkpoint(mode, conn)
+    if restart or state is None or state["finished_at"] is not None:
+        state = {"last_id": 0, "done": 0, "failed": 0}
+        conn.execute("INSERT OR REPLACE INTO job_checkpoints(name, last_id, done, failed, started_at, updated_at, "
+                     "finished_at) VALUES (?,0,0,0,?,?,NULL)", (name, now, now))
+        conn.commit()
+    last_id = state["last_id"]
+    prog = ReindexProgress(done=state["done"], failed=state["failed"],
+                           total=state["done"] + count_pending(mode, last_id, conn))
+    opts = _worker_opts()
+    pool_ref = [_new_pool(workers)]
+    start = time.perf_counter()
+    try:
+        while cancel is None or not cancel.is_set():
+            ids = _next_ids(conn, mode, last_id, batch)
+            if not ids:
+                conn.execute("UPDATE job_checkpoints SET finished_at=?, updated_at=? WHERE name=?",
+                             (int(time.time()), int(time.time()), name))
+                conn.commit()
+                break
+            t0 = time.perf_counter()
+            results, failed = _extract_batch(pool_ref, workers, ids, opts)
+            last_id = ids[-1]
+            prog.done += len(ids)
+            prog.session_done += len(ids)
+            prog.failed += failed
+            # résultats du lot (texte et indexation des clips) et point de reprise dans la même transaction
+            changed = _write_batch(conn, results, append_missing)
+            conn.execute("UPDATE job_checkpoints SET last_id=?, done=?, failed=?, updated_at=? WHERE name=?",
+                         (last_id, prog.done, prog.failed, int(time.time()), name))
+            conn.commit()
+            prog.changed_clips += len(set(changed))
+            prog.elapsed = time.perf_counter() - start
+            if progress:
+                progress(prog)
+            if pause_ratio and cancel is not None:
+                cancel.wait((time.perf_counter() - t0) * pause_ratio)
+            elif pause_ratio:
+                time.sleep((time.perf_counter() - t0) * pause_ratio)
+    finally:
+        pool_ref[0].shutdown(wait=False, cancel_futures=True)
+        conn.close()
+    prog.elapsed = time.perf_counter() - start
+    # pages, plan et libellés des PDF jamais indexés par page
+    from .page_index import index_missing
+    index_missing(cancel)
+    return prog
+
+
+# ---------- tâche de fond (Options) ----------
+_job: Optional[threading.Thread] = None
+_job_cancel = threading.Event()
+
+
+def running() -> bool:
+    return _job is not None and _job.is_alive()
+
+
+def start(mode: str = "missing", progress: Optional[Callable[[ReindexProgress], None]] = None,
+          done: Optional[Callable[[Optional[ReindexProgress], Optional[Exception]], None]] = None) -> bool:
+    """Lance `run` dans un thread dédié (tâche longue : pas dans async_worker.runner) ; False si déjà lancée."""
+    global _job
+    if running():
+        return False
+    _job_cancel.clear()
+
+    def work():
+        res = err = None
+        try:
+            res = run(mode, cancel=_job_cancel, progress=progress)
+        except Exception as e:
+            err = e
+        if done:
+            try: done(res, err)
+            except Exception: pass
+
+    _job = threading.Thread(target=work, name="reindex", daemon=True)
+    _job.start()
+    return True
+
+
+def stop():
+    """Arrête la tâche après le lot en cours (reprise au prochain lancement)."""
+    _job_cancel.set()
+
+
+# ---------- ligne de commande ----------
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="memex-reindex",
+                                     description="Re-extract attachment text and reindex it (resumable).")
+    parser.add_argument("--all", action="store_true",
+                        help="Re-extract every attachment, not only those without up-to-date text.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first file.")
+    parser.add_argument("--workers", type=int, help="Extraction processes (default: half the CPUs).")
+    parser.add_argument("--batch", type=int, help=f"Files per transaction (default {DEFAULT_BATCH}).")
+    parser.add_argument("--pause", type=float, default=0.0,
+                        help="Pause after each batch, as a fraction of its duration (default 0).")
+    parser.add_argument("--no-append", action="store_true",
+                        help="Do not append text found for previously empty attachments to their clip.")
+    parser.add_argument("--status", action="store_true", help="Show the checkpoint and pending count, then exit.")
+    args = parser.parse_args(argv)
+
+    init_db().close()
+    mode = "all" if args.all else "missing"
+    if args.status:
+        state = checkpoint(mode)
+        after = state["last_id"] if state and state["finished_at"] is None else 0
+        print(f"checkpoint: {state or 'none'}")
+        print(f"pending ({mode}): {count_pending(mode, after)}")
+        return 0
+
+    def report(p: ReindexProgress):
+        eta = _duration(p.eta) if p.eta is not None else "?"
+        print(f"\r{p.done}/{p.total} files  {p.rate:.2f} files/s  failed {p.failed}  ETA {eta}   ",
+              end="", file=sys.stderr, flush=True)
+
+    try:
+        res = run(mode, workers=args.workers, batch=args.batch, pause_ratio=args.pause, restart=args.restart,
+                  append_missing=not args.no_append, progress=report)
+    except KeyboardInterrupt:
+        print("\ninterrupted: progress kept, run again to resume", file=sys.stderr)
+        return 130
+    print(f"\n{res.session_done} file(s) in {res.elapsed:.1f} s ({res.rate:.2f} files/s), "
+          f"{res.failed} failed, {res.changed_clips} clip(s) updated", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
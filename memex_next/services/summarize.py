@@ -0,0 +1,267 @@
+### memex_next/services/summarize.py
+"""
+Résumé map-reduce des documents longs : découpage par structure (pages, titres)
+dans un budget de tokens estimé localement, résumés partiels en parallèle,
+réduction hiérarchique. Les résumés de morceaux sont mis en cache par hash du
+contenu ; les limites de morceaux sont ancrées sur des sections choisies par
+leur propre contenu, si bien qu'une modification ne déplace que les limites
+voisines : seuls les morceaux changés repartent à l'IA. Cache borné en taille
+(LRU) et en âge, comme ai_cache.
+"""
+import hashlib, re, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from ..ai import _provider_call, get_ai_provider, AICancelled, estimate_tokens
+from ..config import load_config
+from ..db import create_conn
+from .bulk_ai import call_with_retry
+from . import telemetry
+
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_INPUT_TOKENS = 2000
+DEFAULT_CACHE_MAX_ENTRIES = 5000
+DEFAULT_CACHE_TTL_DAYS = 90
+MIN_FILL = 0.6  # un morceau n'est coupé sur une section d'ancrage qu'une fois rempli à 60 % du budget
+
+# Début de section : marqueur de page de l'extraction PDF, titre Markdown, saut de page
+_SECTION_RE = re.compile(r"^(?:=== Page \d+ ===|#{1,6}\s+\S.*|\f)", re.M)
+
+
+def split_sections(text: str) -> List[str]:
+    """Coupe le texte avant chaque page / titre ; le texte précédant le premier titre forme une section."""
+    text = (text or "").replace("\r\n", "\n")
+    starts = [m.start() for m in _SECTION_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    sections, pending = [], ""
+    for a, b in zip(bounds, bounds[1:]):
+        section = text[a:b].strip("\f\n ")
+        if not section:
+            continue
+        if pending:
+            section = f"{pending}\n{section}"
+            pending = ""
+        if "\n" not in section:
+            pending = section  # marqueur de page ou titre seul : rattaché à la section suivante
+            continue
+        sections.append(section)
+    if pending:
+        sections.append(pending)
+    return sections
+
+
+def _split_oversized(section: str, max_tokens: int) -> List[str]:
+    """Section trop longue : découpe par paragraphes, puis par longueur brute en dernier recours."""
+    parts, current = [], ""
+    for para in re.split(r"\n\s*\n", section):
+        while estimate_tokens(para) > max_tokens:
+            cut = max_tokens * 4
+            head, para = para[:cut], para[cut:]
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(head)
+        candidate = f"{current}\n\n{para}" if current else para
+        if current and estimate_tokens(candidate) > max_tokens:
+            parts.append(current)
+            current = para
+        else:
+            current = candidate
+    if current.strip():
+        parts.append(current)
+    return parts
+
+
+def _is_anchor(piece: str) -> bool:
+    """Une section sur deux environ, choisie par son seul contenu (indépendant de sa position)."""
+    return hashlib.sha1(piece.strip().encode("utf-8")).digest()[0] & 1 == 0
+
+
+def chunk_text(text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """Regroupe les sections successives en morceaux d'au plus `max_tokens` tokens estimés.
+    Un morceau se termine avant de déborder, ou après une section d'ancrage une fois rempli à MIN_FILL :
+    deux versions d'un texte retrouvent les mêmes limites dès la première ancre qui suit une modification,
+    au lieu de décaler tous les morceaux suivants."""
+    chunks, current = [], ""
+    for section in split_sections(text):
+        pieces = _split_oversized(section, max_tokens) if estimate_tokens(section) > max_tokens else [section]
+        for piece in pieces:
+            candidate = f"{current}\n\n{piece}" if current else piece
+            if current and estimate_tokens(candidate) > max_tokens:
+                chunks.append(current)
+                current = piece
+            else:
+                current = candidate
+            if _is_anchor(piece) and estimate_tokens(current) >= max_tokens * MIN_FILL:
+                chunks.append(current)
+                current = ""
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _content_hash(text: str, model: str, lang: str, level: int) -> str:
+    norm = "\n".join(line.rstrip() for line in text.strip().split("\n"))
+    return hashlib.sha256(f"{model}\x00{lang}\x00{level}\x00{norm}".encode("utf-8")).hexdigest()
+
+
+def _cache_get(h: str) -> Optional[str]:
+    ttl = int(float(load_config().get("summary_cache_ttl_days", DEFAULT_CACHE_TTL_DAYS)) * 86400)
+    now = int(time.time())
+    try:
+        conn = create_conn()
+        row = conn.execute("SELECT summary, created_at FROM chunk_summaries WHERE hash=?", (h,)).fetchone()
+        if row and ttl > 0 and (row[1] or 0) + ttl < now:
+            conn.execute("DELETE FROM chunk_summaries WHERE hash=?", (h,))
+            row = None
+        elif row:
+            conn.execute("UPDATE chunk_summaries SET last_used=? WHERE hash=?", (now, h))
+        conn.commit()
+        conn.close()
+        return row[0] if row else None
+    except Exception:
+        return None
+
+
+def _evict(conn, max_entries: int) -> int:
+    excess = conn.execute("SELECT COUNT(*) FROM chunk_summaries").fetchone()[0] - max(0, max_entries)
+    if excess <= 0:
+        return 0
+    return conn.execute("DELETE FROM chunk_summaries WHERE hash IN (SELECT hash FROM chunk_summaries "
+                        "ORDER BY COALESCE(last_used, created_at) ASC LIMIT ?)", (excess,)).rowcount
+
+
+def _cache_put(h: str, model: str, lang: str, summary: str):
+    max_entries = int(load_config().get("summary_cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES))
+    now = int(time.time())
+    try:
+        conn = create_conn()
+        conn.execute("INSERT OR REPLACE INTO chunk_summaries(hash, model, lang, summary, created_at, last_used) "
+                     "VALUES (?,?,?,?,?,?)", (h, model, lang, summary, now, now))
+        _evict(conn, max_entries)
+        conn.commit()
+        conn.close()
+    except Exception:
+        pass
+
+
+def prune() -> int:
+    """Supprime les résumés plus vieux que `summary_cache_ttl_days` et, au-delà de
+    `summary_cache_max_entries`, les moins récemment utilisés ; renvoie le nombre supprimé."""
+    cfg = load_config()
+    ttl = int(float(cfg.get("summary_cache_ttl_days", DEFAULT_CACHE_TTL_DAYS)) * 86400)
+    conn = create_conn()
+    try:
+        n = 0
+        if ttl > 0:
+            n = conn.execute("DELETE FROM chunk_summaries WHERE created_at < ?", (int(time.time()) - ttl,)).rowcount
+        n += _evict(conn, int(cfg.get("summary_cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES)))
+        conn.commit()
+        return n
+    finally:
+        conn.close()
+
+
+def clear_cache() -> int:
+    conn = create_conn()
+    n = conn.execute("DELETE FROM chunk_summaries").rowcount
+    conn.commit()
+    conn.close()
+    return n
+
+
+class MapReduceSummarizer:
+    """Condense un texte long jusqu'à tenir dans `input_tokens` tokens.
+    Niveau 0 : un résumé par morceau ; niveaux suivants : les résumés sont regroupés
+    et résumés à nouveau jusqu'à passer sous le budget."""
+
+    def __init__(self, lang: str = "fr", chunk_tokens: Optional[int] = None, input_tokens: Optional[int] = None,
+                 concurrency: Optional[int] = None, cancel: Optional[threading.Event] = None,
+                 progress: Optional[Callable[[int, int], None]] = None):
+        cfg = load_config()
+        self.cfg = cfg
+        self.lang = lang
+        self.chunk_tokens = int(chunk_tokens or cfg.get("summary_chunk_tokens", DEFAULT_CHUNK_TOKENS))
+        self.input_tokens = int(input_tokens or cfg.get("summary_input_tokens", DEFAULT_INPUT_TOKENS))
+        self.concurrency = max(1, int(concurrency or cfg.get("ai_bulk_concurrency", 4)))
+        self.retries = int(cfg.get("ai_max_retries", 4))
+        self.cancel = cancel
+        self.progress = progress
+        self.stats = {"chunks": 0, "cached": 0, "calls": 0, "levels": 0}
+        self.site = telemetry.current_site() or "condense_text"  # repris dans les threads du pool
+        self._lock = threading.Lock()
+        self._done = self._total = 0
+
+    def _check_cancel(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise AICancelled("Génération annulée")
+
+    def _summarize_one(self, text: str, level: int) -> str:
+        self._check_cancel()
+        provider = get_ai_provider("chunk")
+        h = _content_hash(text, provider.model, self.lang, level)
+        cached = _cache_get(h)
+        if cached is None:
+            if level == 0:
+                instr = (f"Tu résumes un extrait d'un document long en {self.lang}. Conserve les faits, chiffres, "
+                         "noms et conclusions utiles ; garde les titres de section. Réponds par le résumé seul.")
+            else:
+                instr = (f"Tu fusionnes des résumés partiels consécutifs d'un même document en {self.lang}, "
+                         "sans répétition et en gardant l'ordre. Réponds par le résumé fusionné seul.")
+            sys = {"role": "system", "content": instr}
+            user = {"role": "user", "content": text}
+            def call():
+                with telemetry.call_site(self.site):
+                    return _provider_call(provider, [sys, user], use_cache=False, task="chunk").strip()
+            cached = call_with_retry(call, retries=self.retries)
+            _cache_put(h, provider.model, self.lang, cached)
+            with self._lock:
+                self.stats["calls"] += 1
+        else:
+            with self._lock:
+                self.stats["cached"] += 1
+        with self._lock:
+            self._done += 1
+            if self.progress:
+                self.progress(self._done, self._total)
+        return cached
+
+    def _map(self, pieces: List[str], level: int) -> List[str]:
+        with self._lock:
+            self._total += len(pieces)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._summarize_one, p, level) for p in pieces]
+            try:
+                return [f.result() for f in futures]
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+
+    def condense(self, text: str) -> str:
+        """Renvoie `text` tel quel s'il tient dans le budget, sinon sa condensation map-reduce."""
+        if estimate_tokens(text) <= self.input_tokens:
+            return text
+        chunks = chunk_text(text, self.chunk_tokens)
+        self.stats["chunks"] = len(chunks)
+        summaries = self._map(chunks, 0)
+        level = 0
+        while estimate_tokens("\n\n".join(summaries)) > self.input_tokens and len(summaries) > 1:
+            level += 1
+            # titres sans numéro : un résumé inchangé garde le même hash quand le nombre de parties varie
+            groups = chunk_text("\n\n".join(f"# Partie\n{s}" for s in summaries), self.chunk_tokens)
+            if len(groups) >= len(summaries):
+                # Résumés individuellement trop longs pour être regroupés : réduire deux par deux
+                groups = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+            summaries = self._map(groups, level)
+        self.stats["levels"] = level + 1
+        return "\n\n".join(summaries)
+
+
+@telemetry.tracked
+def condense_text(text: str, lang: str = "fr", cancel: Optional[threading.Event] = None,
+                  progress: Optional[Callable[[int, int], None]] = None, **kwargs) -> str:
+    """Raccourci : `MapReduceSummarizer(...).condense(text)`."""
+    return MapReduceSummarizer(lang=lang, cancel=cancel, progress=progress, **kwargs).condense(text)
@@ -0,0 +1,239 @@
+### memex_next/services/telemetry.py
+"""
+Télémétrie locale des appels IA (table ai_calls) : latence, tokens, statut,
+fournisseur et point d'appel (fonction de haut niveau à l'origine de l'appel,
+ex. analyze_pdf_complete). Les lignes sont écrites par paquets en tâche de fond.
+"""
+import atexit, csv, sys, threading, time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional
+
+from ..config import cached_config, load_config
+from ..db import create_conn
+
+FLUSH_EVERY = 20
+FLUSH_DELAY = 5.0
+MAX_BUFFERED = 1000  # lignes gardées en mémoire quand la base est indisponible
+DEFAULT_RETENTION_DAYS = 90
+# USD par million de tokens : prompt non caché, prompt servi par le cache du fournisseur, complétion
+DEFAULT_PRICES = {"deepseek": (0.27, 0.07, 1.10), "direct": (0.27, 0.07, 1.10)}
+
+COLUMNS = ("ts", "site", "task", "provider", "model", "status", "cached", "stream", "latency_ms", "ttft_ms",
+           "prompt_tokens", "cached_prompt_tokens", "completion_tokens", "error")
+
+_local = threading.local()
+_buffer: List[tuple] = []
+_buffer_lock = threading.Lock()
+_flush_timer: Optional[threading.Timer] = None
+
+
+# ---------- point d'appel ----------
+@contextmanager
+def call_site(name: str):
+    """Attribue les appels IA faits dans ce bloc à `name` (le plus externe l'emporte)."""
+    stack = getattr(_local, "sites", None)
+    if stack is None:
+        stack = _local.sites = []
+    stack.append(name)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def current_site() -> str:
+    stack = getattr(_local, "sites", None)
+    return stack[0] if stack else ""
+
+
+def tracked(fn):
+    """Décorateur : les appels IA faits par `fn` lui sont attribués."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with call_site(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# ---------- enregistrement ----------
+def is_enabled() -> bool:
+    return bool(cached_config().get("ai_telemetry_enabled", True))
+
+
+def record(task: str = "", provider: str = "", model: str = "", status: int = 0, cached: bool = False,
+           stream: bool = False, latency_ms: float = 0.0, ttft_ms: Optional[float] = None,
+           prompt_tokens: int = 0, cached_prompt_tokens: int = 0, completion_tokens: int = 0, error: str = ""):
+    if not is_enabled():
+        return
+    row = (int(time.time()), current_site() or task, task, provider, model, int(status or 0), int(bool(cached)),
+           int(bool(stream)), float(latency_ms or 0), ttft_ms, int(prompt_tokens or 0), int(cached_prompt_tokens or 0),
+           int(completion_tokens or 0), (error or "")[:300])
+    with _buffer_lock:
+        _buffer.append(row)
+        full = len(_buffer) % FLUSH_EVERY == 0  # après un échec, nouvel essai tous les FLUSH_EVERY appels
+    if not (full and flush()):
+        _schedule_flush()
+
+
+def _schedule_flush():
+    global _flush_timer
+    with _buffer_lock:
+        if _flush_timer is not None:
+            return
+        def run():
+            global _flush_timer
+            with _buffer_lock:
+                _flush_timer = None
+            if not flush():
+                _schedule_flush()
+        _flush_timer = threading.Timer(FLUSH_DELAY, run)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush() -> bool:
+    """Écrit les lignes en attente ; False si la base était indisponible (lignes gardées)."""
+    with _buffer_lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    if not rows:
+        return True
+    try:
+        conn = create_conn()
+        try:
+            conn.executemany(f"INSERT INTO ai_calls({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                             rows)
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        # Base verrouillée ou indisponible : les lignes sont remises en tête du tampon pour
+        # l'écriture suivante ; au-delà de MAX_BUFFERED, les plus anciennes sont abandonnées.
+        with _buffer_lock:
+            _buffer[:0] = rows
+            lost = max(0, len(_buffer) - MAX_BUFFERED)
+            del _buffer[:lost]
+        if lost:
+            print(f"télémétrie IA : {lost} mesure(s) perdue(s) ({e})", file=sys.stderr)
+        return False
+    return True
+
+
+def _flush_at_exit():
+    if not flush():
+        with _buffer_lock:
+            lost = len(_buffer)
+        print(f"télémétrie IA : {lost} mesure(s) non enregistrée(s) à la fermeture", file=sys.stderr)
+
+
+atexit.register(_flush_at_exit)
+
+
+def purge(days: Optional[int] = None) -> int:
+    """Supprime les mesures plus anciennes que `days` jours (option `ai_telemetry_days`)."""
+    days = int(days if days is not None else load_config().get("ai_telemetry_days", DEFAULT_RETENTION_DAYS))
+    if days <= 0:
+        return 0
+    conn = create_conn()
+    n = conn.execute("DELETE FROM ai_calls WHERE ts < ?", (int(time.time()) - days * 86400,)).rowcount
+    conn.commit()
+    conn.close()
+    return n
+
+
+# ---------- agrégats ----------
+def _prices(provider: str, cfg: dict):
+    prices = {**DEFAULT_PRICES, **(cfg.get("ai_prices") or {})}
+    return prices.get(provider) or (0.0, 0.0, 0.0)
+
+
+def cost(provider: str, prompt_tokens: int, cached_prompt_tokens: int, completion_tokens: int,
+         cfg: Optional[dict] = None) -> float:
+    """Coût estimé en USD (option `ai_prices` : {fournisseur: [prompt, prompt caché, complétion]} par million)."""
+    p_miss, p_hit, p_out = _prices(provider, cfg if cfg is not None else load_config())
+    miss = max(0, prompt_tokens - cached_prompt_tokens)
+    return (miss * p_miss + cached_prompt_tokens * p_hit + completion_tokens * p_out) / 1e6
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def stats_by_site(days: int = 7) -> List[dict]:
+    """Par point d'appel sur les `days` derniers jours : appels, erreurs, part servie par le cache local,
+    latence p50/p95 (appels réseau réussis), tokens et coût estimé."""
+    flush()
+    cfg = load_config()
+    conn = create_conn()
+    rows = conn.execute("SELECT site, provider, status, cached, latency_ms, prompt_tokens, cached_prompt_tokens, "
+                        "completion_tokens, error FROM ai_calls WHERE ts >= ?",
+                        (int(time.time()) - days * 86400,)).fetchall()
+    conn.close()
+    acc: Dict[str, dict] = {}
+    for site, provider, status, cached, latency, pt, cpt, ct, error in rows:
+        s = acc.setdefault(site or "?", {"site": site or "?", "calls": 0, "errors": 0, "cached": 0, "latencies": [],
+                                         "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+                                         "cost": 0.0})
+        s["calls"] += 1
+        if error:
+            s["errors"] += 1
+            continue
+        if cached:
+            s["cached"] += 1
+            continue
+        s["latencies"].append(latency or 0.0)
+        s["prompt_tokens"] += pt or 0
+        s["cached_prompt_tokens"] += cpt or 0
+        s["completion_tokens"] += ct or 0
+        s["cost"] += cost(provider, pt or 0, cpt or 0, ct or 0, cfg)
+    out = []
+    for s in acc.values():
+        lat = s.pop("latencies")
+        s["p50_ms"], s["p95_ms"] = _percentile(lat, 0.5), _percentile(lat, 0.95)
+        out.append(s)
+    return sorted(out, key=lambda s: -s["calls"])
+
+
+def daily_totals(days: int = 30) -> List[dict]:
+    """Appels, tokens et coût estimé par jour (heure locale), du plus récent au plus ancien."""
+    flush()
+    cfg = load_config()
+    conn = create_conn()
+    rows = conn.execute(
+        "SELECT date(ts, 'unixepoch', 'localtime') AS day, provider, COUNT(*), "
+        "SUM(CASE WHEN error <> '' THEN 1 ELSE 0 END), SUM(prompt_tokens), SUM(cached_prompt_tokens), "
+        "SUM(completion_tokens) FROM ai_calls WHERE ts >= ? GROUP BY day, provider ORDER BY day DESC",
+        (int(time.time()) - days * 86400,)).fetchall()
+    conn.close()
+    acc: Dict[str, dict] = {}
+    for day, provider, calls, errors, pt, cpt, ct in rows:
+        d = acc.setdefault(day, {"day": day, "calls": 0, "errors": 0, "prompt_tokens": 0,
+                                 "cached_prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+        d["calls"] += calls
+        d["errors"] += errors or 0
+        d["prompt_tokens"] += pt or 0
+        d["cached_prompt_tokens"] += cpt or 0
+        d["completion_tokens"] += ct or 0
+        d["cost"] += cost(provider, pt or 0, cpt or 0, ct or 0, cfg)
+    return list(acc.values())
+
+
+def export_csv(path: str, days: Optional[int] = None) -> int:
+    """Exporte les appels bruts (horodatage ISO local) ; renvoie le nombre de lignes écrites."""
+    flush()
+    conn = create_conn()
+    where, params = ("WHERE ts >= ?", (int(time.time()) - days * 86400,)) if days else ("", ())
+    rows = conn.execute(f"SELECT datetime(ts, 'unixepoch', 'localtime'), {', '.join(COLUMNS[1:])} "
+                        f"FROM ai_calls {where} ORDER BY ts", params).fetchall()
+    conn.close()
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        w.writerows(rows)
+    return len(rows)
@@ -0,0 +1,339 @@
+### memex_next/services/watch_folder.py
+"""
+Dossier surveillé (option `watch_folder`) : les PDF et images qui y arrivent
+(numérisations, téléchargements) sont joints automatiquement, chacun dans un
+nouveau clip, par la chaîne d'ajout de services.ingest — doublons écartés par
+sha256 contre la table files. Sous Linux, inotify (liaison ctypes minimale)
+signale les fichiers fermés après écriture ou déplacés dans le dossier ;
+ailleurs, ou si inotify est indisponible, le dossier est relu périodiquement.
+Un fichier n'est pris qu'une fois stable (taille et date inchangées pendant
+`watch_settle_seconds`, PDF terminé par %%EOF) pour ne pas lire un fichier en
+cours d'écriture. Les fichiers déjà présents au démarrage forment un arriéré
+traité à débit limité (`watch_backlog_per_min`) ; les fichiers vus sont notés
+dans watched_files et ne sont pas relus tant qu'ils ne changent pas.
+"""
+import ctypes, ctypes.util, mimetypes, os, select, stat, struct, sys, threading, time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config import load_config
+from ..db import create_conn
+
+DEFAULT_SETTLE_SECONDS = 3.0
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_BACKLOG_PER_MIN = 6
+TICK = 1.0
+OPEN_GIVE_UP_SECONDS = 60.0        # fichier créé mais jamais signalé fermé : pris quand même, s'il est stable
+INCOMPLETE_GIVE_UP_SECONDS = 600.0  # PDF sans %%EOF final inchangé depuis : pris tel quel
+TEMP_SUFFIXES = (".part", ".crdownload", ".tmp", ".download", ".partial", ".swp", "~")
+
+# ---------- inotify (Linux) ----------
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (suivi du nom, complété par des zéros)
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True) if sys.platform.startswith("linux") else None
+    INOTIFY_AVAILABLE = _libc is not None and hasattr(_libc, "inotify_init1")
+except OSError:
+    _libc = None
+    INOTIFY_AVAILABLE = False
+
+
+class Inotify:
+    """Descripteur inotify non bloquant ; `read(timeout)` renvoie [(nom, masque)] ("" pour le dossier lui-même)."""
+
+    def __init__(self):
+        self.fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self, timeout: float) -> List[Tuple[str, int]]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        out, pos = [], 0
+        while pos + _EVENT.size <= len(data):
+            _, mask, _, size = _EVENT.unpack_from(data, pos)
+            name = data[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b"\0")
+            out.append((os.fsdecode(name), mask))
+            pos += _EVENT.size + size
+        return out
+
+    def close(self):
+        try: os.close(self.fd)
+        except OSError: pass
+
+
+# ---------- fichiers candidats ----------
+def is_candidate(path: str) -> bool:
+    """PDF ou image, ni caché ni fichier temporaire de téléchargement."""
+    name = os.path.basename(path)
+    if not name or name.startswith((".", "~$")) or name.lower().endswith(TEMP_SUFFIXES):
+        return False
+    mime = mimetypes.guess_type(name)[0] or ""
+    return mime == "application/pdf" or mime.startswith("image/")
+
+
+def _signature(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime) if stat.S_ISREG(st.st_mode) else None
+
+
+def looks_complete(path: str) -> bool:
+    """Un PDF entièrement écrit se termine par %%EOF (à quelques octets près) ; autres fichiers : oui."""
+    if not path.lower().endswith(".pdf"):
+        return True
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 2048))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def unseen_files(folder: str, conn=None) -> List[str]:
+    """Fichiers candidats du dossier absents de watched_files ou modifiés depuis, plus récents d'abord."""
+    own = conn is None
+    conn = conn or create_conn()
+    try:
+        known = {p: (s, m) for p, s, m in conn.execute("SELECT path, size, mtime FROM watched_files")}
+    finally:
+        if own: conn.close()
+    found = []
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    for name in names:
+        path = os.path.join(folder, name)
+        if not is_candidate(path):
+            continue
+        sig = _signature(path)
+        if sig is not None and known.get(path) != sig:
+            found.append((sig[1], path))
+    return [p for _, p in sorted(found, reverse=True)]
+
+
+def _record(conn, path: str, sig: Tuple[int, float], item):
+    status = "duplicate" if item.duplicate else ("error" if item.error else "added")
+    conn.execute("INSERT OR REPLACE INTO watched_files(path, size, mtime, sha256, clip_id, status, seen_at) "
+                 "VALUES (?,?,?,?,?,?,?)",
+                 (path, sig[0], sig[1], item.sha256 or None, item.clip_id, status, int(time.time())))
+
+
+# ---------- surveillance ----------
+class FolderWatcher:
+    """Surveille `folder` dans un thread dédié jusqu'à `stop()`.
+    `on_result(IngestResult)` est appelé (depuis ce thread) après chaque lot joint."""
+
+    def __init__(self, folder: str, on_result: Optional[Callable] = None, settle: Optional[float] = None,
+                 poll: Optional[float] = None, backlog_per_min: Optional[float] = None, backend: Optional[str] = None):
+        cfg = load_config()
+        self.folder = os.path.abspath(os.path.expanduser(folder))
+        self.on_result = on_result
+        self.settle = float(settle if settle is not None else cfg.get("watch_settle_seconds", DEFAULT_SETTLE_SECONDS))
+        self.poll = float(poll if poll is not None else cfg.get("watch_poll_seconds", DEFAULT_POLL_SECONDS))
+        rate = float(backlog_per_min if backlog_per_min is not None
+                     else cfg.get("watch_backlog_per_min", DEFAULT_BACKLOG_PER_MIN))
+        self.backlog_interval = 60.0 / rate if rate > 0 else 0.0
+        self.backend = backend or cfg.get("watch_backend", "auto")  # "auto" ou "poll"
+        self.analyze = bool(cfg.get("watch_analyze_pdf", False))
+        self.tags = cfg.get("watch_tags", "")
+        self.mode = ""  # "inotify" ou "poll" une fois lancé
+        self.ingested = 0
+        # chemin -> [signature, instant du dernier changement, fermé après écriture, vu le]
+        self._pending: Dict[str, list] = {}
+        self._backlog: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="watch-folder", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def backlog(self) -> int:
+        return len(self._backlog)
+
+    def _touch(self, path: str, closed: bool):
+        """Fichier signalé (événement ou relecture du dossier) : à prendre quand il sera stable."""
+        if not is_candidate(path) or path in self._backlog:
+            return
+        now = time.monotonic()
+        entry = self._pending.get(path)
+        if entry is None:
+            self._pending[path] = [_signature(path), now, closed, now]
+        else:
+            entry[1] = now
+            entry[2] = entry[2] or closed
+
+    def _ready(self) -> List[Tuple[str, Tuple[int, float]]]:
+        now = time.monotonic()
+        ready = []
+        for path, entry in list(self._pending.items()):
+            sig = _signature(path)
+            if sig is None:
+                del self._pending[path]  # supprimé ou renommé avant d'être pris
+                continue
+            if sig != entry[0]:
+                entry[0], entry[1] = sig, now
+                continue
+            quiet = now - entry[1]
+            if quiet < self.settle or (not entry[2] and quiet < OPEN_GIVE_UP_SECONDS):
+                continue
+            if not looks_complete(path) and now - entry[3] < INCOMPLETE_GIVE_UP_SECONDS:
+                continue
+            del self._pending[path]
+            ready.append((path, sig))
+        return ready
+
+    def _next_backlog(self) -> Optional[Tuple[str, Tuple[int, float]]]:
+        """Prochain fichier de l'arriéré ; un fichier encore en cours d'écriture repasse par _pending."""
+        while self._backlog:
+            path = self._backlog.pop(0)
+            sig = _signature(path)
+            if sig is None:
+                continue
+            if time.time() - sig[1] < self.settle or not looks_complete(path):
+                self._touch(path, closed=True)
+                continue
+            return path, sig
+        return None
+
+    def _ingest(self, batch: List[Tuple[str, Tuple[int, float]]]):
+        from .ingest import ingest_files
+        result = ingest_files([p for p, _ in batch], tags=self.tags, analyze=self.analyze)
+        conn = create_conn()
+        try:
+            for (path, sig), item in zip(batch, result.items):
+                _record(conn, path, sig, item)
+            conn.commit()
+        finally:
+            conn.close()
+        self.ingested += len(result.added)
+        if self.on_result and (result.added or result.failed):
+            try:
+                self.on_result(result)
+            except Exception:
+                pass
+
+    def _open_inotify(self) -> Optional[Inotify]:
+        if self.backend == "poll" or not INOTIFY_AVAILABLE:
+            return None
+        try:
+            notifier = Inotify()
+        except OSError:
+            return None
+        try:
+            notifier.add_watch(self.folder)
+        except OSError:
+            notifier.close()
+            return None
+        return notifier
+
+    def _run(self):
+        notifier = self._open_inotify()
+        self.mode = "inotify" if notifier else "poll"
+        # inscrit avant la lecture de l'arriéré : rien n'est perdu entre les deux
+        self._backlog = unseen_files(self.folder)
+        next_poll = time.monotonic() + self.poll
+        next_backlog = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    next_poll, next_backlog = self._step(notifier, next_poll, next_backlog)
+                except Exception:
+                    # base verrouillée, fichier illisible… : nouvel essai au tour suivant
+                    self._stop.wait(TICK)
+        finally:
+            if notifier is not None:
+                notifier.close()
+
+    def _step(self, notifier: Optional[Inotify], next_poll: float, next_backlog: float) -> Tuple[float, float]:
+        if notifier is not None:
+            for name, mask in notifier.read(TICK):
+                if mask & IN_Q_OVERFLOW:
+                    for path in unseen_files(self.folder):
+                        self._touch(path, closed=True)
+                elif name and not mask & IN_ISDIR:
+                    self._touch(os.path.join(self.folder, name), bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)))
+        else:
+            self._stop.wait(TICK)
+            if time.monotonic() >= next_poll:
+                for path in unseen_files(self.folder):
+                    if path not in self._pending:
+                        self._touch(path, closed=True)
+                next_poll = time.monotonic() + self.poll
+        if self._stop.is_set():
+            return next_poll, next_backlog
+        ready = self._ready()
+        if ready:
+            # nouveaux fichiers : joints aussitôt, sans limite de débit
+            self._ingest(ready)
+        elif self._backlog and time.monotonic() >= next_backlog:
+            item = self._next_backlog()
+            if item is not None:
+                self._ingest([item])
+                next_backlog = time.monotonic() + self.backlog_interval
+        return next_poll, next_backlog
+
+
+_watcher: Optional[FolderWatcher] = None
+_on_result: Optional[Callable] = None
+_lock = threading.Lock()
+
+
+def start(on_result: Optional[Callable] = None) -> Optional[FolderWatcher]:
+    """Lance la surveillance du dossier `watch_folder` s'il est défini et existe."""
+    global _watcher, _on_result
+    with _lock:
+        if on_result is not None:
+            _on_result = on_result
+        if _watcher is not None:
+            return _watcher
+        folder = (load_config().get("watch_folder") or "").strip()
+        if not folder or not os.path.isdir(os.path.expanduser(folder)):
+            return None
+        _watcher = FolderWatcher(folder, on_result=_on_result)
+        _watcher.start()
+        return _watcher
+
+
+def stop(timeout: float = 5.0):
+    global _watcher
+    with _lock:
+        watcher, _watcher = _watcher, None
+    if watcher is not None:
+        watcher.stop(timeout)
+
+
+def restart() -> Optional[FolderWatcher]:
+    """Après un changement des options : arrête la surveillance en cours et relit la configuration.
+    Appelé depuis Tk : n'attend pas la fin d'un ajout en cours (les doublons sont écartés par sha256)."""
+    stop(timeout=0.5)
+    return start()
@@ -4,6 +4,7 @@ import tkinter.scrolledtext as scrolledtext
 import pyperclip
 from ..services.clipboard import get_text
 from ..services.async_worker import runner
+from ..services import indexer, circuit
 from ..config import load_config, save_config, SEPARATOR
 from ..db import create_conn
 from ..ai import ai_generate_tags, ai_generate_title
@@ -11,7 +12,7 @@ from .search import SearchWindow
 from .editor import EditClipWindow
 from .tasks import TasksWindow
 from .options import OptionsWindow
-from .widgets import Tooltip
+from .widgets import Tooltip, StreamPreviewWindow, page_progress
 
 BASE_DIR = pathlib.Path(__file__).resolve().parent.parent.parent
 DB_FILE = BASE_DIR / "souviens_toi.db"
@@ -95,6 +96,7 @@ class BufferApp(tk.Tk):
             self.after(0, self._setup_global_hotkey)
         self.bind_all('<Control-Alt-t>', lambda e: self.set_title_from_selection_or_clipboard())
         self._reminder_setup()
+        self.after(2000, self._poll_ai_circuit)
         # Mettre à jour l'interface pour refléter l'état de pause initial
         self.after(100, self._update_pause_ui)
 
@@ -138,6 +140,10 @@ class BufferApp(tk.Tk):
 
         self.state_lbl = ttk.Label(top, text=_tr('state_active'), foreground="green")
         self.state_lbl.pack(side='left', padx=10)
+        # État du disjoncteur IA (vide tant que le service répond ; clic = réessayer maintenant)
+        self.ai_state_lbl = ttk.Label(top, text="", foreground="#b91c1c", cursor="hand2")
+        self.ai_state_lbl.pack(side='left')
+        self.ai_state_lbl.bind('<Button-1>', lambda e: self._reset_ai_circuit())
         self.tick_lbl = ttk.Label(top, text="*", foreground="green", font=("Segoe", 14))
 
         # Tooltips
@@ -285,6 +291,7 @@ class BufferApp(tk.Tk):
                          (source, clip_id, int(dt.datetime.now(dt.timezone.utc).timestamp())))
         conn.commit()
         conn.close()
+        indexer.clip_saved(clip_id)
 
         self.text_area.delete("1.0", "end")
         self.title_var.set("")
@@ -480,14 +487,23 @@ class BufferApp(tk.Tk):
             # Nouvelle capture intelligente avec IA
             self.show_toast("🌐 Capture et analyse IA en cours... Veuillez patienter")
             self.after(0, lambda: self._set_ui_busy(True))
+            # Aperçu du résumé au fil de l'eau, avec possibilité d'arrêter
+            preview = StreamPreviewWindow(self, "🌐 Résumé IA en cours…")
             
             def work_smart(u=url):
                 from ..web_capture import capture_web_link_complete
                 cfg = load_config()
                 lang = cfg.get('ai_lang', 'fr')
-                return capture_web_link_complete(u, lang)
+                return capture_web_link_complete(u, lang, on_delta=preview.push, cancel=preview.cancel,
+                                                 progress=preview.progress)
             
             def done_smart(web_result, err):
+                cancelled = preview.cancel.is_set()
+                preview.close()
+                if cancelled:
+                    self.show_toast("Capture web annulée")
+                    self._set_ui_busy(False)
+                    return
                 if err:
                     self.show_toast(f"❌ Erreur de capture web: {str(err)}")
                     # Fallback vers capture classique
@@ -527,6 +543,7 @@ class BufferApp(tk.Tk):
                     
                     conn.commit()
                     conn.close()
+                    indexer.clip_saved(clip_id)
                     
                     self.show_toast("✅ Page web capturée et analysée avec IA!")
                     
@@ -584,6 +601,7 @@ class BufferApp(tk.Tk):
                          (clip_id, fn, mime, len(data), sha, data))
             conn.commit()
             conn.close()
+            indexer.clip_saved(clip_id)
             return clip_id
         
         def done(clip_id, err):
@@ -607,7 +625,8 @@ class BufferApp(tk.Tk):
             
             # Générer tags et catégories en parallèle
             tags = ai_generate_tags(content, lang=lang, count=5)
-            categories = ai_generate_categories(content, lang=lang, count=3)
+            user_cats = cfg.get('user_categories', [])
+            categories = ai_generate_categories(content, user_cats=user_cats, lang=lang, max_n=2) if user_cats else []
             
             # Mettre à jour la base de données
             conn = create_conn()
@@ -640,138 +659,58 @@ class BufferApp(tk.Tk):
     # ---------- files ----------
     def attach_file(self):
         from tkinter import filedialog
-        paths = filedialog.askopenfilenames(
-            filetypes=[["PDF","*.pdf"],["Images","*.png;*.jpg;*.jpeg;*.gif;*.bmp;*.webp"],
-                       ["Documents","*.txt;*.md;*.docx"],["Tous","*.*"]]
-        )
+        from ..services.ingest import FILE_TYPES, ingest_files
+        paths = filedialog.askopenfilenames(filetypes=FILE_TYPES)
         if not paths: return
-        
-        cfg = load_config()
-        auto_analyze_pdf = cfg.get('auto_analyze_pdf', True)
-        
-        import hashlib, mimetypes
-        added = 0
-        first_clip_id = None
-        
+
+        analyze = bool(load_config().get('auto_analyze_pdf', True))
+        tags = self.tags_var.get().strip()
+        # Une fenêtre d'aperçu du résumé IA par PDF (créées ici, dans le thread Tk)
+        live, progress = {}, {}
         for p in paths:
-            try:
-                data = pathlib.Path(p).read_bytes()
-                sha = hashlib.sha256(data).hexdigest()
-                mime = mimetypes.guess_type(p)[0] or 'application/octet-stream'
-                title = pathlib.Path(p).name
-                is_pdf = p.lower().endswith('.pdf')
-                
-                # Analyse PDF intelligente si activée
-                if is_pdf and auto_analyze_pdf:
-                    # Afficher un message d'attente plus détaillé
-                    self.show_toast("📄 Numérisation PDF IA en cours... Veuillez patienter")
-                    # Désactiver temporairement les boutons pour éviter les clics multiples
-                    self.after(0, lambda: self._set_ui_busy(True))
-                    
-                    def work_pdf(pdf_path=p):
-                        from ..pdf_analyzer import analyze_pdf_complete
-                        cfg = load_config()
-                        lang = cfg.get('ai_lang', 'fr')
-                        return analyze_pdf_complete(pdf_path, lang, context="new")
-                    
-                    def done_pdf(pdf_result, err):
-                        if err:
-                            self.show_toast(f"❌ Erreur d'analyse PDF: {str(err)}")
-                            # Fallback vers import classique
-                            self._attach_file_classic(p, data, sha, mime, title)
-                            return
-                        
-                        if pdf_result and pdf_result.get('success'):
-                            # Créer le clip avec le résumé IA
-                            formatted_content = pdf_result['formatted_content']
-                            pdf_title = pdf_result.get('title', title)
-                            
-                            conn = create_conn()
-                            conn.execute(
-                                "INSERT INTO clips(ts, source, title, type, raw_text, summary, tags) "
-                                "VALUES (?,?,?,?,?,?,?)",
-                                (int(dt.datetime.now(dt.timezone.utc).timestamp()), "", pdf_title, "note", 
-                                 formatted_content, formatted_content[:150] + '...', 
-                                 self.tags_var.get().strip() or "pdf")
-                            )
-                            clip_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-                            if first_clip_id is None: 
-                                first_clip_id = clip_id
-                            
-                            # Joindre le fichier PDF
-                            conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) VALUES (?,?,?,?,?,?)",
-                                         (clip_id, title, mime, len(data), sha, data))
-                            conn.commit()
-                            conn.close()
-                            
-                            self.show_toast("✅ PDF analysé et importé avec résumé IA!")
-                            
-                            # Rafraîchir la fenêtre de recherche si elle existe
-                            if hasattr(self, '_search_win') and self._search_win:
-                                try:
-                                    self._search_win.refresh_results()
-                                except:
-                                    pass
-                        
-                        else:
-                            # Fallback vers import classique
-                            self._attach_file_classic(p, data, sha, mime, title)
-                        
-                        # Réactiver l'interface
-                        self.after(0, lambda: self._set_ui_busy(False))
-                    
-                    from ..services.async_worker import runner
-                    runner.submit(work_pdf, cb=lambda r,e: self.after(0, done_pdf, r, e))
-                else:
-                    # Import classique pour non-PDF ou si analyse désactivée
-                    self._attach_file_classic(p, data, sha, mime, title)
-                
-                added += 1
-            except Exception as e:
+            name = pathlib.Path(p).name
+            progress[p] = page_progress(self, self.show_toast, f"Extraction {name}")
+            if analyze and p.lower().endswith('.pdf'):
+                preview = StreamPreviewWindow(self, f"📄 Résumé IA : {name}")
+                live[p] = {'on_delta': preview.push, 'cancel': preview.cancel,
+                           'progress': preview.progress, 'window': preview}
+        if live:
+            self.show_toast("📄 Numérisation PDF IA en cours... Veuillez patienter")
+            self._set_ui_busy(True)
+
+        def item_done(item):
+            hooks = live.get(item.path)
+            if hooks:
+                hooks['window'].close()
+            if item.enrich_error:
+                self.show_toast(f"❌ Erreur d'analyse PDF: {item.enrich_error}")
+
+        def work():
+            return ingest_files(paths, tags=tags, analyze=analyze, live=live, progress=progress,
+                                on_item=lambda item: self.after(0, item_done, item))
+
+        def done(result, err):
+            if live:
+                self._set_ui_busy(False)
+            if err:
                 from tkinter import messagebox
-                messagebox.showerror("Import", f"Echec import {pathlib.Path(p).name}: {e}")
-        if added:
-            self.show_toast(f"{added} fichier(s) ajouté(s)")
-            if first_clip_id:
-                self.after(100, lambda: EditClipWindow(self, first_clip_id))
-
-    def _attach_file_classic(self, file_path, data, sha, mime, title):
-        """Import classique de fichier sans analyse IA"""
-        conn = create_conn()
-        conn.execute(
-            "INSERT INTO clips(ts, source, title, type, raw_text, summary, tags) "
-            "VALUES (?,?,?,?,?,?,?)",
-            (int(dt.datetime.now(dt.timezone.utc).timestamp()), "", title, "note", "", "", 
-             self.tags_var.get().strip() or "file")
-        )
-        clip_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-        if not hasattr(self, '_first_clip_id') or self._first_clip_id is None:
-            self._first_clip_id = clip_id
-        conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) VALUES (?,?,?,?,?,?)",
-                     (clip_id, title, mime, len(data), sha, data))
-        conn.commit()
-        conn.close()
+                messagebox.showerror("Import", str(err))
+                return
+            self.show_toast(f"{result.summary()} ({result.timings_summary()})")
+            if result.failed:
+                from tkinter import messagebox
+                first = result.failed[0]
+                messagebox.showerror("Import", f"Echec import {first.filename}: {first.error}")
+            if hasattr(self, '_search_win') and self._search_win:
+                try:
+                    self._search_win.refresh_results()
+                except Exception:
+                    pass
+            # premier clip créé, sinon clip qui contient déjà le fichier
+            opened = [i.clip_id for i in result.added if i.created] + [i.clip_id for i in result.duplicates if i.clip_id]
+            if opened:
+                self.after(100, lambda: EditClipWindow(self, opened[0]))
 
-        # Extraction OCR/texte async (comportement original)
-        def work(clip_id=clip_id, mime=mime, blob=data):
-            from ..ocr import extract_text_from_blob
-            text = extract_text_from_blob(blob, mime)
-            if text:
-                conn = create_conn()
-                row = conn.execute("SELECT raw_text FROM clips WHERE id=?", (clip_id,)).fetchone()
-                current = (row[0] or '') if row else ''
-                sep = ("\n" + SEPARATOR + "\n") if current else ''
-                conn.execute("UPDATE clips SET raw_text=?, summary=? WHERE id=?",
-                             (current + sep + text, (current + sep + text)[:150] + '...', clip_id))
-                conn.commit()
-                conn.close()
-                return True
-            return False
-        
-        def done(res, err):
-            self.show_toast("Fichier importé et indexé" if res else "Fichier importé")
-        
-        from ..services.async_worker import runner
         runner.submit(work, cb=lambda r,e: self.after(0, done, r, e))
 
     def _set_ui_busy(self, busy: bool):
@@ -779,6 +718,8 @@ class BufferApp(tk.Tk):
         try:
             # Trouver les boutons principaux et les désactiver/activer
             for widget in self.winfo_children():
+                if isinstance(widget, StreamPreviewWindow):
+                    continue  # garder le bouton Arrêter actif
                 if hasattr(widget, 'winfo_children'):
                     for child in widget.winfo_children():
                         if hasattr(child, 'config') and 'state' in child.keys():
@@ -1002,6 +943,27 @@ class BufferApp(tk.Tk):
         except Exception: pass
         self.after(self._reminder_interval_ms, self._check_task_reminders)
 
+    # ---------- disjoncteur IA ----------
+    def _poll_ai_circuit(self):
+        try:
+            down = [i for i in circuit.states().values() if i["state"] != circuit.CLOSED]
+            if not down:
+                text = ""
+            elif any(i["state"] == circuit.HALF_OPEN for i in down):
+                text = "IA : test…"
+            else:
+                text = f"IA indisponible ({int(max(i['retry_in'] for i in down))} s)"
+            if self.ai_state_lbl.cget('text') != text:
+                self.ai_state_lbl.config(text=text)
+        except Exception: pass
+        self.after(2000, self._poll_ai_circuit)
+
+    def _reset_ai_circuit(self):
+        if self.ai_state_lbl.cget('text'):
+            circuit.reset_all()
+            self.ai_state_lbl.config(text="")
+            self.show_toast("Connexion IA réessayée au prochain appel")
+
     # ---------- fenàƒÂªtres ----------
     def open_search(self):
         if self._search_win and self._search_win.winfo_exists():
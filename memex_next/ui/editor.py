@@ -1,12 +1,13 @@
 ### memex_next/ui/editor.py
 import tkinter as tk, tkinter.ttk as ttk, tkinter.scrolledtext as st, tkinter.filedialog as fd, tkinter.simpledialog as sd, tkinter.messagebox as mb
-import pathlib, datetime as dt, sqlite3, hashlib, mimetypes, os, tempfile, webbrowser
+import pathlib, datetime as dt, sqlite3, os, tempfile, webbrowser
 from typing import Optional, Dict, Any
 from ..db import create_conn
-from ..config import load_config, save_config
-from ..ai import ai_generate_tags, ai_generate_categories, ai_generate_title
+from ..config import load_config, save_config, SEPARATOR
+from ..ai import ai_generate_tags, ai_generate_categories, ai_generate_title, ai_enrich
 from ..services.export import clip_to_markdown
-from .widgets import Tooltip
+from ..services import indexer, page_index, pdf_viewer
+from .widgets import Tooltip, TextStreamer, page_progress
 
 try:
     import markdown as _markdown
@@ -151,6 +152,18 @@ class EditClipWindow(tk.Toplevel):
         ttk.Button(af, text="Exporter", command=self._export_attachment_selected).pack(side='left', expand=True, fill='x', padx=2)
         ttk.Button(af, text="Supprimer", command=self._delete_attachment_selected).pack(side='left', expand=True, fill='x')
         ttk.Button(self._tab_attach, text="Joindre fichier", command=self._attach_files_to_current_clip).pack(fill='x', padx=0, pady=(0,6))
+        # Recherche dans les pages des PDF joints : double-clic = ouvrir à la page
+        pf = ttk.Frame(self._tab_attach)
+        pf.pack(fill='x', pady=(0,2))
+        self._page_query = tk.StringVar()
+        page_entry = ttk.Entry(pf, textvariable=self._page_query)
+        page_entry.pack(side='left', fill='x', expand=True)
+        page_entry.bind('<Return>', lambda e: (self._search_pages(), 'break'))
+        ttk.Button(pf, text="Chercher dans les PDF", command=self._search_pages).pack(side='left', padx=(2,0))
+        self._page_hits = []
+        self._page_hits_list = tk.Listbox(self._tab_attach, height=8)
+        self._page_hits_list.pack(fill='both', expand=True, pady=(0,4))
+        self._page_hits_list.bind('<Double-Button-1>', lambda e: self._open_page_hit())
 
         # Boutons bas
         btn_frame = ttk.Frame(top)
@@ -158,7 +171,9 @@ class EditClipWindow(tk.Toplevel):
         ttk.Button(btn_frame, text="Supprimer", command=self._delete).pack(side='left')
         ttk.Button(btn_frame, text="Prévisualiser MD", command=self._preview_md).pack(side='left', padx=(8,2))
         ttk.Button(btn_frame, text="Aperçu intégré", command=self._preview_md_embedded).pack(side='left')
-        ttk.Button(btn_frame, text="Résumé IA", command=self._ai_smart_summary).pack(side='left', padx=(8,0))
+        self._summary_btn = ttk.Button(btn_frame, text="Résumé IA", command=self._ai_smart_summary)
+        self._summary_btn.pack(side='left', padx=(8,0))
+        self._stream_cancels = set()  # générations IA en flux à interrompre à la fermeture
         ttk.Button(btn_frame, text="Enregistrer", command=self._save).pack(side='right')
         ttk.Button(btn_frame, text="Fermer", command=self._close).pack(side='right', padx=6)
 
@@ -214,6 +229,7 @@ class EditClipWindow(tk.Toplevel):
         )
         conn.commit()
         conn.close()
+        indexer.clip_saved(self.clip_id)
         if hasattr(self.parent, 'refresh'): self.parent.refresh()
         self._toast("Clip enregistré")
 
@@ -228,6 +244,8 @@ class EditClipWindow(tk.Toplevel):
         self._close()
 
     def _close(self):
+        for cancel in list(self._stream_cancels):
+            cancel.set()
         try: self.grab_release()
         except Exception: pass
         OPEN_EDITORS.pop(self.clip_id, None)
@@ -400,10 +418,7 @@ class EditClipWindow(tk.Toplevel):
         user_cats = cfg.get('user_categories', [])
         count = int(cfg.get('ai_tag_count', 5))
         def work():
-            title = ai_generate_title(text, lang=lang, max_len=max_len)
-            tags  = ai_generate_tags(text, lang=lang, count=count)
-            cats  = ai_generate_categories(text, user_cats=user_cats, lang=lang, max_n=2) if user_cats else []
-            return {"title": title, "tags": tags, "categories": cats}
+            return ai_enrich(text, user_cats=user_cats, lang=lang, count=count, max_len=max_len, max_cats=2)
         def done(res, err):
             if err: mb.showerror("IA", str(err)); return
             if not res: return
@@ -440,126 +455,123 @@ class EditClipWindow(tk.Toplevel):
         cfg = load_config()
         lang = cfg.get('ai_lang', 'fr')
         
+        # Le résumé s'affiche au fil de l'eau à la place du texte ; Arrêter restaure l'original
+        import threading
+        cancel = threading.Event()
+        self._stream_cancels.add(cancel)
+        self.editor.delete('1.0', 'end')
+        streamer = TextStreamer(self.editor, '1.0')
+        
+        def finish():
+            self._stream_cancels.discard(cancel)
+            self._summary_btn.configure(text="Résumé IA", command=self._ai_smart_summary)
+        
+        def stop():
+            cancel.set()
+            streamer.stop(replace_with=text)
+            finish()
+            self._toast("Résumé IA annulé")
+        
+        self._summary_btn.configure(text="Arrêter IA", command=stop)
+        
         def work():
-            from ..ai import ai_smart_summary
-            return ai_smart_summary(text, lang=lang)
+            from ..ai import ai_smart_summary, last_call_info
+            res = ai_smart_summary(text, lang=lang, on_delta=streamer.push, cancel=cancel)
+            return res, last_call_info().get('timings', {}).get('ttft_ms')
         
         def done(res, err):
+            if cancel.is_set():
+                return  # déjà restauré par stop() ou fenêtre fermée
+            finish()
             if err: 
+                streamer.stop(replace_with=text)
                 mb.showerror("IA", str(err))
                 return
-            if res:
-                # Remplacer le contenu par le résumé
-                self.editor.delete('1.0', 'end')
-                self.editor.insert('1.0', res)
-                self._toast("Résumé IA appliqué")
+            summary, ttft = res
+            # Remplacer le flux brut par le résumé final (sections %...% restaurées)
+            streamer.stop(replace_with=summary or text)
+            if summary:
+                self._toast("Résumé IA appliqué" + (f" (1er token {ttft/1000:.1f}s)" if ttft else ""))
         
         from ..services.async_worker import runner
         runner.submit(work, cb=lambda r,e: self.after(0, done, r, e))
 
     # ---------- Pièces jointes ----------
     def _attach_files_to_current_clip(self):
-        paths = fd.askopenfilenames(
-            filetypes=[["PDF","*.pdf"],["Images","*.png;*.jpg;*.jpeg;*.gif;*.bmp;*.webp"],
-                       ["Documents","*.txt;*.md;*.docx"],["Tous","*.*"]]
-        )
+        from ..services.ingest import FILE_TYPES, append_to_clip, ingest_files
+        paths = fd.askopenfilenames(filetypes=FILE_TYPES)
         if not paths: return
-        
-        cfg = load_config()
-        auto_analyze_pdf = cfg.get('auto_analyze_pdf', True)
-        
-        added = 0
+
+        import threading
+        analyze = bool(load_config().get('auto_analyze_pdf', True))
+        # Le résumé de chaque PDF s'affiche en flux à la fin du texte, puis est remplacé par sa version formatée
+        live, progress = {}, {}
+        had_content = bool(self.editor.get('1.0', 'end').strip())
         for p in paths:
-            try:
-                data = pathlib.Path(p).read_bytes()
-                sha = hashlib.sha256(data).hexdigest()
-                mime = mimetypes.guess_type(p)[0] or 'application/octet-stream'
-                title = pathlib.Path(p).name
-                is_pdf = p.lower().endswith('.pdf')
-                
-                # Joindre le fichier d'abord
-                conn = create_conn()
-                conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) VALUES (?,?,?,?,?,?)",
-                             (self.clip_id, title, mime, len(data), sha, data))
-                conn.commit()
-                conn.close()
-                
-                # Analyse PDF intelligente si activée
-                if is_pdf and auto_analyze_pdf:
-                    self._toast("📄 Analyse du PDF en cours...")
-                    
-                    def work_pdf(pdf_path=p):
-                        from ..pdf_analyzer import analyze_pdf_complete
-                        cfg = load_config()
-                        lang = cfg.get('ai_lang', 'fr')
-                        return analyze_pdf_complete(pdf_path, lang, context="existing")
-                    
-                    def done_pdf(pdf_result, err):
-                        if err:
-                            self._toast(f"❌ Erreur d'analyse PDF: {str(err)}")
-                            # Fallback vers extraction classique
-                            self._attach_file_classic_editor(mime, data)
-                            return
-                        
-                        if pdf_result and pdf_result.get('success'):
-                            # Insérer le résumé dans l'éditeur
-                            formatted_content = pdf_result['formatted_content']
-                            current_content = self.editor.get('1.0', 'end').strip()
-                            
-                            if current_content:
-                                self.editor.insert('end', formatted_content)
-                            else:
-                                self.editor.insert('1.0', formatted_content.lstrip())
-                            
-                            # Mettre à jour la base avec le nouveau contenu
-                            new_content = self.editor.get('1.0', 'end').strip()
-                            conn = create_conn()
-                            conn.execute("UPDATE clips SET raw_text=?, summary=? WHERE id=?",
-                                         (new_content, new_content[:150] + '...', self.clip_id))
-                            conn.commit()
-                            conn.close()
-                            
-                            self._toast("✅ PDF joint avec résumé IA ajouté!")
-                        else:
-                            # Fallback vers extraction classique
-                            self._attach_file_classic_editor(mime, data)
-                        
-                        self._load_attachments_list()
-                        self._reload_thumbnails()
-                    
-                    from ..services.async_worker import runner
-                    runner.submit(work_pdf, cb=lambda r,e: self.after(0, done_pdf, r, e))
+            name = pathlib.Path(p).name
+            progress[p] = page_progress(self, self._toast, f"Extraction {name}")
+            if analyze and p.lower().endswith('.pdf'):
+                streamer = TextStreamer(self.editor, 'end-1c')
+                streamer.push(f"\n\n---\n\n## 📄 Ajout : {name}\n\n")
+                cancel = threading.Event()
+                self._stream_cancels.add(cancel)
+                live[p] = {'on_delta': streamer.push, 'cancel': cancel, 'streamer': streamer}
+        if live:
+            self._toast("📄 Analyse du PDF en cours...")
+
+        def item_done(item):
+            hooks = live.get(item.path)
+            if hooks:
+                self._stream_cancels.discard(hooks['cancel'])
+                hooks['streamer'].stop(replace_with="")
+            if item.enrich_error:
+                self._toast(f"❌ Erreur d'analyse PDF: {item.enrich_error}")
+            if item.addition and not item.duplicate:
+                if item.enriched:
+                    if had_content:
+                        self.editor.insert('end', item.addition)
+                    else:
+                        self.editor.insert('1.0', item.addition.lstrip())
                 else:
-                    # Extraction classique pour non-PDF ou si analyse désactivée
-                    self._attach_file_classic_editor(mime, data)
-                
-                added += 1
-            except Exception as e:
-                mb.showerror("Import", f"Echec import {pathlib.Path(p).name}: {e}")
-        if added: self._toast(f"{added} fichier(s) joint(s)")
-
-    def _attach_file_classic_editor(self, mime, data):
-        """Extraction classique de texte pour fallback"""
-        def work(mime=mime, blob=data):
-            from ..ocr import extract_text_from_blob
-            text = extract_text_from_blob(blob, mime)
-            if text:
+                    current = self.editor.get('1.0', 'end-1c')
+                    self.editor.insert('end', ("\n" + SEPARATOR + "\n" if current.strip() else "") + item.addition)
+                # Mettre à jour la base avec le nouveau contenu
+                new_content = self.editor.get('1.0', 'end').strip()
                 conn = create_conn()
-                row = conn.execute("SELECT raw_text FROM clips WHERE id=?", (self.clip_id,)).fetchone()
-                current = (row[0] or '') if row else ''
-                sep = ("\n" + SEPARATOR + "\n") if current else ''
                 conn.execute("UPDATE clips SET raw_text=?, summary=? WHERE id=?",
-                             (current + sep + text, (current + sep + text)[:150] + '...', self.clip_id))
+                             (new_content, new_content[:150] + '...', self.clip_id))
                 conn.commit()
                 conn.close()
-                return True
-            return False
-        
-        def done(res, err):
-            self._toast("Fichier joint" + (" et indexé" if res else ''))
+                indexer.clip_saved(self.clip_id)
             self._load_attachments_list()
             self._reload_thumbnails()
-        
+
+        def on_item(item):
+            hooks = live.get(item.path)
+            if not (hooks and hooks['cancel'].is_set()):
+                try:
+                    self.after(0, item_done, item)
+                    return
+                except (tk.TclError, RuntimeError):
+                    pass
+            # éditeur fermé entre-temps : le texte extrait va directement au clip
+            if item.addition and not item.duplicate:
+                append_to_clip(item)  # réindexé avec
+
+        def work():
+            # un seul fichier à la fois quand des résumés s'affichent en flux dans l'éditeur
+            return ingest_files(paths, clip_id=self.clip_id, analyze=analyze, context="existing", write_clip=False,
+                                live=live, progress=progress, on_item=on_item, concurrency=1 if live else None)
+
+        def done(result, err):
+            if err:
+                mb.showerror("Import", str(err))
+                return
+            self._toast(f"{result.summary()} ({result.timings_summary()})")
+            if result.failed:
+                first = result.failed[0]
+                mb.showerror("Import", f"Echec import {first.filename}: {first.error}")
+
         from ..services.async_worker import runner
         runner.submit(work, cb=lambda r,e: self.after(0, done, r, e))
 
@@ -625,7 +637,7 @@ class EditClipWindow(tk.Toplevel):
         if fid is None: return
         self._delete_attachment_by_id(fid)
 
-    def _open_attachment_by_id(self, fid):
+    def _open_attachment_by_id(self, fid, page=None, label=None):
         conn = create_conn()
         row = conn.execute("SELECT filename, data, mime FROM files WHERE id=?", (fid,)).fetchone()
         conn.close()
@@ -635,8 +647,33 @@ class EditClipWindow(tk.Toplevel):
         with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
             tmp.write(data)
             tmp.flush()
-            try: os.startfile(tmp.name)
-            except Exception: mb.showinfo("Ouvrir", f"Fichier enregistré: {tmp.name}")
+        if page and mime == 'application/pdf':
+            # os.startfile ne transmet pas de page : lecteur connu lancé avec son argument de page
+            if pdf_viewer.open_at_page(tmp.name, page):
+                return
+        try: os.startfile(tmp.name)
+        except Exception:
+            mb.showinfo("Ouvrir", f"Fichier enregistré: {tmp.name}")
+            return
+        if page and mime == 'application/pdf':
+            shown = f"{label} (page {page} du fichier)" if label and str(label) != str(page) else str(page)
+            mb.showinfo("Ouvrir", f"Aucun lecteur PDF capable d'ouvrir à une page donnée n'a été trouvé "
+                                  f"(option pdf_viewer) : aller à la page {shown}.")
+
+    def _search_pages(self):
+        query = self._page_query.get().strip()
+        self._page_hits = page_index.search_pages(query, clip_id=self.clip_id) if query else []
+        self._page_hits_list.delete(0, 'end')
+        for h in self._page_hits:
+            self._page_hits_list.insert('end', f"{page_index.hit_label(h)} · {h['filename']} : {h['snippet']}")
+        if query and not self._page_hits:
+            self._page_hits_list.insert('end', "Aucune page trouvée (PDF encore en cours d'indexation ?)")
+
+    def _open_page_hit(self):
+        sel = self._page_hits_list.curselection()
+        if not sel or sel[0] >= len(self._page_hits): return
+        hit = self._page_hits[sel[0]]
+        self._open_attachment_by_id(hit['file_id'], page=hit['page_no'], label=hit['label'])
 
     def _export_attachment_by_id(self, fid):
         conn = create_conn()
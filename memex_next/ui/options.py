@@ -63,6 +63,15 @@ class OptionsWindow(tk.Toplevel):
         endpoint = tk.StringVar(value=cfg.get('deepseek_endpoint', 'https://api.deepseek.com/v1/chat/completions'))
         ai_lang = tk.StringVar(value=cfg.get('ai_lang', 'fr'))
         ai_tag_count = tk.IntVar(value=int(cfg.get('ai_tag_count', 5)))
+        http_pool_size = tk.IntVar(value=int(cfg.get('http_pool_size', 4)))
+        ai_bulk_concurrency = tk.IntVar(value=int(cfg.get('ai_bulk_concurrency', 4)))
+        ai_rpm = tk.IntVar(value=int(cfg.get('ai_rpm', 60)))
+        tagger_mode = tk.StringVar(value=cfg.get('tagger_mode', 'remote'))
+        ai_tpm = tk.IntVar(value=int(cfg.get('ai_tpm', 0)))
+        ai_connect_timeout = tk.IntVar(value=int(cfg.get('ai_connect_timeout', 5)))
+        ai_read_timeout = tk.IntVar(value=int(cfg.get('ai_read_timeout', 60)))
+        ai_circuit_threshold = tk.IntVar(value=int(cfg.get('ai_circuit_threshold', 5)))
+        ai_circuit_cooldown = tk.IntVar(value=int(cfg.get('ai_circuit_cooldown', 30)))
 
         def row(parent, label):
             f = ttk.Frame(parent)
@@ -79,12 +88,165 @@ class OptionsWindow(tk.Toplevel):
         ttk.Entry(r4, textvariable=ai_lang).pack(side='left', fill='x', expand=True)
         r5 = row(ai, "Nb tags visés")
         ttk.Spinbox(r5, from_=1, to=12, textvariable=ai_tag_count, width=6).pack(side='left')
+        r5b = row(ai, "Tags")
+        ttk.Combobox(r5b, textvariable=tagger_mode, values=["local", "remote", "local-then-remote"],
+                     state='readonly', width=18).pack(side='left')
+        ttk.Label(r5b, text="local = hors ligne, instantané", font=("TkDefaultFont", 8)).pack(side='left', padx=8)
+        r6 = row(ai, "Connexions HTTP")
+        ttk.Spinbox(r6, from_=1, to=32, textvariable=http_pool_size, width=6).pack(side='left')
+        r7 = row(ai, "Traitement en masse")
+        ttk.Spinbox(r7, from_=1, to=32, textvariable=ai_bulk_concurrency, width=4).pack(side='left')
+        ttk.Label(r7, text="parallèles").pack(side='left', padx=(2,8))
+        ttk.Spinbox(r7, from_=0, to=10000, textvariable=ai_rpm, width=6).pack(side='left')
+        ttk.Label(r7, text="req/min").pack(side='left', padx=(2,8))
+        ttk.Spinbox(r7, from_=0, to=10000000, increment=1000, textvariable=ai_tpm, width=9).pack(side='left')
+        ttk.Label(r7, text="tokens/min (0 = illimité)").pack(side='left', padx=(2,0))
+        r8 = row(ai, "Timeouts (s)")
+        ttk.Spinbox(r8, from_=1, to=120, textvariable=ai_connect_timeout, width=4).pack(side='left')
+        ttk.Label(r8, text="connexion").pack(side='left', padx=(2,8))
+        ttk.Spinbox(r8, from_=5, to=900, textvariable=ai_read_timeout, width=5).pack(side='left')
+        ttk.Label(r8, text="lecture").pack(side='left', padx=(2,0))
+        r9 = row(ai, "Coupure après")
+        ttk.Spinbox(r9, from_=1, to=50, textvariable=ai_circuit_threshold, width=4).pack(side='left')
+        ttk.Label(r9, text="échecs, pause").pack(side='left', padx=(2,8))
+        ttk.Spinbox(r9, from_=5, to=600, increment=5, textvariable=ai_circuit_cooldown, width=5).pack(side='left')
+        ttk.Label(r9, text="s avant nouvel essai").pack(side='left', padx=(2,0))
+        ai_stream_var = tk.BooleanVar(value=bool(cfg.get('ai_streaming', True)))
+        ttk.Checkbutton(ai, text="Afficher les résumés IA au fil de l'eau (streaming)", variable=ai_stream_var).pack(anchor='w', padx=12, pady=2)
+
+        # Routage des tâches vers les fournisseurs (ai_providers dans souviens_config.json)
+        from ..services.providers import TASKS, provider_names
+        ttk.Label(ai, text="Fournisseur par tâche", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
+        routes_cfg = cfg.get('ai_routes') or {}
+        route_vars = {}
+        routes_row = ttk.Frame(ai)
+        routes_row.pack(fill='x', padx=12, pady=(0,4))
+        task_labels = {"tags": "Tags", "title": "Titre", "categories": "Catégories", "enrich": "Enrichissement",
+                       "summary": "Résumés", "chunk": "Sections (long)", "qa": "Questions"}
+        for i, task in enumerate(TASKS):
+            route_vars[task] = tk.StringVar(value=routes_cfg.get(task, 'deepseek'))
+            ttk.Label(routes_row, text=task_labels.get(task, task)).grid(row=i // 3, column=(i % 3) * 2, sticky='w', padx=(0,4), pady=2)
+            ttk.Combobox(routes_row, textvariable=route_vars[task], values=provider_names(cfg),
+                         state='readonly', width=12).grid(row=i // 3, column=(i % 3) * 2 + 1, sticky='w', padx=(0,12), pady=2)
         
+        # Cache des réponses IA
+        ttk.Label(ai, text="Cache des réponses IA", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
+        ai_cache_var = tk.BooleanVar(value=bool(cfg.get('ai_cache_enabled', True)))
+        ttk.Checkbutton(ai, text="Réutiliser les réponses pour un texte inchangé", variable=ai_cache_var).pack(anchor='w', padx=12, pady=2)
+        cache_row = ttk.Frame(ai)
+        cache_row.pack(fill='x', padx=12, pady=(0,4))
+        cache_lbl = ttk.Label(cache_row, text="", font=("TkDefaultFont", 8))
+        cache_lbl.pack(side='left')
+        def refresh_cache_stats():
+            from ..services import ai_cache
+            st = ai_cache.stats()
+            cache_lbl.config(text=f"{st['entries']} entrées · {st['hits']} hits / {st['misses']} misses")
+        def clear_ai_cache():
+            from ..services import ai_cache
+            n = ai_cache.clear()
+            refresh_cache_stats()
+            mb.showinfo("Cache IA", f"{n} réponses supprimées du cache.")
+        ttk.Button(cache_row, text="Vider", command=clear_ai_cache).pack(side='right')
+        refresh_cache_stats()
+
+        # Classifieur local de catégories
+        ttk.Label(ai, text="Classifieur local de catégories", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
+        clf_var = tk.BooleanVar(value=bool(cfg.get('classifier_enabled', True)))
+        ttk.Checkbutton(ai, text="Catégoriser localement, l'API seulement en cas de doute", variable=clf_var).pack(anchor='w', padx=12, pady=2)
+        clf_row = ttk.Frame(ai)
+        clf_row.pack(fill='x', padx=12, pady=(0,4))
+        ttk.Label(clf_row, text="Seuil de confiance").pack(side='left')
+        clf_threshold = tk.DoubleVar(value=float(cfg.get('classifier_threshold', 0.8)))
+        ttk.Spinbox(clf_row, from_=0.5, to=0.99, increment=0.05, textvariable=clf_threshold, width=5).pack(side='left', padx=(4,8))
+        clf_lbl = ttk.Label(ai, text="", font=("TkDefaultFont", 8))
+        def clf_run(action):
+            from ..services import classifier
+            from ..services.async_worker import runner
+            if not classifier.is_available():
+                clf_lbl.config(text="NumPy non installé : classifieur indisponible")
+                return
+            clf_lbl.config(text="Calcul en cours…")
+            def work():
+                if action == "train":
+                    model = classifier.train()
+                    return f"Modèle réentraîné : {len(model.categories)} catégories"
+                r = classifier.evaluate(threshold=float(clf_threshold.get()))
+                return (f"{r['test']} clips testés (entraînement sur {r['train']}) : précision {r['accuracy']:.0%}, "
+                        f"sûr dans {r['coverage']:.0%} des cas avec {r['confident_accuracy']:.0%} de précision")
+            def done(res, err):
+                try: clf_lbl.config(text=str(err) if err else res)
+                except tk.TclError: pass
+            runner.submit(work, cb=lambda r, e: self.after(0, done, r, e))
+        ttk.Button(clf_row, text="Évaluer", command=lambda: clf_run("eval")).pack(side='right')
+        ttk.Button(clf_row, text="Réentraîner", command=lambda: clf_run("train")).pack(side='right', padx=4)
+        clf_lbl.pack(anchor='w', padx=24, pady=(0,4))
+
         # Options PDF
         ttk.Label(ai, text="Analyse automatique des PDFs", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
         auto_pdf_var = tk.BooleanVar(value=bool(load_config().get('auto_analyze_pdf', True)))
         ttk.Checkbutton(ai, text="Analyser automatiquement les PDFs avec l'IA", variable=auto_pdf_var).pack(anchor='w', padx=12, pady=2)
         ttk.Label(ai, text="Génère un résumé IA lors de l'import de fichiers PDF", font=("TkDefaultFont", 8)).pack(anchor='w', padx=24, pady=(0,8))
+        pdf_ocr_var = tk.BooleanVar(value=bool(cfg.get('pdf_ocr_enabled', True)))
+        ttk.Checkbutton(ai, text="OCR des pages numérisées (sans texte)", variable=pdf_ocr_var).pack(anchor='w', padx=12, pady=2)
+        ocr_row = ttk.Frame(ai)
+        ocr_row.pack(fill='x', padx=24, pady=(0,8))
+        ttk.Label(ocr_row, text="Résolution").pack(side='left')
+        ocr_dpi = tk.IntVar(value=int(cfg.get('ocr_dpi', 300)))
+        ttk.Spinbox(ocr_row, from_=100, to=600, increment=50, textvariable=ocr_dpi, width=5).pack(side='left', padx=(4,2))
+        ttk.Label(ocr_row, text="dpi, langues").pack(side='left', padx=(0,4))
+        ocr_lang = tk.StringVar(value=cfg.get('ocr_lang', 'auto'))
+        ttk.Entry(ocr_row, textvariable=ocr_lang, width=10).pack(side='left')
+        ttk.Label(ocr_row, text="(auto = détectée par document)").pack(side='left', padx=(4,0))
+
+        # Réextraction en masse des pièces jointes (tâche de fond avec reprise)
+        reindex_row = ttk.Frame(ai)
+        reindex_row.pack(fill='x', padx=12, pady=(4,0))
+        ttk.Label(reindex_row, text="Pièces jointes sans texte à jour").pack(side='left')
+        reindex_lbl = ttk.Label(ai, text="", font=("TkDefaultFont", 8))
+        def reindex_status(text):
+            try: reindex_lbl.config(text=text)
+            except tk.TclError: pass
+        def reindex_start():
+            from ..services import reindex
+            state = reindex.checkpoint()
+            resumed = bool(state and state['finished_at'] is None)
+            def progress(p):
+                try: self.after(0, reindex_status, p.summary())
+                except (tk.TclError, RuntimeError): pass
+            def done(res, err):
+                text = str(err) if err else f"Terminé : {res.summary()}, {res.changed_clips} clip(s) mis à jour"
+                try: self.after(0, reindex_status, text)
+                except (tk.TclError, RuntimeError): pass
+            if reindex.start(progress=progress, done=done):
+                reindex_status("Reprise de la réextraction…" if resumed else "Réextraction en cours…")
+            else:
+                reindex_status("Réextraction déjà en cours")
+        def reindex_stop():
+            from ..services import reindex
+            reindex.stop()
+            reindex_status("Arrêt après le lot en cours (reprise au prochain lancement)")
+        ttk.Button(reindex_row, text="Arrêter", command=reindex_stop).pack(side='right')
+        ttk.Button(reindex_row, text="Réextraire", command=reindex_start).pack(side='right', padx=4)
+        reindex_lbl.pack(anchor='w', padx=24, pady=(0,4))
+
+        # Dossier surveillé : PDF et images joints automatiquement
+        ttk.Label(ai, text="Dossier surveillé", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
+        watch_row = ttk.Frame(ai)
+        watch_row.pack(fill='x', padx=12, pady=2)
+        watch_folder_var = tk.StringVar(value=cfg.get('watch_folder', ''))
+        ttk.Entry(watch_row, textvariable=watch_folder_var).pack(side='left', fill='x', expand=True)
+        def browse_watch_folder():
+            path = fd.askdirectory(initialdir=watch_folder_var.get() or None)
+            if path: watch_folder_var.set(path)
+        ttk.Button(watch_row, text="Parcourir…", command=browse_watch_folder).pack(side='left', padx=(4,0))
+        watch_opts = ttk.Frame(ai)
+        watch_opts.pack(fill='x', padx=24, pady=(0,2))
+        ttk.Label(watch_opts, text="Fichiers déjà présents :").pack(side='left')
+        watch_rate = tk.IntVar(value=int(cfg.get('watch_backlog_per_min', 6)))
+        ttk.Spinbox(watch_opts, from_=1, to=600, textvariable=watch_rate, width=5).pack(side='left', padx=(4,2))
+        ttk.Label(watch_opts, text="par minute").pack(side='left')
+        watch_ai_var = tk.BooleanVar(value=bool(cfg.get('watch_analyze_pdf', False)))
+        ttk.Checkbutton(ai, text="Résumé IA des PDF du dossier surveillé", variable=watch_ai_var).pack(anchor='w', padx=24, pady=(0,8))
         
         # Options Web
         ttk.Label(ai, text="Capture web intelligente", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(16,4))
@@ -227,6 +389,76 @@ class OptionsWindow(tk.Toplevel):
             self.master.show_toast("Import en arrière-plan¦")
         ttk.Button(data_tab, text="Importer", command=do_import).pack(anchor='e', padx=8, pady=8)
 
+        # ---------- Statistiques IA ----------
+        stats_tab = ttk.Frame(nb)
+        nb.add(stats_tab, text='Stats IA')
+        stats_top = ttk.Frame(stats_tab)
+        stats_top.pack(fill='x', padx=8, pady=(8,4))
+        ttk.Label(stats_top, text="Période").pack(side='left')
+        stats_days = tk.StringVar(value="7")
+        stats_days_cb = ttk.Combobox(stats_top, textvariable=stats_days, values=["1", "7", "30", "90"], state='readonly', width=4)
+        stats_days_cb.pack(side='left', padx=4)
+        ttk.Label(stats_top, text="jours").pack(side='left')
+        site_cols = ("calls", "errors", "cached", "p50", "p95", "tokens", "cost")
+        site_tree = ttk.Treeview(stats_tab, columns=site_cols, height=8)
+        site_tree.heading('#0', text="Appel")
+        site_tree.column('#0', width=170)
+        for col, label, w in zip(site_cols, ("Appels", "Erreurs", "Cache", "p50 ms", "p95 ms", "Tokens in/out", "Coût $"),
+                                 (50, 50, 50, 60, 60, 110, 60)):
+            site_tree.heading(col, text=label)
+            site_tree.column(col, width=w, anchor='e')
+        site_tree.pack(fill='both', expand=True, padx=8, pady=4)
+        ttk.Label(stats_tab, text="Tokens par jour", font=("TkDefaultFont", 9, "bold")).pack(anchor='w', padx=8, pady=(8,2))
+        day_cols = ("calls", "prompt", "cached", "completion", "cost")
+        day_tree = ttk.Treeview(stats_tab, columns=day_cols, height=6)
+        day_tree.heading('#0', text="Jour")
+        day_tree.column('#0', width=100)
+        for col, label in zip(day_cols, ("Appels", "Prompt", "dont cache", "Complétion", "Coût $")):
+            day_tree.heading(col, text=label)
+            day_tree.column(col, width=80, anchor='e')
+        day_tree.pack(fill='both', expand=True, padx=8, pady=4)
+
+        def refresh_stats(*_):
+            from ..services import telemetry
+            days = int(stats_days.get() or 7)
+            def work():
+                return telemetry.stats_by_site(days), telemetry.daily_totals(max(days, 30))
+            def done(res, err):
+                try:
+                    site_tree.delete(*site_tree.get_children())
+                    day_tree.delete(*day_tree.get_children())
+                except tk.TclError:
+                    return
+                if err:
+                    site_tree.insert('', 'end', text=f"Erreur : {err}")
+                    return
+                by_site, by_day = res
+                for r in by_site:
+                    site_tree.insert('', 'end', text=r['site'], values=(
+                        r['calls'], r['errors'], r['cached'], f"{r['p50_ms']:.0f}", f"{r['p95_ms']:.0f}",
+                        f"{r['prompt_tokens']}/{r['completion_tokens']}", f"{r['cost']:.4f}"))
+                for r in by_day:
+                    day_tree.insert('', 'end', text=r['day'], values=(
+                        r['calls'], r['prompt_tokens'], r['cached_prompt_tokens'], r['completion_tokens'], f"{r['cost']:.4f}"))
+            from ..services.async_worker import runner
+            runner.submit(work, cb=lambda r, e: self.after(0, done, r, e))
+
+        def export_stats():
+            from ..services import telemetry
+            path = fd.asksaveasfilename(defaultextension=".csv", filetypes=[["CSV", "*.csv"]], initialfile="appels_ia.csv")
+            if not path:
+                return
+            try:
+                n = telemetry.export_csv(path)
+                mb.showinfo("Stats IA", f"{n} appels exportés.")
+            except Exception as e:
+                mb.showerror("Stats IA", f"Export impossible : {e}")
+
+        stats_days_cb.bind('<<ComboboxSelected>>', refresh_stats)
+        ttk.Button(stats_top, text="Exporter CSV", command=export_stats).pack(side='right')
+        ttk.Button(stats_top, text="Actualiser", command=refresh_stats).pack(side='right', padx=4)
+        refresh_stats()
+
         # ---------- Boutons généraux ----------
         btns = ttk.Frame(self)
         btns.pack(fill='x', pady=8)
@@ -245,7 +477,27 @@ class OptionsWindow(tk.Toplevel):
             cfg['deepseek_endpoint'] = endpoint.get().strip() or 'https://api.deepseek.com/v1/chat/completions'
             cfg['ai_lang'] = ai_lang.get().strip() or 'fr'
             cfg['ai_tag_count'] = int(ai_tag_count.get())
+            cfg['http_pool_size'] = max(1, int(http_pool_size.get()))
+            cfg['ai_cache_enabled'] = bool(ai_cache_var.get())
+            cfg['ai_streaming'] = bool(ai_stream_var.get())
+            cfg['tagger_mode'] = tagger_mode.get()
+            cfg['ai_routes'] = {t: v.get() for t, v in route_vars.items() if v.get() and v.get() != 'deepseek'}
+            cfg['classifier_enabled'] = bool(clf_var.get())
+            cfg['classifier_threshold'] = min(0.99, max(0.5, float(clf_threshold.get())))
+            cfg['ai_bulk_concurrency'] = max(1, int(ai_bulk_concurrency.get()))
+            cfg['ai_rpm'] = max(0, int(ai_rpm.get()))
+            cfg['ai_tpm'] = max(0, int(ai_tpm.get()))
+            cfg['ai_connect_timeout'] = max(1, int(ai_connect_timeout.get()))
+            cfg['ai_read_timeout'] = max(5, int(ai_read_timeout.get()))
+            cfg['ai_circuit_threshold'] = max(1, int(ai_circuit_threshold.get()))
+            cfg['ai_circuit_cooldown'] = max(5, int(ai_circuit_cooldown.get()))
             cfg['auto_analyze_pdf'] = bool(auto_pdf_var.get())
+            cfg['pdf_ocr_enabled'] = bool(pdf_ocr_var.get())
+            cfg['ocr_dpi'] = min(600, max(100, int(ocr_dpi.get())))
+            cfg['ocr_lang'] = ocr_lang.get().strip() or 'auto'
+            cfg['watch_folder'] = watch_folder_var.get().strip()
+            cfg['watch_backlog_per_min'] = max(1, int(watch_rate.get()))
+            cfg['watch_analyze_pdf'] = bool(watch_ai_var.get())
             cfg['auto_analyze_web'] = bool(auto_web_var.get())
             cfg['save_html_source'] = bool(save_html_var.get())
             cfg['floating_icons_enabled'] = self.master.floating_icons_enabled
@@ -263,6 +515,12 @@ class OptionsWindow(tk.Toplevel):
             cats_vals = [self._cats_listbox.get(i) for i in range(self._cats_listbox.size())]
             cfg['user_categories'] = [c for c in (v.strip() for v in cats_vals) if c]
             save_config(cfg)
+            # nouvelle clé / nouveaux seuils : disjoncteurs IA refermés
+            from ..services import circuit
+            circuit.reset_all()
+            # dossier surveillé : relancé avec les nouvelles options (arrêté si le champ est vide)
+            from ..services import watch_folder
+            watch_folder.restart()
             # appliquer rappels
             try:
                 self.master.reminders_enabled = bool(rem_enabled_var.get())
@@ -11,10 +11,13 @@ import queue
 from typing import List, Dict, Any
 from ..db import create_conn
 from ..services.export import export_selected_md, export_json
-from ..ai import ai_generate_tags, ai_generate_categories
+from ..ai import (ai_generate_tags, ai_generate_categories, ai_enrich, ai_generate_tags_batch,
+                  ai_generate_categories_batch, tagger_mode)
 from ..config import load_config, save_config
 from .editor import EditClipWindow, OPEN_EDITORS
 from ..services.async_worker import runner
+from ..services.bulk_ai import BulkEnricher
+from ..services.langid import LANG_LABELS
 
 CLIPS_BASE_QUERY = (
     "SELECT c.*, (SELECT COUNT(*) FROM files f WHERE f.clip_id=c.id) AS attachment_count"
@@ -37,6 +40,7 @@ class SearchWindow(tk.Toplevel):
         self.active_tag_filters = set()
         self.active_category_filters = set()
         self.read_later_only = tk.BooleanVar(value=False)
+        self.lang_var = tk.StringVar(value="Toutes")
         self._sort_col = 'date'
         self._sort_desc = True
         self._uiq = queue.Queue()
@@ -65,6 +69,11 @@ class SearchWindow(tk.Toplevel):
         period_frame.pack(fill='x', pady=(0,5))
         for label, days in [("Tout", ""), ("Hier", "1"), ("Semaine", "7"), ("Quinzaine", "15"), ("Mois", "30")]:
             ttk.Radiobutton(period_frame, text=label, variable=self.period_var, value=days, command=self.refresh).pack(side='left', padx=3)
+        lang_box = ttk.Combobox(period_frame, textvariable=self.lang_var, state='readonly', width=10,
+                                values=["Toutes"] + list(LANG_LABELS.values()))
+        lang_box.pack(side='right', padx=3)
+        lang_box.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        ttk.Label(period_frame, text="Langue").pack(side='right')
         ttk.Checkbutton(left, text="A lire plus tard", variable=self.read_later_only, command=self.refresh).pack(anchor='w', pady=(0,5))
 
         # Filtres tags
@@ -108,6 +117,9 @@ class SearchWindow(tk.Toplevel):
         ttk.Button(ia_frame, text="Catégories (sélection)", command=self.ai_cats_selected).pack(fill='x', pady=2)
         ttk.Button(ia_frame, text="Catégories manquantes (IA)", command=self.ai_cats_missing).pack(fill='x', pady=2)
         ttk.Button(ia_frame, text="IA complète (sélection)", command=self.ai_all_selected).pack(fill='x', pady=2)
+        ttk.Button(ia_frame, text="Question sur mes notes…", command=lambda: AskNotesWindow(self)).pack(fill='x', pady=2)
+        self.ai_status_var = tk.StringVar(value="")
+        ttk.Label(ia_frame, textvariable=self.ai_status_var, font=("TkDefaultFont", 8)).pack(anchor='w', pady=(2,0))
 
         export_btn = ttk.Menubutton(right, text="Export / Import")
         export_menu = tk.Menu(export_btn, tearoff=0)
@@ -134,6 +146,9 @@ class SearchWindow(tk.Toplevel):
         clips = [dict(zip([c[0] for c in conn.execute("SELECT * FROM clips LIMIT 1").description], r)) for r in rows]
         if self.read_later_only.get():
             clips = [c for c in clips if c.get('read_later')]
+        lang = next((code for code, label in LANG_LABELS.items() if label == self.lang_var.get()), None)
+        if lang:
+            clips = [c for c in clips if c.get('lang') == lang]
         if self.active_tag_filters:
             clips = [c for c in clips if any(t.lower() in {tg.lower() for tg in self.active_tag_filters} for t in (c.get('tags') or '').replace(';',',').split(','))]
         if self.active_category_filters:
@@ -256,6 +271,7 @@ class SearchWindow(tk.Toplevel):
         self.query_var.set("")
         self.period_var.set("")
         self.read_later_only.set(False)
+        self.lang_var.set("Toutes")
         self.active_tag_filters.clear()
         self.active_category_filters.clear()
         self.refresh()
@@ -350,40 +366,50 @@ class SearchWindow(tk.Toplevel):
             tk.messagebox.showerror("Erreur", f"Import échoué: {e}")
 
     # ---------- IA batch ----------
+    def _bulk(self, kind, items, fn, write_sql, to_params, batch_fn=None, local=False):
+        """Lance un traitement IA en masse (concurrence + débit + retry) sur le worker d'arrière-plan.
+        Avec `batch_fn`, les clips courts sont regroupés plusieurs par requête ;
+        `local` (tagger hors ligne) lève les limites de débit de l'API."""
+        def work():
+            progress = lambda n, total: self._uiq.put(("ai_progress", (n, total), None))
+            if local:
+                engine = BulkEnricher(rpm=0, tpm=0, retries=0, progress=progress)
+            else:
+                engine = BulkEnricher(progress=progress)
+            pairs = items() if callable(items) else items
+            if batch_fn:
+                return engine.run_packed(pairs, batch_fn, fn, write_sql, to_params)
+            return engine.run(pairs, fn, write_sql, to_params)
+        runner.submit(work, cb=lambda res, err: self._uiq.put((kind, res, err)))
+
     def ai_tags_missing(self):
         cfg = load_config()
         lang = cfg.get('ai_lang', 'fr')
         count = int(cfg.get('ai_tag_count', 5))
-        def work():
+        def rows():
             conn = create_conn()
             rows = conn.execute("SELECT id, raw_text FROM clips WHERE tags='' OR tags='non traitée par l IA'").fetchall()
-            updated = 0
-            for i, raw in rows:
-                tags = ai_generate_tags(raw or '', lang=lang, count=count)
-                conn.execute("UPDATE clips SET tags=? WHERE id=?", (', '.join(tags), i))
-                updated += 1
-            conn.commit()
             conn.close()
-            return updated
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_tags_done", res, err)))
+            return [(i, raw or '') for i, raw in rows]
+        self._bulk("ai_tags_done", rows, lambda i, raw: ai_generate_tags(raw, lang=lang, count=count),
+                   "UPDATE clips SET tags=? WHERE id=?", lambda i, tags: (', '.join(tags), i),
+                   batch_fn=lambda pairs: ai_generate_tags_batch(pairs, lang=lang, count=count),
+                   local=tagger_mode(cfg) == "local")
         self.master.show_toast("Tags IA pour les non traités en arrière-plan¦")
 
     def ai_process_untagged(self):
         cfg = load_config()
         lang = cfg.get('ai_lang', 'fr')
         count = int(cfg.get('ai_tag_count', 5))
-        def work():
+        def rows():
             conn = create_conn()
             rows = conn.execute("SELECT id, raw_text FROM clips WHERE tags LIKE ?", ("%non traitée par l'IA%",)).fetchall()
-            updated = 0
-            for i, raw in rows:
-                tags = ai_generate_tags(raw or '', lang=lang, count=count)
-                conn.execute("UPDATE clips SET tags=? WHERE id=?", (', '.join(tags), i))
-                updated += 1
-            conn.commit()
             conn.close()
-            return updated
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_tags_done", res, err)))
+            return [(i, raw or '') for i, raw in rows]
+        self._bulk("ai_tags_done", rows, lambda i, raw: ai_generate_tags(raw, lang=lang, count=count),
+                   "UPDATE clips SET tags=? WHERE id=?", lambda i, tags: (', '.join(tags), i),
+                   batch_fn=lambda pairs: ai_generate_tags_batch(pairs, lang=lang, count=count),
+                   local=tagger_mode(cfg) == "local")
         self.master.show_toast("Traitement IA des non traités¦")
     def ai_tags_selected(self):
         sels = self.tree.selection()
@@ -392,27 +418,25 @@ class SearchWindow(tk.Toplevel):
         lang = cfg.get('ai_lang', 'fr')
         count = int(cfg.get('ai_tag_count', 5))
         ids = [int(i) for i in sels]
-        def work():
+        existing_by_id = {}
+        def rows():
             conn = create_conn()
-            updated = 0
-            for i in ids:
-                row = conn.execute("SELECT raw_text, tags FROM clips WHERE id=?", (i,)).fetchone()
-                if not row: continue
-                raw, existing = row
-                tags_ai = ai_generate_tags(raw or '', lang=lang, count=count)
+            rows = conn.execute(f"SELECT id, raw_text, tags FROM clips WHERE id IN ({','.join('?'*len(ids))})", ids).fetchall()
+            conn.close()
+            for i, raw, existing in rows:
                 # Effacer "Non traitée par l'IA" s'il est présent
                 if existing and ("Non traitée par l'IA" in existing or "non traitée par l'IA" in existing):
-                    existing_list = []
+                    existing_by_id[i] = []
                 else:
-                    existing_list = [p.strip() for p in (existing or '').replace(';', ',').split(',') if p.strip()]
-                merged = list(dict.fromkeys(existing_list + tags_ai))
-                conn.execute("UPDATE clips SET tags=? WHERE id=?", (', '.join(merged), i))
-                updated += 1
-            conn.commit()
-            conn.close()
-            return updated
-        from ..services.async_worker import runner
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_tags_done", res, err)))
+                    existing_by_id[i] = [p.strip() for p in (existing or '').replace(';', ',').split(',') if p.strip()]
+            return [(i, raw or '') for i, raw, _ in rows]
+        def to_params(i, tags_ai):
+            merged = list(dict.fromkeys(existing_by_id.get(i, []) + tags_ai))
+            return (', '.join(merged), i)
+        self._bulk("ai_tags_done", rows, lambda i, raw: ai_generate_tags(raw, lang=lang, count=count),
+                   "UPDATE clips SET tags=? WHERE id=?", to_params,
+                   batch_fn=lambda pairs: ai_generate_tags_batch(pairs, lang=lang, count=count),
+                   local=tagger_mode(cfg) == "local")
         self.master.show_toast("Tags IA en arrière-plan¦")
     def ai_cats_selected(self):
         sels = self.tree.selection()
@@ -423,19 +447,15 @@ class SearchWindow(tk.Toplevel):
             tk.messagebox.showinfo("IA", "Aucune catégorie définie (Options > Catégories)")
             return
         ids = [int(i) for i in sels]
-        def work():
+        def rows():
             conn = create_conn()
-            updated = 0
-            for i in ids:
-                row = conn.execute("SELECT raw_text FROM clips WHERE id=?", (i,)).fetchone()
-                if not row: continue
-                cats = ai_generate_categories(row[0] or '', user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2)
-                conn.execute("UPDATE clips SET categories=? WHERE id=?", (', '.join(cats), i))
-                updated += 1
-            conn.commit()
+            rows = conn.execute(f"SELECT id, raw_text FROM clips WHERE id IN ({','.join('?'*len(ids))})", ids).fetchall()
             conn.close()
-            return updated
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_cats_done", res, err)))
+            return [(i, raw or '') for i, raw in rows]
+        self._bulk("ai_cats_done", rows,
+                   lambda i, raw: ai_generate_categories(raw, user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2),
+                   "UPDATE clips SET categories=? WHERE id=?", lambda i, cats: (', '.join(cats), i),
+                   batch_fn=lambda pairs: ai_generate_categories_batch(pairs, user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2))
         self.master.show_toast("Catégories IA en arrière-plan¦")
 
     def ai_cats_missing(self):
@@ -444,18 +464,15 @@ class SearchWindow(tk.Toplevel):
         if not user_cats:
             tk.messagebox.showinfo("IA", "Aucune catégorie définie (Options > Catégories)")
             return
-        def work():
+        def rows():
             conn = create_conn()
             rows = conn.execute("SELECT id, raw_text FROM clips WHERE categories IS NULL OR categories='' ").fetchall()
-            updated = 0
-            for i, raw in rows:
-                cats = ai_generate_categories(raw or '', user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2)
-                conn.execute("UPDATE clips SET categories=? WHERE id=?", (', '.join(cats), i))
-                updated += 1
-            conn.commit()
             conn.close()
-            return updated
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_cats_done", res, err)))
+            return [(i, raw or '') for i, raw in rows]
+        self._bulk("ai_cats_done", rows,
+                   lambda i, raw: ai_generate_categories(raw, user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2),
+                   "UPDATE clips SET categories=? WHERE id=?", lambda i, cats: (', '.join(cats), i),
+                   batch_fn=lambda pairs: ai_generate_categories_batch(pairs, user_cats=user_cats, lang=cfg.get('ai_lang','fr'), max_n=2))
         self.master.show_toast("Catégories IA (manquantes)â€¦")
 
     def ai_all_selected(self):
@@ -467,27 +484,20 @@ class SearchWindow(tk.Toplevel):
         count = int(cfg.get('ai_tag_count', 5))
         max_len = int(cfg.get('ai_title_max_len', 80))
         ids = [int(i) for i in sels]
-        def work():
+        existing_by_id = {}
+        def rows():
             conn = create_conn()
-            updated = 0
-            for i in ids:
-                row = conn.execute("SELECT raw_text, tags FROM clips WHERE id=?", (i,)).fetchone()
-                if not row: continue
-                raw, existing_tags = row
-                title = ai_generate_title(raw or '', lang=lang, max_len=max_len)
-                tags  = ai_generate_tags(raw or '', lang=lang, count=count)
-                cats  = ai_generate_categories(raw or '', user_cats=user_cats, lang=lang, max_n=2) if user_cats else []
-                existing_list = [p.strip() for p in (existing_tags or '').replace(';', ',').split(',') if p.strip()]
-                merged_tags = list(dict.fromkeys(existing_list + tags))
-                conn.execute(
-                    "UPDATE clips SET title=COALESCE(?, title), tags=?, categories=? WHERE id=?",
-                    (title, ', '.join(merged_tags), ', '.join(cats), i)
-                )
-                updated += 1
-            conn.commit()
+            rows = conn.execute(f"SELECT id, raw_text, tags FROM clips WHERE id IN ({','.join('?'*len(ids))})", ids).fetchall()
             conn.close()
-            return updated
-        runner.submit(work, cb=lambda res, err: self._uiq.put(("ai_all_done", res, err)))
+            for i, _, existing_tags in rows:
+                existing_by_id[i] = [p.strip() for p in (existing_tags or '').replace(';', ',').split(',') if p.strip()]
+            return [(i, raw or '') for i, raw, _ in rows]
+        def to_params(i, res):
+            merged_tags = list(dict.fromkeys(existing_by_id.get(i, []) + res['tags']))
+            return (res['title'] or None, ', '.join(merged_tags), ', '.join(res['categories']), i)
+        self._bulk("ai_all_done", rows,
+                   lambda i, raw: ai_enrich(raw, user_cats=user_cats, lang=lang, count=count, max_len=max_len, max_cats=2),
+                   "UPDATE clips SET title=COALESCE(?, title), tags=?, categories=? WHERE id=?", to_params)
         self.master.show_toast("IA (Titre+Tags+Catégories)â€¦")
 
     # ---------- pièces jointes ----------
@@ -496,48 +506,25 @@ class SearchWindow(tk.Toplevel):
         if not sels: return
         clip_id = int(sels[0])
         from tkinter import filedialog
-        paths = filedialog.askopenfilenames(
-            filetypes=[["PDF","*.pdf"],["Images","*.png;*.jpg;*.jpeg;*.gif;*.bmp;*.webp"],["Documents","*.txt;*.md;*.docx"],["Tous","*.*"]]
-        )
+        from ..services.ingest import FILE_TYPES, ingest_files
+        paths = filedialog.askopenfilenames(filetypes=FILE_TYPES)
         if not paths: return
-        import hashlib, mimetypes
-        added = 0
-        for p in paths:
-            try:
-                data = pathlib.Path(p).read_bytes()
-                sha = hashlib.sha256(data).hexdigest()
-                mime = mimetypes.guess_type(p)[0] or 'application/octet-stream'
-                title = pathlib.Path(p).name
-                conn = create_conn()
-                conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) VALUES (?,?,?,?,?,?)",
-                             (clip_id, title, mime, len(data), sha, data))
-                conn.commit()
-                conn.close()
-
-                def work(clip_id=clip_id, mime=mime, blob=data):
-                    from ..ocr import extract_text_from_blob
-                    text = extract_text_from_blob(blob, mime)
-                    if text:
-                        conn = create_conn()
-                        row = conn.execute("SELECT raw_text FROM clips WHERE id=?", (clip_id,)).fetchone()
-                        current = (row[0] or '') if row else ''
-                        sep = ("\n" + SEPARATOR + "\n") if current else ''
-                        conn.execute("UPDATE clips SET raw_text=?, summary=? WHERE id=?",
-                                     (current + sep + text, (current + sep + text)[:150] + '...', clip_id))
-                        conn.commit()
-                        conn.close()
-                        return True
-                    return False
-                def done(res, err):
-                    self.master.show_toast("Fichier joint" + (" et indexé" if res else ''))
-                    self.on_tree_select()
-                runner.submit(work, cb=lambda r,e: self.after(0, done, r, e))
-                added += 1
-            except Exception as e:
-                import tkinter.messagebox as mb
-                mb.showerror("Import", f"Echec import {pathlib.Path(p).name}: {e}")
-        if added:
-            self.master.show_toast(f"{added} fichier(s) joint(s)")
+
+        # pas de résumé IA ici : le texte extrait est ajouté au clip sélectionné
+        def work():
+            return ingest_files(paths, clip_id=clip_id, analyze=False)
+
+        def done(result, err):
+            import tkinter.messagebox as mb
+            if err:
+                mb.showerror("Import", str(err))
+                return
+            self.master.show_toast(f"{result.summary()} ({result.timings_summary()})")
+            if result.failed:
+                first = result.failed[0]
+                mb.showerror("Import", f"Echec import {first.filename}: {first.error}")
+            self.on_tree_select()
+        runner.submit(work, cb=lambda r,e: self.after(0, done, r, e))
 
     # ---------- divers ----------
     def sort_by(self, col):
@@ -558,18 +545,27 @@ class SearchWindow(tk.Toplevel):
         try:
             while True:
                 kind, res, err = self._uiq.get_nowait()
-                if kind == 'ai_tags_done':
-                    if err: import tkinter.messagebox as mb; mb.showerror("AI", str(err))
-                    else: self.master.show_toast(f"Tags IA terminés ({res} éléments)"); self.refresh()
+                if kind == 'ai_progress':
+                    self.ai_status_var.set(f"IA : {res[0]}/{res[1]}")
+                elif kind == 'ai_tags_done':
+                    self._bulk_done("Tags IA terminés", res, err)
                 elif kind == 'ai_cats_done':
-                    if err: import tkinter.messagebox as mb; mb.showerror("AI", str(err))
-                    else: self.master.show_toast(f"Catégories IA terminées ({res} éléments)"); self.refresh()
+                    self._bulk_done("Catégories IA terminées", res, err)
                 elif kind == 'ai_all_done':
-                    if err: import tkinter.messagebox as mb; mb.showerror("AI", str(err))
-                    else: self.master.show_toast(f"IA complète terminée ({res} éléments)"); self.refresh()
+                    self._bulk_done("IA complète terminée", res, err)
         except queue.Empty: pass
         self.after(400, self._poll_ui)
 
+    def _bulk_done(self, label, res, err):
+        self.ai_status_var.set("")
+        if err: import tkinter.messagebox as mb; mb.showerror("AI", str(err)); return
+        self.master.show_toast(f"{label} ({res.summary()})")
+        if res.failed:
+            first = next(iter(res.failed.items()))
+            import tkinter.messagebox as mb
+            mb.showwarning("AI", f"{len(res.failed)} élément(s) en erreur.\nEx. clip #{first[0]} : {first[1][:300]}")
+        self.refresh()
+
     def _build_context_menu(self):
         self._tree_menu.add_command(label="Ouvrir", command=self.open_clip_editor)
         self._tree_menu.add_command(label="Supprimer", command=self.delete_clip)
@@ -589,3 +585,96 @@ class SearchWindow(tk.Toplevel):
         iid = self.tree.identify_row(event.y)
         if iid: self.tree.selection_set(iid)
         self._tree_menu.tk_popup(event.x_root, event.y_root)
+
+
+class AskNotesWindow(tk.Toplevel):
+    """Question libre sur les notes : passages retrouvés localement, réponse IA en flux avec sources [#id]."""
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Question sur mes notes")
+        self.geometry("720x560")
+        self.cancel = None
+        self.streamer = None
+        self.protocol('WM_DELETE_WINDOW', self._close)
+
+        top = ttk.Frame(self)
+        top.pack(fill='x', padx=8, pady=(8,4))
+        self.question_var = tk.StringVar()
+        entry = ttk.Entry(top, textvariable=self.question_var, font=("Segoe", 12))
+        entry.pack(side='left', fill='x', expand=True)
+        entry.bind("<Return>", lambda e: self.ask())
+        entry.focus_set()
+        self.ask_btn = ttk.Button(top, text="Demander", command=self.ask)
+        self.ask_btn.pack(side='left', padx=(4,0))
+
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status_var, font=("TkDefaultFont", 8)).pack(anchor='w', padx=8)
+        import tkinter.scrolledtext as st
+        self.answer = st.ScrolledText(self, wrap='word', height=16)
+        self.answer.pack(fill='both', expand=True, padx=8, pady=4)
+
+        ttk.Label(self, text="Sources (double-clic pour ouvrir)").pack(anchor='w', padx=8)
+        self.sources = tk.Listbox(self, height=6)
+        self.sources.pack(fill='x', padx=8, pady=(0,8))
+        self.sources.bind("<Double-1>", self._open_source)
+        self._source_ids = []
+
+    def ask(self):
+        question = self.question_var.get().strip()
+        if not question or self.cancel is not None:
+            return
+        import threading, time
+        from .widgets import TextStreamer
+        from ..services.qa import ask_notes
+        cfg = load_config()
+        self.cancel = cancel = threading.Event()
+        self.answer.delete('1.0', 'end')
+        self.sources.delete(0, 'end')
+        self._source_ids = []
+        self.streamer = TextStreamer(self.answer, '1.0')
+        self.ask_btn.configure(text="Arrêter", command=self._stop)
+        self.status_var.set("Recherche des passages…")
+        start = time.perf_counter()
+
+        def work():
+            return ask_notes(question, lang=cfg.get('ai_lang', 'fr'), on_delta=self.streamer.push, cancel=cancel)
+
+        def done(res, err):
+            if cancel.is_set():
+                return
+            self.cancel = None
+            self.ask_btn.configure(text="Demander", command=self.ask)
+            if err:
+                self.streamer.stop()
+                self.status_var.set("")
+                mb.showerror("IA", str(err), parent=self)
+                return
+            self.streamer.stop(replace_with=res['answer'])
+            for src in res['sources']:
+                mark = "★ " if src['clip_id'] in res['cited'] else ""
+                self.sources.insert('end', f"{mark}[#{src['clip_id']}] {src['title'] or '(sans titre)'}")
+                self._source_ids.append(src['clip_id'])
+            self.status_var.set(f"{len(res['sources'])} note(s) consultée(s), {len(res['cited'])} citée(s) — "
+                                f"{time.perf_counter() - start:.1f} s")
+
+        runner.submit(work, cb=lambda r, e: self.after(0, done, r, e))
+
+    def _stop(self):
+        if self.cancel is not None:
+            self.cancel.set()
+            self.cancel = None
+        if self.streamer is not None:
+            self.streamer.stop()
+        self.ask_btn.configure(text="Demander", command=self.ask)
+        self.status_var.set("Question annulée")
+
+    def _open_source(self, event=None):
+        sel = self.sources.curselection()
+        if sel:
+            EditClipWindow(self.master, self._source_ids[sel[0]])
+
+    def _close(self):
+        if self.cancel is not None:
+            self.cancel.set()
+        try: self.destroy()
+        except tk.TclError: pass
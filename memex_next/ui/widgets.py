@@ -1,6 +1,8 @@
 ### memex_next/ui/widgets.py
+import queue, threading, time
 import tkinter as tk
 import tkinter.ttk as ttk
+import tkinter.scrolledtext as st
 
 class Tooltip:
     """Infobulle simple au survol."""
@@ -31,3 +33,124 @@ class Tooltip:
         if self.tip:
             self.tip.destroy()
             self.tip = None
+
+
+def page_progress(widget, notify, label, interval=1.0):
+    """Callback `progress(faites, total)` pour l'extraction de PDF (appelable depuis un thread) :
+    `notify(texte)` est exécuté dans le thread Tk au plus toutes les `interval` secondes."""
+    last = [0.0]
+    def progress(done, total):
+        now = time.monotonic()
+        if done < total and now - last[0] < interval:
+            return
+        last[0] = now
+        try: widget.after(0, notify, f"{label} : {done}/{total} pages")
+        except (tk.TclError, RuntimeError): pass
+    return progress
+
+
+class TextStreamer:
+    """Insère dans un Text les fragments poussés depuis un thread de fond.
+    `push` est thread-safe ; l'insertion se fait dans le thread Tk (pompe via after())."""
+    def __init__(self, text_widget, index='end', interval=50, on_flush=None):
+        self.text = text_widget
+        self.interval = interval
+        self.on_flush = on_flush
+        self.chars = 0
+        self.mark = f"stream{id(self)}"
+        self.text.mark_set(self.mark, index)
+        self.text.mark_gravity(self.mark, 'right')
+        self.start_mark = self.mark + "_start"
+        self.text.mark_set(self.start_mark, index)
+        self.text.mark_gravity(self.start_mark, 'left')
+        self._q = queue.Queue()
+        self._running = True
+        self._pump()
+
+    def push(self, chunk):
+        self._q.put(chunk)
+
+    def _drain(self):
+        parts = []
+        while True:
+            try: parts.append(self._q.get_nowait())
+            except queue.Empty: break
+        if parts:
+            chunk = "".join(parts)
+            self.chars += len(chunk)
+            try:
+                self.text.insert(self.mark, chunk)
+                self.text.see(self.mark)
+                if self.on_flush: self.on_flush(self.chars)
+            except tk.TclError:
+                self._running = False
+
+    def _pump(self):
+        if not self._running: return
+        try:
+            if not self.text.winfo_exists():
+                self._running = False
+                return
+        except tk.TclError:
+            self._running = False
+            return
+        self._drain()
+        try: self.text.after(self.interval, self._pump)
+        except tk.TclError: self._running = False
+
+    def stop(self, replace_with=None):
+        """Arrête la pompe ; `replace_with` remplace tout le texte inséré par le flux."""
+        self._drain()
+        self._running = False
+        try:
+            if replace_with is not None:
+                self.text.delete(self.start_mark, self.mark)
+                self.text.insert(self.start_mark, replace_with)
+            self.text.mark_unset(self.mark, self.start_mark)
+        except tk.TclError:
+            pass
+
+
+class StreamPreviewWindow(tk.Toplevel):
+    """Fenêtre d'aperçu d'une génération IA en flux, avec bouton d'arrêt.
+    `cancel` (threading.Event) est positionné quand l'utilisateur arrête ou ferme la fenêtre."""
+    def __init__(self, parent, title="Génération IA"):
+        super().__init__(parent)
+        self.title(title)
+        self.geometry("640x420")
+        self.cancel = threading.Event()
+        self.protocol('WM_DELETE_WINDOW', self._stop)
+        self.status_var = tk.StringVar(value="En attente du premier token…")
+        ttk.Label(self, textvariable=self.status_var).pack(fill='x', padx=8, pady=(8, 2))
+        self.text = st.ScrolledText(self, wrap='word', height=18)
+        self.text.pack(fill='both', expand=True, padx=8, pady=4)
+        ttk.Button(self, text="Arrêter", command=self._stop).pack(side='right', padx=8, pady=(0, 8))
+        self.streamer = TextStreamer(self.text, on_flush=lambda n: self.status_var.set(f"Réception… {n} caractères"))
+        self._progress = None
+        self._closed = False
+        self._tick()
+
+    def push(self, chunk):
+        """Callback `on_delta` (appelable depuis n'importe quel thread)."""
+        self.streamer.push(chunk)
+
+    def progress(self, done, total):
+        """Callback d'avancement des étapes préalables (résumés de sections), thread-safe."""
+        self._progress = (done, total)
+
+    def _tick(self):
+        if self._closed: return
+        if self.streamer.chars == 0 and self._progress:
+            self.status_var.set("Résumé des sections… {}/{}".format(*self._progress))
+        try: self.after(200, self._tick)
+        except tk.TclError: pass
+
+    def _stop(self):
+        self.cancel.set()
+        self.close()
+
+    def close(self):
+        self._closed = True
+        self.streamer.stop()
+        try: self.destroy()
+        except tk.TclError: pass
@@ -1,9 +1,7 @@
 """
 Module de capture web intelligente avec IA
 """
-import urllib.request
 import urllib.parse
-import urllib.error
 import socket
 from typing import Dict, Optional, Tuple
 from pathlib import Path
@@ -20,8 +18,10 @@ try:
 except ImportError:
     TRAFILATURA_AVAILABLE = False
 
-from .config import load_config
-from .ai import _ai_call, MODEL, ENDPOINT
+from .ai import ai_complete, get_ai_provider, AICancelled
+from .services.summarize import condense_text
+from .services.telemetry import tracked
+from .services.http_pool import request as http_request
 
 
 def extract_web_content(url: str, timeout: int = 20) -> Dict[str, str]:
@@ -58,42 +58,26 @@ def extract_web_content(url: str, timeout: int = 20) -> Dict[str, str]:
             'Upgrade-Insecure-Requests': '1'
         }
         
-        req = urllib.request.Request(url, headers=headers)
-        
-        # Tentative de connexion avec gestion d'erreurs détaillée
+        # Tentative de connexion avec gestion d'erreurs détaillée (connexions keep-alive mutualisées)
         try:
-            response = urllib.request.urlopen(req, timeout=timeout)
-            raw_data = response.read()
-            
-            # Gérer la décompression si nécessaire
-            content_encoding = response.headers.get('Content-Encoding', '').lower()
-            if content_encoding == 'gzip':
-                import gzip
-                raw_data = gzip.decompress(raw_data)
-            elif content_encoding == 'deflate':
-                import zlib
-                raw_data = zlib.decompress(raw_data)
+            response = http_request('GET', url, headers=headers, timeout=timeout, follow_redirects=True)
+            if response.status >= 400:
+                result['error'] = f"Erreur HTTP {response.status} pour {url}"
+                return result
             
-            # Détecter l'encodage depuis les headers ou le contenu
-            charset = 'utf-8'  # Par défaut
-            content_type = response.headers.get('Content-Type', '')
-            if 'charset=' in content_type:
-                charset = content_type.split('charset=')[1].split(';')[0].strip()
-            
-            html = raw_data.decode(charset, errors='ignore')
+            # Le pool gère déjà la décompression gzip/deflate ; l'encodage vient des headers
+            html = response.text()
             result['raw_html'] = html
-        except urllib.error.URLError as e:
-            if hasattr(e, 'reason'):
-                if isinstance(e.reason, socket.gaierror):
-                    result['error'] = f"Erreur DNS : Impossible de résoudre '{parsed.netloc}'. Vérifiez votre connexion internet."
-                else:
-                    result['error'] = f"Erreur de connexion : {e.reason}"
-            else:
-                result['error'] = f"Erreur URL : {e}"
+            result['timings'] = response.timings
+        except socket.gaierror:
+            result['error'] = f"Erreur DNS : Impossible de résoudre '{parsed.netloc}'. Vérifiez votre connexion internet."
             return result
         except socket.timeout:
             result['error'] = f"Timeout : Le site ne répond pas dans les {timeout} secondes"
             return result
+        except OSError as e:
+            result['error'] = f"Erreur de connexion : {e}"
+            return result
         except Exception as e:
             result['error'] = f"Erreur inattendue : {str(e)}"
             return result
@@ -158,14 +142,14 @@ def extract_web_content(url: str, timeout: int = 20) -> Dict[str, str]:
         return result
 
 
-def ai_summarize_web_content(web_data: Dict[str, str], lang: str = "fr") -> str:
+@tracked
+def ai_summarize_web_content(web_data: Dict[str, str], lang: str = "fr", on_delta=None, cancel=None,
+                             progress=None) -> str:
     """
     Génère un résumé IA intelligent du contenu web
+    (page longue condensée d'abord en map-reduce, voir services.summarize)
     """
-    cfg = load_config()
-    key = cfg.get("deepseek_api_key")
-    if not key:
-        raise RuntimeError("Clé API manquante (Options > IA)")
+    get_ai_provider("summary")  # erreur immédiate si non configuré
     
     if not web_data.get('success') or web_data.get('error'):
         return f"❌ Impossible de résumer : {web_data.get('error', 'Erreur inconnue')}"
@@ -177,8 +161,13 @@ def ai_summarize_web_content(web_data: Dict[str, str], lang: str = "fr") -> str:
     if not content.strip():
         return f"❌ Aucun contenu textuel trouvé sur cette page"
     
-    # Limiter le contenu pour éviter les tokens excessifs
-    content_preview = content[:4000] if len(content) > 4000 else content
+    # Page trop longue pour le budget de tokens : résumés par sections puis réduction
+    try:
+        content_preview = condense_text(content, lang=lang, cancel=cancel, progress=progress)
+    except AICancelled:
+        raise
+    except Exception as e:
+        return f"❌ Erreur de résumé IA : {str(e)}"
     
     sys_content = f"""Tu es un assistant spécialisé dans l'analyse et le résumé de contenu web.
 Génère un résumé structuré et concis en {lang} qui inclut :
@@ -212,8 +201,10 @@ Génère le résumé structuré :"""
     user = {"role": "user", "content": user_content}
     
     try:
-        summary = _ai_call([sys, user], MODEL, key, cfg.get("deepseek_endpoint", ENDPOINT))
+        summary = ai_complete([sys, user], "summary", on_delta=on_delta, cancel=cancel)
         return summary.strip()
+    except AICancelled:
+        raise
     except Exception as e:
         return f"❌ Erreur de résumé IA : {str(e)}"
 
@@ -246,16 +237,19 @@ def format_web_capture_for_editor(web_data: Dict[str, str], ai_summary: str) ->
     return formatted
 
 
-def capture_web_link_complete(url: str, lang: str = "fr") -> Dict[str, str]:
+@tracked
+def capture_web_link_complete(url: str, lang: str = "fr", on_delta=None, cancel=None,
+                              progress=None) -> Dict[str, str]:
     """
     Capture complète d'un lien web : extraction + résumé IA + formatage
+    on_delta / cancel : résumé reçu en flux (voir ai.ai_complete)
     """
     # 1. Extraction du contenu web
     web_data = extract_web_content(url)
     
     # 2. Résumé IA si extraction réussie
     if web_data.get('success'):
-        ai_summary = ai_summarize_web_content(web_data, lang)
+        ai_summary = ai_summarize_web_content(web_data, lang, on_delta=on_delta, cancel=cancel, progress=progress)
     else:
         ai_summary = f"❌ Impossible d'analyser : {web_data.get('error')}"
     
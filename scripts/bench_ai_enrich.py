@@ -0,0 +1,81 @@
+"""Compare separate title/tags/categories calls with a single ai_enrich call."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memex_next import ai  # noqa: E402
+from memex_next.config import load_config  # noqa: E402
+from memex_next.db import create_conn  # noqa: E402
+
+
+def load_texts(limit: int, files: Sequence[Path]) -> List[str]:
+    if files:
+        return [p.read_text(encoding="utf-8", errors="ignore") for p in files][:limit]
+    conn = create_conn()
+    rows = conn.execute(
+        "SELECT raw_text FROM clips WHERE raw_text IS NOT NULL AND raw_text <> '' ORDER BY id DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+
+def run(label: str, texts: Sequence[str], fn: Callable[[str], object]) -> dict:
+    ai.reset_usage_totals()
+    errors = 0
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            fn(text)
+        except Exception as exc:  # keep going, a benchmark should not stop on one bad item
+            errors += 1
+            print(f"[{label}] error: {exc}", file=sys.stderr)
+    wall = time.perf_counter() - start
+    totals = ai.usage_totals()
+    totals.update({"label": label, "wall_s": wall, "errors": errors})
+    return totals
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark combined vs separate AI enrichment.")
+    parser.add_argument("files", nargs="*", type=Path, help="Text files to use instead of the latest clips.")
+    parser.add_argument("--limit", type=int, default=10, help="Number of texts to enrich (default 10).")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    lang = cfg.get("ai_lang", "fr")
+    count = int(cfg.get("ai_tag_count", 5))
+    max_len = int(cfg.get("ai_title_max_len", 80))
+    user_cats = cfg.get("user_categories", [])
+    texts = load_texts(args.limit, args.files)
+    if not texts:
+        print("No text to benchmark.", file=sys.stderr)
+        return 1
+
+    def separate(text: str):
+        ai.ai_generate_title(text, lang=lang, max_len=max_len, use_cache=False)
+        ai.ai_generate_tags(text, lang=lang, count=count, use_cache=False)
+        if user_cats:
+            ai.ai_generate_categories(text, user_cats=user_cats, lang=lang, max_n=2, use_cache=False)
+
+    def combined(text: str):
+        ai.ai_enrich(text, user_cats=user_cats, lang=lang, count=count, max_len=max_len, use_cache=False)
+
+    results = [run("separate", texts, separate), run("ai_enrich", texts, combined)]
+    print(f"{len(texts)} text(s)")
+    print(f"{'strategy':<10} {'calls':>6} {'prompt':>9} {'compl.':>8} {'wall s':>8} {'s/clip':>7} {'errors':>6}")
+    for r in results:
+        print(f"{r['label']:<10} {r['calls']:>6} {r['prompt_tokens']:>9} {r['completion_tokens']:>8} "
+              f"{r['wall_s']:>8.2f} {r['wall_s'] / len(texts):>7.2f} {r['errors']:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
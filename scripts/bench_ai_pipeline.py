@@ -0,0 +1,176 @@
+"""Deterministic, offline benchmark of the AI pipeline against scripts/mock_ai_server.py.
+
+Runs on a throw-away database and configuration (MEMEX_DB / MEMEX_CONFIG point to a temp
+directory) seeded with synthetic clips, so neither the real base nor the API key is used.
+Scenarios:
+  enrich     BulkEnricher + ai_enrich, one request per clip
+  packed     BulkEnricher.run_packed + ai_generate_tags_batch (short texts batched)
+  cache      ai_enrich twice with the local response cache on (second pass = hits)
+  retries    ai_enrich with --error-rate 500s / 429s, retried by call_with_retry
+  streaming  ai_complete with on_delta: time to first token vs full response
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+_TMP = Path(tempfile.mkdtemp(prefix="memex_bench_"))
+os.environ["MEMEX_DB"] = str(_TMP / "bench.db")
+os.environ["MEMEX_CONFIG"] = str(_TMP / "bench_config.json")
+
+from mock_ai_server import MockAIServer  # noqa: E402
+from memex_next import ai  # noqa: E402
+from memex_next.config import save_config  # noqa: E402
+from memex_next.db import create_conn, init_db  # noqa: E402
+from memex_next.services import ai_cache, circuit  # noqa: E402
+from memex_next.services.bulk_ai import BulkEnricher  # noqa: E402
+
+CATEGORIES = ["Python", "Cuisine", "Voyage", "Finance", "Santé", "Musique"]
+_VOCAB = ("python programme fonction serveur requête données recette cuisine farine tomate voyage train "
+          "montagne plage budget épargne placement banque santé sommeil exercice médecin musique guitare "
+          "concert partition analyse mémoire index recherche article lecture projet").split()
+
+ENRICH_SQL = "UPDATE clips SET title=?, tags=?, categories=? WHERE id=?"
+TAGS_SQL = "UPDATE clips SET tags=? WHERE id=?"
+
+
+def seed_clips(n: int, seed: int) -> List[Tuple[int, str]]:
+    """Synthetic clips: two thirds short (batchable), one third long."""
+    rng = random.Random(seed)
+    conn = create_conn()
+    conn.execute("DELETE FROM clips")
+    for k in range(n):
+        words = rng.randint(400, 900) if k % 3 == 2 else rng.randint(40, 110)
+        cat = CATEGORIES[k % len(CATEGORIES)]
+        text = f"{cat}. " + " ".join(rng.choice(_VOCAB) for _ in range(words)) + "."
+        conn.execute("INSERT INTO clips(ts, source, title, type, raw_text) VALUES (?,?,?,?,?)",
+                     (int(time.time()), "bench", "", "text", text))
+    conn.commit()
+    rows = conn.execute("SELECT id, raw_text FROM clips ORDER BY id").fetchall()
+    conn.close()
+    return [(r[0], r[1]) for r in rows]
+
+
+def write_config(mock: MockAIServer, concurrency: int, retries: int):
+    save_config({
+        "deepseek_endpoint": mock.url,
+        "deepseek_api_key": "mock-key",
+        "deepseek_model": "mock-chat",
+        "user_categories": CATEGORIES,
+        "tagger_mode": "remote",
+        "ai_bulk_concurrency": concurrency,
+        "ai_rpm": 0,
+        "ai_max_retries": retries,
+        "ai_read_timeout": 30,
+        # the retry scenario injects errors on purpose: keep the breaker out of the measurement
+        "ai_circuit_threshold": 10 ** 6,
+    })
+    circuit.reset_all()
+
+
+def enrich_params(item_id, value):
+    return (value["title"], ", ".join(value["tags"]), ", ".join(value["categories"]), item_id)
+
+
+def run_enrich(clips, concurrency: int, use_cache: bool):
+    fn = lambda _id, text: ai.ai_enrich(text, CATEGORIES, use_cache=use_cache)
+    return BulkEnricher(concurrency=concurrency, rpm=0).run(clips, fn, ENRICH_SQL, enrich_params)
+
+
+def run_packed(clips, concurrency: int):
+    batch_fn = lambda pairs: ai.ai_generate_tags_batch(pairs, use_cache=False)
+    fn = lambda _id, text: ai.ai_generate_tags(text, use_cache=False, mode="remote")
+    return BulkEnricher(concurrency=concurrency, rpm=0).run_packed(
+        clips, batch_fn, fn, TAGS_SQL, lambda i, tags: (", ".join(tags), i))
+
+
+def measure(label: str, mock: MockAIServer, run) -> dict:
+    ai.reset_usage_totals()
+    before = mock.stats["requests"]
+    res = run()
+    usage = ai.usage_totals()
+    return {"label": label, "items": res.done + len(res.failed), "failed": len(res.failed),
+            "requests": mock.stats["requests"] - before, "wall_s": res.elapsed,
+            "prompt": usage["prompt_tokens"], "cached": usage["cached_prompt_tokens"]}
+
+
+def run_streaming(clips, runs: int) -> dict:
+    ttfts, totals = [], []
+    for _id, text in clips[:runs]:
+        messages = [{"role": "system", "content": "Tu résumes le texte en français."},
+                    {"role": "user", "content": f"Texte:\n{text}"}]
+        first = []
+        start = time.perf_counter()
+        ai.ai_complete(messages, "summary", on_delta=lambda d: first or first.append(time.perf_counter()),
+                       use_cache=False)
+        end = time.perf_counter()
+        ttfts.append(((first[0] if first else end) - start) * 1000)
+        totals.append((end - start) * 1000)
+    return {"runs": len(totals), "ttft_ms": sum(ttfts) / len(ttfts), "total_ms": sum(totals) / len(totals)}
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the AI pipeline against a local mock server.")
+    parser.add_argument("--clips", type=int, default=60, help="Number of synthetic clips (default 60).")
+    parser.add_argument("--latency", type=float, default=0.15, help="Mock latency per request in seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="Mock delay between streamed pieces.")
+    parser.add_argument("--concurrency", type=int, default=4, help="BulkEnricher workers (default 4).")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="500 rate for the retries scenario.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="429 rate for the retries scenario.")
+    parser.add_argument("--retries", type=int, default=4, help="ai_max_retries (default 4).")
+    parser.add_argument("--stream-runs", type=int, default=5, help="Streamed summaries (default 5).")
+    parser.add_argument("--fixtures", type=Path, help="Recorded responses (JSONL) for the mock to replay.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    init_db().close()
+    with MockAIServer(latency=args.latency, jitter=args.latency / 5, token_delay=args.token_delay,
+                      fixtures=args.fixtures, seed=args.seed) as mock:
+        write_config(mock, args.concurrency, args.retries)
+        clips = seed_clips(args.clips, args.seed)
+        rows = [measure("enrich", mock, lambda: run_enrich(clips, args.concurrency, use_cache=False)),
+                measure("packed", mock, lambda: run_packed(clips, args.concurrency))]
+
+        ai_cache.clear()
+        rows.append(measure("cache-cold", mock, lambda: run_enrich(clips, args.concurrency, use_cache=True)))
+        hits_before = ai_cache.stats()["hits"]
+        rows.append(measure("cache-warm", mock, lambda: run_enrich(clips, args.concurrency, use_cache=True)))
+        hits = ai_cache.stats()["hits"] - hits_before
+
+        mock.error_rate, mock.rate_limit_rate = args.error_rate, args.rate_limit_rate
+        before = {k: mock.stats[k] for k in ("http_500", "http_429")}
+        rows.append(measure("retries", mock, lambda: run_enrich(clips, args.concurrency, use_cache=False)))
+        injected = sum(mock.stats[k] - v for k, v in before.items())
+        mock.error_rate = mock.rate_limit_rate = 0.0
+
+        stream = run_streaming(clips, args.stream_runs)
+        served = dict(mock.stats)
+
+    print(f"{args.clips} clip(s), mock latency {args.latency * 1000:.0f} ms, concurrency {args.concurrency}")
+    print(f"{'scenario':<11} {'items':>6} {'failed':>6} {'reqs':>6} {'wall s':>7} {'items/s':>8} "
+          f"{'prompt':>8} {'cached':>7}")
+    for r in rows:
+        rate = r["items"] / r["wall_s"] if r["wall_s"] else 0.0
+        print(f"{r['label']:<11} {r['items']:>6} {r['failed']:>6} {r['requests']:>6} {r['wall_s']:>7.2f} "
+              f"{rate:>8.1f} {r['prompt']:>8} {r['cached']:>7}")
+    cold, warm = rows[2]["wall_s"], rows[3]["wall_s"]
+    print(f"local cache: {hits} hit(s) on the warm pass, speed-up x{cold / warm if warm else 0:.1f}")
+    print(f"retries: {injected} injected error(s), {rows[4]['failed']} item(s) still failed")
+    print(f"streaming: {stream['runs']} run(s), TTFT {stream['ttft_ms']:.0f} ms, full {stream['total_ms']:.0f} ms")
+    print(f"mock: {json.dumps(served)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
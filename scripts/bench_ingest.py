@@ -0,0 +1,116 @@
+"""Measure attachment ingestion: the former per-file flow against services.ingest.
+
+  legacy      per file on the calling thread: read_bytes + sha256, store, extract, then the PDF
+              preview reopened from its path (what the AI-summary path used to do), one file at a time
+  sequential  services.ingest.ingest_files with concurrency 1 (single streamed read per file)
+  concurrent  services.ingest.ingest_files with --concurrency workers
+
+AI summaries are not requested (no network); each mode starts from empty tables so the
+extraction cache does not favour later runs. Runs on a throw-away database and configuration
+(MEMEX_DB / MEMEX_CONFIG point to a temp directory). PDFs come from a directory (--pdfs) or are
+generated (--synthetic "3,12,40" page counts, repeated --copies times with distinct content).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mimetypes
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+_TMP = Path(tempfile.mkdtemp(prefix="memex_ingest_bench_"))
+os.environ["MEMEX_DB"] = str(_TMP / "bench.db")
+os.environ["MEMEX_CONFIG"] = str(_TMP / "bench_config.json")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_pdf import synthetic_pdf  # noqa: E402
+from memex_next.db import create_conn, init_db  # noqa: E402
+from memex_next.services import ingest  # noqa: E402
+
+TABLES = ("file_pages", "file_texts", "file_outline", "pdf_index", "files", "clips")
+
+
+def reset():
+    conn = create_conn()
+    for table in TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    conn.commit()
+    conn.close()
+
+
+def legacy(paths: List[str]) -> float:
+    from memex_next.ocr import extract_text_from_blob
+    from memex_next.pdf_analyzer import extract_pdf_smart_preview
+    start = time.perf_counter()
+    for p in paths:
+        data = Path(p).read_bytes()
+        sha = hashlib.sha256(data).hexdigest()
+        mime = mimetypes.guess_type(p)[0] or "application/octet-stream"
+        conn = create_conn()
+        cur = conn.execute("INSERT INTO clips(ts, source, title, type, raw_text, summary, tags) VALUES (?,?,?,?,?,?,?)",
+                           (int(time.time()), "", Path(p).name, "note", "", "", "file"))
+        conn.execute("INSERT OR IGNORE INTO files(clip_id, filename, mime, size, sha256, data) VALUES (?,?,?,?,?,?)",
+                     (cur.lastrowid, Path(p).name, mime, len(data), sha, data))
+        conn.commit()
+        conn.close()
+        extract_text_from_blob(data, mime, sha256=sha)
+        if mime == "application/pdf":
+            extract_pdf_smart_preview(p)
+    return time.perf_counter() - start
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the attachment ingestion pipeline.")
+    parser.add_argument("--pdfs", type=Path, help="Directory of PDFs (searched recursively).")
+    parser.add_argument("--synthetic", default="3,12,40", help="Page counts of generated PDFs (default 3,12,40).")
+    parser.add_argument("--copies", type=int, default=3, help="Generated PDFs per page count (default 3).")
+    parser.add_argument("--concurrency", type=int, default=ingest.DEFAULT_CONCURRENCY)
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the former per-file flow.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.pdfs:
+        paths = [str(p) for p in sorted(args.pdfs.rglob("*.pdf"))]
+    else:
+        paths, k = [], 0
+        for n in (int(v) for v in args.synthetic.split(",") if v.strip()):
+            for c in range(args.copies):
+                path = _TMP / f"synthetic_{n}p_{c}.pdf"
+                synthetic_pdf(path, n, args.seed + k)
+                paths.append(str(path))
+                k += 1
+    if not paths:
+        print("no PDF to process")
+        return 1
+    init_db().close()
+
+    total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+    print(f"{len(paths)} file(s), {total_mb:.1f} MB, concurrency {args.concurrency}")
+    print(f"{'mode':<11} {'wall s':>7} {'files/s':>8}  stage totals (s)")
+    rows = {}
+    if not args.no_legacy:
+        reset()
+        rows["legacy"] = legacy(paths)
+        print(f"{'legacy':<11} {rows['legacy']:>7.2f} {len(paths) / rows['legacy']:>8.2f}")
+    for mode, concurrency in (("sequential", 1), ("concurrent", args.concurrency)):
+        reset()
+        result = ingest.ingest_files(paths, analyze=False, concurrency=concurrency)
+        rows[mode] = result.elapsed
+        stages = " ".join(f"{s}={t:.2f}" for s, t in result.stage_totals().items() if t)
+        print(f"{mode:<11} {result.elapsed:>7.2f} {len(paths) / result.elapsed:>8.2f}  {stages}")
+        if result.failed:
+            print(f"  {len(result.failed)} failed, first: {result.failed[0].filename}: {result.failed[0].error}")
+    if "legacy" in rows and rows["concurrent"]:
+        print(f"speed-up vs legacy x{rows['legacy'] / rows['concurrent']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Measure OCR throughput (images/s) before and after the preprocessing pipeline.
+
+  baseline  raw image handed to pytesseract (one tesseract process per image)
+  pipeline  memex_next.ocr.ocr_image: downscale to the target DPI, grayscale, deskew,
+            adaptive threshold, then the persistent tesserocr engine when installed
+
+Images come from a directory (--images) or are generated (--synthetic N): camera-sized
+pages with uneven lighting and a small rotation. Without tesseract, only the
+preprocessing stage is timed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memex_next import ocr  # noqa: E402
+
+_WORDS = ("mémoire note recherche article projet lecture analyse index document page texte "
+          "réunion budget voyage recette serveur données fonction programme").split()
+
+
+def synthetic_images(n: int, size: tuple, seed: int) -> List:
+    from PIL import Image, ImageDraw
+    import numpy as np
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        img = Image.new("L", size, 235)
+        draw = ImageDraw.Draw(img)
+        for y in range(size[1] // 20, size[1] - size[1] // 20, size[1] // 45):
+            line = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 12)))
+            draw.text((size[0] // 20, y), line.capitalize() + ".", fill=25, font_size=size[1] // 70)
+        shade = np.linspace(rng.uniform(0.55, 0.8), 1.0, size[0], dtype=np.float32)[None, :]
+        noise = np.random.default_rng(rng.randrange(1 << 30)).normal(0, 8, (size[1], size[0]))
+        arr = np.clip(np.asarray(img, dtype=np.float32) * shade + noise, 0, 255).astype(np.uint8)
+        out.append(Image.fromarray(arr).convert("RGB").rotate(rng.uniform(-4, 4), expand=True,
+                                                              fillcolor=(235, 235, 235)))
+    return out
+
+
+def load_images(folder: Path) -> List:
+    from PIL import Image
+    exts = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+    return [Image.open(p) for p in sorted(folder.iterdir()) if p.suffix.lower() in exts]
+
+
+def timed(label: str, images: List, fn) -> dict:
+    start = time.perf_counter()
+    chars = sum(len(fn(img) or "") for img in images)
+    elapsed = time.perf_counter() - start
+    return {"label": label, "images": len(images), "wall_s": elapsed, "chars": chars}
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark OCR with and without the preprocessing pipeline.")
+    parser.add_argument("--images", type=Path, help="Directory of images to OCR.")
+    parser.add_argument("--synthetic", type=int, default=8, help="Generated images when --images is absent (default 8).")
+    parser.add_argument("--size", default="4000x3000", help="Generated image size (default 4000x3000).")
+    parser.add_argument("--lang", default=ocr.DEFAULT_OCR_LANG)
+    parser.add_argument("--dpi", type=int, default=ocr.DEFAULT_TARGET_DPI, help="Target DPI (default 300).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.images:
+        images = load_images(args.images)
+    else:
+        w, h = (int(v) for v in args.size.lower().split("x"))
+        images = synthetic_images(args.synthetic, (w, h), args.seed)
+    if not images:
+        print("no image to process")
+        return 1
+    for img in images:
+        img.load()
+
+    rows = [timed("preprocess", images, lambda img: ocr.preprocess_image(img, args.dpi) and "")]
+    if ocr.ocr_available():
+        try:
+            import pytesseract
+            rows.append(timed("baseline", images, lambda img: pytesseract.image_to_string(img, lang=args.lang)))
+        except ImportError:
+            print("pytesseract not installed: baseline skipped")
+        engine = "tesserocr (persistent)" if ocr.TESSEROCR_AVAILABLE else "pytesseract"
+        rows.append(timed("pipeline", images, lambda img: ocr.ocr_image(img, args.lang)))
+    else:
+        engine = "none"
+        print("tesseract not available: only preprocessing is timed")
+
+    print(f"{len(images)} image(s), first {images[0].size[0]}x{images[0].size[1]}, OCR engine: {engine}, "
+          f"numpy steps: {'on' if ocr.NUMPY_AVAILABLE else 'off'}")
+    print(f"{'stage':<11} {'images':>6} {'wall s':>7} {'images/s':>9} {'chars':>8}")
+    for r in rows:
+        rate = r["images"] / r["wall_s"] if r["wall_s"] else 0.0
+        print(f"{r['label']:<11} {r['images']:>6} {r['wall_s']:>7.2f} {rate:>9.2f} {r['chars']:>8}")
+    by = {r["label"]: r["wall_s"] for r in rows}
+    if "baseline" in by and "pipeline" in by and by["pipeline"]:
+        print(f"speed-up x{by['baseline'] / by['pipeline']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
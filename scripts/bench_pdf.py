@@ -0,0 +1,137 @@
+"""Compare PDF backends for previews and full-text extraction on a PDF corpus.
+
+For each backend available (pypdfium2, pypdf, pdfplumber) and each PDF:
+  open      open the file, read metadata and outline
+  preview   text of the sampled preview pages (services.pdf_reader.sample_pages)
+  full      text of every page, single process
+The "legacy" row times the former preview path: pdfplumber over every page.
+
+PDFs come from a directory (--pdfs) or are generated (--synthetic "5,50,300" page counts).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memex_next.services.pdf_reader import PdfDoc, available_backends, sample_pages  # noqa: E402
+
+_WORDS = "lorem ipsum dolor sit amet memoire recherche index document page texte analyse donnees python".split()
+
+
+def synthetic_pdf(path: Path, n_pages: int, seed: int, lines: int = 45):
+    """Minimal text-only PDF (Helvetica, `lines` lines of 14 words per page)."""
+    rng = random.Random(seed)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + i * 2} 0 R" for i in range(n_pages))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+    font_id = 3 + n_pages * 2
+    for i in range(n_pages):
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + i * 2} 0 R >>".encode())
+        body = "BT /F1 10 Tf 40 760 Td 12 TL\n" + "\n".join(
+            f"({' '.join(rng.choice(_WORDS) for _ in range(14))}) '" for _ in range(lines)) + "\nET"
+        raw = body.encode()
+        objs.append(b"<< /Length %d >>\nstream\n" % len(raw) + raw + b"\nendstream")
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for k, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{k + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def time_backend(backend: str, path: Path, max_pages: int, spread: int, full: bool) -> Dict[str, float]:
+    start = time.perf_counter()
+    with PdfDoc(str(path), backend=backend) as doc:
+        doc.metadata()
+        doc.outline()
+        total = doc.page_count
+        opened = time.perf_counter()
+        for no in sample_pages(total, max_pages, spread):
+            doc.page_text(no)
+        previewed = time.perf_counter()
+        if full:
+            for no in range(1, total + 1):
+                doc.page_text(no)
+        done = time.perf_counter()
+    return {"pages": total, "open": opened - start, "preview": previewed - opened, "full": done - previewed}
+
+
+def time_legacy(path: Path) -> float:
+    import pdfplumber
+    start = time.perf_counter()
+    with pdfplumber.open(str(path)) as pdf:
+        for page in pdf.pages:
+            page.extract_text()
+    return time.perf_counter() - start
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PDF backends for preview and text extraction.")
+    parser.add_argument("--pdfs", type=Path, help="Directory of PDFs (searched recursively).")
+    parser.add_argument("--synthetic", default="5,50,300", help="Page counts of generated PDFs (default 5,50,300).")
+    parser.add_argument("--max-pages", type=int, default=5, help="First pages in a preview (default 5).")
+    parser.add_argument("--spread", type=int, default=3, help="Evenly spaced extra preview pages (default 3).")
+    parser.add_argument("--no-full", action="store_true", help="Skip full-text extraction timings.")
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the pdfplumber full-parse preview.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.pdfs:
+        paths: List[Path] = sorted(args.pdfs.rglob("*.pdf"))
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="memex_pdf_bench_"))
+        paths = []
+        for k, n in enumerate(int(v) for v in args.synthetic.split(",") if v.strip()):
+            paths.append(tmp / f"synthetic_{n}p.pdf")
+            synthetic_pdf(paths[-1], n, args.seed + k)
+    if not paths:
+        print("no PDF to process")
+        return 1
+
+    backends = available_backends()
+    print(f"{len(paths)} PDF(s), backends: {', '.join(backends) or 'none'}")
+    print(f"{'file':<24} {'pages':>5} {'backend':<10} {'open ms':>8} {'preview ms':>10} {'full s':>7} {'pages/s':>8}")
+    totals = {b: {"pages": 0, "preview": 0.0, "full": 0.0} for b in backends}
+    legacy_total = 0.0
+    for path in paths:
+        for backend in backends:
+            try:
+                r = time_backend(backend, path, args.max_pages, args.spread, not args.no_full)
+            except Exception as exc:
+                print(f"{path.name[:24]:<24} {'':>5} {backend:<10} error: {exc}")
+                continue
+            rate = r["pages"] / r["full"] if r["full"] else 0.0
+            print(f"{path.name[:24]:<24} {r['pages']:>5} {backend:<10} {r['open'] * 1000:>8.1f} "
+                  f"{r['preview'] * 1000:>10.1f} {r['full']:>7.2f} {rate:>8.0f}")
+            for key in ("pages", "preview", "full"):
+                totals[backend][key] += r[key]
+        if "pdfplumber" in backends and not args.no_legacy:
+            legacy = time_legacy(path)
+            legacy_total += legacy
+            print(f"{path.name[:24]:<24} {'':>5} {'legacy':<10} {'':>8} {legacy * 1000:>10.1f}")
+
+    print("totals:")
+    for backend, t in totals.items():
+        rate = t["pages"] / t["full"] if t["full"] else 0.0
+        print(f"  {backend:<10} preview {t['preview'] * 1000:8.1f} ms   full {t['full']:7.2f} s ({rate:.0f} pages/s)")
+    if legacy_total and backends:
+        fastest = min(totals[b]["preview"] for b in backends)
+        print(f"  legacy preview {legacy_total * 1000:.1f} ms, fastest sampled preview x{legacy_total / fastest:.0f} faster")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Measure provider-side prompt caching: previous prompt layout vs stable-prefix templates.
+
+Each strategy sends the same texts (tags + categories per text) with the local response
+cache disabled, then reports prompt tokens served from the provider's prefix cache,
+latency and an estimated cost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memex_next import ai  # noqa: E402
+from memex_next.config import load_config  # noqa: E402
+from memex_next.db import create_conn  # noqa: E402
+
+
+def load_texts(limit: int, files: Sequence[Path]) -> List[str]:
+    if files:
+        return [p.read_text(encoding="utf-8", errors="ignore") for p in files][:limit]
+    conn = create_conn()
+    rows = conn.execute(
+        "SELECT raw_text FROM clips WHERE raw_text IS NOT NULL AND raw_text <> '' ORDER BY id DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    conn.close()
+    return [r[0] for r in rows]
+
+
+def legacy_messages(text: str, user_cats: List[str], lang: str, count: int, max_n: int):
+    """Prompt layout used before the stable-prefix templates (counts in the system prompt)."""
+    tags = [
+        {"role": "system", "content": f"Tu extrais {count} tags concis en {lang}. Réponds JSON: {{\"tags\":[]}}"},
+        {"role": "user", "content": f"Texte:\n{text}\n\nJSON:"},
+    ]
+    cats = [
+        {"role": "system", "content": f"Tu choisis 0 à {max_n} catégorie(s) parmi la liste fournie en {lang}. "
+                                      "Réponds JSON: {\"categories\":[]}"},
+        {"role": "user", "content": f"Liste: [{', '.join(user_cats)}]\n\nTexte:\n{text}\n\nJSON:"},
+    ]
+    return tags, cats
+
+
+def stable_messages(text: str, user_cats: List[str], lang: str, count: int, max_n: int):
+    return ai._tags_messages(text, lang, count), ai._categories_messages(text, user_cats, lang, max_n)
+
+
+def run(label: str, texts: Sequence[str], build: Callable, user_cats: List[str], lang: str, count: int) -> dict:
+    ai.reset_usage_totals()
+    errors = 0
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        # vary max_n like real calls do (1 from the main window, 2 from the editor/bulk)
+        tags, cats = build(text, user_cats, lang, count, 1 + i % 2)
+        for task, messages in (("tags", tags), ("categories", cats)):
+            if task == "categories" and not user_cats:
+                continue
+            try:
+                ai.ai_call(task, messages, use_cache=False)
+            except Exception as exc:  # keep going, a benchmark should not stop on one bad item
+                errors += 1
+                print(f"[{label}] error: {exc}", file=sys.stderr)
+    totals = ai.usage_totals()
+    totals.update({"label": label, "wall_s": time.perf_counter() - start, "errors": errors})
+    return totals
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark provider prompt-prefix caching.")
+    parser.add_argument("files", nargs="*", type=Path, help="Text files to use instead of the latest clips.")
+    parser.add_argument("--limit", type=int, default=20, help="Number of texts (default 20).")
+    parser.add_argument("--price-hit", type=float, default=0.07, help="USD per 1M cached prompt tokens.")
+    parser.add_argument("--price-miss", type=float, default=0.27, help="USD per 1M uncached prompt tokens.")
+    parser.add_argument("--price-out", type=float, default=1.10, help="USD per 1M completion tokens.")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    lang = cfg.get("ai_lang", "fr")
+    count = int(cfg.get("ai_tag_count", 5))
+    user_cats = cfg.get("user_categories", [])
+    texts = load_texts(args.limit, args.files)
+    if not texts:
+        print("No text to benchmark.", file=sys.stderr)
+        return 1
+
+    results = [run("legacy", texts, legacy_messages, user_cats, lang, count),
+               run("stable", texts, stable_messages, user_cats, lang, count)]
+    print(f"{len(texts)} text(s), {len(user_cats)} categories")
+    print(f"{'layout':<8} {'calls':>6} {'prompt':>8} {'cached':>8} {'hit %':>6} {'compl.':>7} "
+          f"{'ms/call':>8} {'cost $':>9} {'errors':>6}")
+    for r in results:
+        hit, miss = r["cached_prompt_tokens"], r["prompt_tokens"] - r["cached_prompt_tokens"]
+        cost = (hit * args.price_hit + miss * args.price_miss + r["completion_tokens"] * args.price_out) / 1e6
+        ratio = 100.0 * hit / r["prompt_tokens"] if r["prompt_tokens"] else 0.0
+        per_call = r["latency_ms"] / r["calls"] if r["calls"] else 0.0
+        print(f"{r['label']:<8} {r['calls']:>6} {r['prompt_tokens']:>8} {hit:>8} {ratio:>6.1f} "
+              f"{r['completion_tokens']:>7} {per_call:>8.0f} {cost:>9.5f} {r['errors']:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
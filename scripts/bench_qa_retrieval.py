@@ -0,0 +1,91 @@
+"""Measure passage indexing and retrieval latency for questions over notes.
+
+Seeds a temporary database (MEMEX_DB points to a temp directory) with synthetic clips
+whose words follow a Zipf distribution, indexes their passages, then times
+services.qa.retrieve + pack_context for random questions. No AI call is made.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_TMP = Path(tempfile.mkdtemp(prefix="memex_qa_bench_"))
+os.environ["MEMEX_DB"] = str(_TMP / "bench.db")
+os.environ["MEMEX_CONFIG"] = str(_TMP / "bench_config.json")
+
+from memex_next.db import create_conn, init_db  # noqa: E402
+from memex_next.services import qa  # noqa: E402
+
+_SYLLABLES = "ba be bi bo bu da de di do du fa fe fi fo ka ke ki ko la le li lo lu ma me mi mo na ne ni no " \
+             "pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi vo za ze zi zo".split()
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(n: int, rng: random.Random, vocab: List[str], cum_weights: List[float]) -> float:
+    """Inserts the clips, then returns the time taken to split and index their passages."""
+    conn = create_conn()
+    for base in range(0, n, 1000):
+        rows = []
+        for _ in range(min(1000, n - base)):
+            paragraphs = ["Le " + " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(30, 90))) + "."
+                          for _ in range(rng.randint(1, 6))]
+            rows.append((int(time.time()), " ".join(rng.choices(vocab, cum_weights=cum_weights, k=4)), "\n\n".join(paragraphs)))
+        conn.executemany("INSERT INTO clips(ts, title, raw_text) VALUES (?,?,?)", rows)
+        conn.commit()
+    conn.close()
+    start = time.perf_counter()
+    qa.index_missing(batch=1000)
+    return time.perf_counter() - start
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark passage retrieval for questions over notes.")
+    parser.add_argument("--clips", type=int, default=100_000, help="Number of synthetic clips (default 100000).")
+    parser.add_argument("--vocab", type=int, default=50_000, help="Vocabulary size (default 50000).")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed questions (default 200).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    init_db().close()
+    vocab = vocabulary(args.vocab, rng)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocab))))
+    index_s = seed(args.clips, rng, vocab, cum_weights)
+    conn = create_conn()
+    n_passages = conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+
+    timings = []
+    for _ in range(args.queries):
+        # questions mix frequent and rare words, like real ones
+        question = " ".join(rng.choices(vocab, cum_weights=cum_weights, k=2) + rng.sample(vocab, 2))
+        start = time.perf_counter()
+        qa.pack_context(qa.retrieve(question, conn=conn))
+        timings.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    timings.sort()
+    pct = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    print(f"{args.clips} clip(s), {n_passages} passage(s), passages indexed in {index_s:.1f} s "
+          f"({args.clips / index_s:.0f} clips/s)")
+    print(f"retrieve + pack over {len(timings)} question(s): p50 {pct(0.5):.1f} ms, p95 {pct(0.95):.1f} ms, "
+          f"max {timings[-1]:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+"""Report the local category classifier's accuracy on held-out clips."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from memex_next.services import classifier, indexer  # noqa: E402
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate the local naive Bayes category classifier.")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of labelled clips held out (default 0.2).")
+    parser.add_argument("--threshold", type=float, action="append",
+                        help="Confidence threshold(s) to report (repeatable, default: configured value).")
+    parser.add_argument("--seed", type=int, default=42, help="Shuffle seed for the split.")
+    args = parser.parse_args(argv)
+
+    if not classifier.is_available():
+        print("NumPy is not installed.", file=sys.stderr)
+        return 1
+    indexed = indexer.index_missing()
+    if indexed:
+        print(f"Indexed {indexed} clip(s) first.")
+    for threshold in args.threshold or [None]:
+        start = time.perf_counter()
+        r = classifier.evaluate(holdout=args.holdout, threshold=threshold, seed=args.seed)
+        wall = time.perf_counter() - start
+        if not r["test"]:
+            print("Not enough labelled clips to evaluate.", file=sys.stderr)
+            return 1
+        print(f"threshold={r['threshold']:.2f} train={r['train']} test={r['test']} "
+              f"accuracy={r['accuracy']:.3f} coverage={r['coverage']:.3f} "
+              f"confident_accuracy={r['confident_accuracy']:.3f} ({wall:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
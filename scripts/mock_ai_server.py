@@ -0,0 +1,295 @@
+"""Local mock of an OpenAI/DeepSeek chat-completions endpoint for offline AI-pipeline runs.
+
+Replies are, in order of preference: a recorded fixture matching the request messages,
+a response fetched from --upstream (and recorded with --record-to), or a deterministic
+canned reply shaped after the prompt (tags / categories / title / enrich JSON, batches
+sent as a JSON list of {id, text}, plain summaries). Latency, time-to-first-token, 429/500 error rates
+and provider-side prompt-prefix caching are simulated.
+
+Usage:
+    python scripts/mock_ai_server.py --port 8765 --latency 0.3 --error-rate 0.05
+then set "deepseek_endpoint": "http://127.0.0.1:8765/v1/chat/completions" in a test config
+(see MEMEX_CONFIG / MEMEX_DB to keep the real base untouched).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PREFIX_BLOCK_CHARS = 256  # ~64 tokens, DeepSeek's context-cache granularity
+_WORD_RE = re.compile(r"[^\W\d_]{5,}")
+
+
+def messages_key(messages: List[dict]) -> str:
+    blob = json.dumps([{"role": m.get("role", ""), "content": (m.get("content") or "").strip()} for m in messages],
+                      ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _keywords(text: str, n: int) -> List[str]:
+    counts = Counter(w.lower() for w in _WORD_RE.findall(text))
+    return [w for w, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]]
+
+
+def _category_list(system: str) -> List[str]:
+    m = re.search(r"\[([^\]]*)\]", system)
+    return [c.strip() for c in m.group(1).split(",") if c.strip()] if m else []
+
+
+def _pick_categories(cats: List[str], text: str) -> List[str]:
+    low = text.lower()
+    hits = [c for c in cats if c.lower() in low]
+    return (hits or cats[:1])[:2]
+
+
+def _batch_items(user: str) -> List[dict]:
+    """Items of a batched request: the JSON list that follows the "Textes (liste JSON)" label."""
+    head, sep, rest = user.partition("Textes (liste JSON) :")
+    if not sep or "[" not in rest:
+        return []
+    try:
+        items, _ = json.JSONDecoder().raw_decode(rest[rest.index("["):])
+    except ValueError:
+        return []
+    return [i for i in items if isinstance(i, dict) and "id" in i and "text" in i] if isinstance(items, list) else []
+
+
+def canned_reply(messages: List[dict]) -> str:
+    """Deterministic reply whose shape follows what the prompt asks for."""
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    user = (messages[-1].get("content") or "") if messages else ""
+    text = user.split("Texte:", 1)[-1] if "Texte:" in user else user
+    batch = _batch_items(user)
+    if batch:
+        ids, parts = [b["id"] for b in batch], [b["text"] for b in batch]
+        if '"tag"' in system:
+            return json.dumps({i: _keywords(p, 5) for i, p in zip(ids, parts)}, ensure_ascii=False)
+        cats = _category_list(system)
+        return json.dumps({i: _pick_categories(cats, p) for i, p in zip(ids, parts)}, ensure_ascii=False)
+    if '"title"' in system:
+        cats = _category_list(system)
+        return json.dumps({"title": " ".join(text.split()[:6])[:80], "tags": _keywords(text, 5),
+                           "categories": _pick_categories(cats, text) if cats else []}, ensure_ascii=False)
+    if '"tags"' in system:
+        return json.dumps({"tags": _keywords(text, 5)}, ensure_ascii=False)
+    if '"categories"' in system:
+        return json.dumps({"categories": _pick_categories(_category_list(system), text)}, ensure_ascii=False)
+    if "titre" in system.lower():
+        return " ".join(text.split()[:6])[:80]
+    sentences = re.split(r"(?<=[.!?])\s+", " ".join(text.split()))
+    return "Résumé : " + " ".join(sentences[:3])[:600]
+
+
+class MockAIServer:
+    """Threaded HTTP server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 token_delay: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 fixtures: Optional[Path] = None, upstream: str = "", api_key: str = "",
+                 record_to: Optional[Path] = None, seed: int = 0):
+        self.latency, self.jitter, self.token_delay = latency, jitter, token_delay
+        self.error_rate, self.rate_limit_rate = error_rate, rate_limit_rate
+        self.upstream, self.api_key, self.record_to = upstream, api_key, record_to
+        self.fixtures: Dict[str, str] = {}
+        if fixtures and Path(fixtures).exists():
+            for line in Path(fixtures).read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    rec = json.loads(line)
+                    self.fixtures[rec["key"]] = rec["content"]
+        self.stats = Counter()
+        self._prefixes: set = set()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self) -> "MockAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- simulation ----------
+    def _roll(self) -> Optional[int]:
+        with self._lock:
+            r = self._rng.random()
+        if r < self.rate_limit_rate:
+            return 429
+        if r < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def _delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _usage(self, messages: List[dict], content: str) -> dict:
+        flat = "".join((m.get("role") or "") + (m.get("content") or "") for m in messages)
+        hit = 0
+        with self._lock:
+            for end in range(PREFIX_BLOCK_CHARS, len(flat) + 1, PREFIX_BLOCK_CHARS):
+                h = hashlib.sha1(flat[:end].encode("utf-8")).hexdigest()
+                if h in self._prefixes:
+                    hit = end
+                self._prefixes.add(h)
+        prompt = max(1, len(flat) // 4)
+        cached = min(prompt, hit // 4)
+        return {"prompt_tokens": prompt, "completion_tokens": max(1, len(content) // 4),
+                "total_tokens": prompt + max(1, len(content) // 4),
+                "prompt_cache_hit_tokens": cached, "prompt_cache_miss_tokens": prompt - cached}
+
+    def reply_for(self, req: dict) -> str:
+        messages = req.get("messages") or []
+        key = messages_key(messages)
+        if key in self.fixtures:
+            self.stats["fixture"] += 1
+            return self.fixtures[key]
+        if self.upstream:
+            content = self._fetch_upstream(req)
+            self.stats["upstream"] += 1
+            if self.record_to:
+                with self._lock, open(self.record_to, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "messages": messages, "content": content}, ensure_ascii=False) + "\n")
+                self.fixtures[key] = content
+            return content
+        self.stats["canned"] += 1
+        return canned_reply(messages)
+
+    def _fetch_upstream(self, req: dict) -> str:
+        from memex_next.services.http_pool import request as http_request
+        body = {k: v for k, v in req.items() if k not in ("stream", "stream_options")}
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        resp = http_request("POST", self.upstream, body=json.dumps(body).encode("utf-8"), headers=headers, timeout=120)
+        if resp.status >= 400:
+            raise RuntimeError(f"upstream HTTP {resp.status}")
+        return resp.json()["choices"][0]["message"]["content"]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, data: str):
+                raw = data.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(raw), raw))
+                self.wfile.flush()
+
+            def do_POST(self):
+                server.stats["requests"] += 1
+                try:
+                    req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid JSON"}})
+                    return
+                time.sleep(server._delay())
+                status = server._roll()
+                if status:
+                    server.stats[f"http_{status}"] += 1
+                    self._send_json(status, {"error": {"message": "simulated error"}},
+                                    {"Retry-After": "1"} if status == 429 else None)
+                    return
+                try:
+                    content = server.reply_for(req)
+                except Exception as exc:
+                    server.stats["http_502"] += 1
+                    self._send_json(502, {"error": {"message": str(exc)}})
+                    return
+                usage = server._usage(req.get("messages") or [], content)
+                if not req.get("stream"):
+                    self._send_json(200, {"model": req.get("model", "mock"), "usage": usage,
+                                          "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                                       "finish_reason": "stop"}]})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = re.findall(r"\S+\s*", content) or [content]
+                for piece in pieces:
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                    self._chunk("data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": piece}}]},
+                                                      ensure_ascii=False) + "\n\n")
+                if (req.get("stream_options") or {}).get("include_usage"):
+                    self._chunk("data: " + json.dumps({"choices": [], "usage": usage}) + "\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run a local mock chat-completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each response (default 0.2).")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Uniform +/- jitter on latency.")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed pieces.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered with 429.")
+    parser.add_argument("--fixtures", type=Path, help="JSONL of recorded responses to replay.")
+    parser.add_argument("--upstream", default="", help="Real endpoint to forward unknown requests to.")
+    parser.add_argument("--api-key", default="", help="Key for --upstream.")
+    parser.add_argument("--record-to", type=Path, help="Append upstream responses to this JSONL file.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = MockAIServer(args.host, args.port, args.latency, args.jitter, args.token_delay, args.error_rate,
+                          args.rate_limit_rate, args.fixtures, args.upstream, args.api_key, args.record_to, args.seed)
+    print(f"Mock AI endpoint: {server.url}  (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(dict(server.stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())